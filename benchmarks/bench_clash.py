@@ -0,0 +1,109 @@
+""" Замеры разрешения накладок: случайные прямоугольники заданного количества
+(перебор раскладок всего набора и по связным компонентам, точный поиск лучшей раскладки,
+накладки больших областей по точкам и по битовым картам)
+и реальные кандидаты паттернов документа (`AreaPatternMatcher.filter_candidates`). """
+import random
+
+from corpus import VSTU_DOCUMENTS, parsed
+from harness import benchmark, reset_global_caches
+
+from vstuxls.clash import (
+    find_combinations_of_compatible_elements,
+    find_component_arrangements,
+    find_max_weight_independent_set,
+)
+from vstuxls.geom2d import Box, Occupancy
+from vstuxls.grammar2d.AreaPatternMatcher import AreaPatternMatcher
+
+# area patterns of the VSTU grammar with many overlapping candidates
+CANDIDATE_PATTERNS = ['month_day', 'hour_range', 'lesson_frame_1_group_4h_assumed']
+
+
+def random_boxes(count: int, seed: int = 0) -> list[Box]:
+    """ Small boxes scattered over a field sized so that a box overlaps ~2 others on average. """
+    rnd = random.Random(seed)
+    side = max(4, int((count * 4) ** 0.5))
+    boxes = set()
+    while len(boxes) < count:
+        w, h = rnd.randint(1, 3), rnd.randint(1, 3)
+        boxes.add(Box(rnd.randint(0, side - w), rnd.randint(0, side - h), w, h))
+    return sorted(boxes)
+
+
+@benchmark('clash.random_boxes', count=[20, 60, 200, 1000])
+def bench_random_boxes(count):
+    boxes = random_boxes(count)
+
+    def run():
+        reset_global_caches()
+        find_combinations_of_compatible_elements(boxes, components_getter=lambda box: list(box.iterate_points()))
+    return run
+
+
+@benchmark('clash.component_arrangements', count=[20, 60, 200, 1000])
+def bench_component_arrangements(count):
+    """ The same boxes resolved per connected component; the best arrangement covers the largest area. """
+    boxes = random_boxes(count)
+
+    def run():
+        reset_global_caches()
+        find_component_arrangements(
+            boxes, components_getter=lambda box: list(box.iterate_points())
+        ).best(key=lambda arrangement: sum(box.w * box.h for box in arrangement))
+    return run
+
+
+@benchmark('clash.ranked_arrangements', count=[200, 1000])
+def bench_ranked_arrangements(count):
+    """ The 100 best arrangements by covered area, generated lazily out of the per-component product. """
+    boxes = random_boxes(count)
+
+    def run():
+        reset_global_caches()
+        ranked = find_component_arrangements(
+            boxes, components_getter=lambda box: list(box.iterate_points())
+        ).ranked(score=lambda arrangement: sum(box.w * box.h for box in arrangement))
+        for _ in zip(range(100), ranked):
+            pass
+    return run
+
+
+@benchmark('clash.mwis_random_boxes', count=[20, 60, 200, 1000])
+def bench_mwis_random_boxes(count):
+    """ The same boxes; weight is the area, so larger boxes compete with several smaller ones. """
+    boxes = random_boxes(count)
+
+    def run():
+        find_max_weight_independent_set(boxes, weight=lambda box: box.w * box.h,
+                                        components_getter=lambda box: list(box.iterate_points()))
+    return run
+
+
+OCCUPANCY_GETTERS = {
+    'points': dict(components_getter=lambda box: list(box.iterate_points())),
+    'bitmap': dict(occupancy_getter=lambda box: Occupancy.from_box(box).rows),
+}
+
+
+@benchmark('clash.large_areas', getter=list(OCCUPANCY_GETTERS), size=[10, 40])
+def bench_large_areas(getter, size):
+    """ 60 boxes of up to `size`×`size` cells: a component per occupied point vs a bitmap per box row. """
+    boxes = [Box(box.x * size // 3, box.y * size // 3, box.w * size // 3, box.h * size // 3) for box in random_boxes(60)]
+
+    def run():
+        reset_global_caches()
+        find_component_arrangements(boxes, **OCCUPANCY_GETTERS[getter]).best(
+            key=lambda arrangement: sum(box.w * box.h for box in arrangement))
+    return run
+
+
+@benchmark('clash.filter_candidates', pattern=CANDIDATE_PATTERNS, doc=VSTU_DOCUMENTS)
+def bench_filter_candidates(pattern, doc):
+    gm = parsed(doc)
+    matcher = gm.grammar[pattern].get_matcher(gm)
+    candidates = matcher.find_match_candidates_3(None)
+
+    def run():
+        reset_global_caches()
+        AreaPatternMatcher.filter_candidates(candidates)
+    return run
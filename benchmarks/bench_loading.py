@@ -0,0 +1,49 @@
+""" Замеры загрузки сеток: `ExcelGrid` (реальные и синтетические листы расписаний)
+и `TxtGrid` (тестовые .tsv и их укрупнённые копии). """
+from corpus import LARGEST_SHEET_GROUPS, synthetic_xlsx
+from harness import TEST_DATA, benchmark
+
+from vstuxls.converters.text import TxtGrid
+from vstuxls.converters.xlsx import ExcelGrid
+
+EXCEL_FILES = [
+    'grid1.xlsx',
+    'vstusched_week.xlsx',
+    'ОН_ФЭВТ_4 курс 2023 lite.xlsx',
+]
+
+
+def tile_tsv(text: str, times_x: int, times_y: int) -> str:
+    """ Repeat the table `times_x` times horizontally and `times_y` times vertically. """
+    rows = text.rstrip('\n').split('\n')
+    width = max(row.count('\t') + 1 for row in rows)
+    rows = [row + '\t' * (width - 1 - row.count('\t')) for row in rows]
+    return '\n'.join('\t'.join([row] * times_x) for row in rows * times_y) + '\n'
+
+
+@benchmark('load.excel_grid', file=EXCEL_FILES)
+def bench_excel_grid(file):
+    path = TEST_DATA / file
+    return lambda: ExcelGrid.read_xlsx(path)
+
+
+@benchmark('load.excel_grid_vstu_synthetic', groups=[LARGEST_SHEET_GROUPS // 4, LARGEST_SHEET_GROUPS])
+def bench_excel_grid_vstu_synthetic(groups):
+    path = synthetic_xlsx(groups)
+    return lambda: ExcelGrid.read_xlsx(path)
+
+
+@benchmark('load.txt_grid_all_tsv')
+def bench_txt_grid_all():
+    texts = [path.read_text(encoding='utf-8') for path in sorted(TEST_DATA.glob('*.tsv'))]
+
+    def run():
+        for text in texts:
+            TxtGrid(text)
+    return run
+
+
+@benchmark('load.txt_grid_tiled', scale=[1, 10, 30])
+def bench_txt_grid_tiled(scale):
+    text = tile_tsv((TEST_DATA / 'sea_6.tsv').read_text(encoding='utf-8'), scale, scale)
+    return lambda: TxtGrid(text)
@@ -0,0 +1,127 @@
+""" Замеры этапов разбора: классификация ячеек, сопоставление паттернов по видам сопоставителей,
+полный разбор и экспорт расписания в JSON. """
+import io
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from corpus import DOCUMENTS, VSTU_DOCUMENTS, VSTU_GRAMMAR, document, grammar_at, parsed, synthetic_xlsx
+from harness import ROOT, benchmark, reset_global_caches
+
+from vstuxls.converters.xlsx import ExcelGrid
+from vstuxls.export.vstu import export_schedule_document_as_json
+from vstuxls.grammar2d import GrammarMatcher
+from vstuxls.grammar2d.AreaPattern import AreaPattern, ComponentSearch
+from vstuxls.grammar2d.AreaPatternMatcher import AreaPatternMatcher
+from vstuxls.grammar2d.ArrayPatternMatcher import ArrayPatternMatcher
+from vstuxls.grammar2d.TerminalMatcher import TerminalMatcher
+
+MATCHER_KINDS = {
+    'terminal': TerminalMatcher,
+    'area': AreaPatternMatcher,
+    'array': ArrayPatternMatcher,
+}
+
+
+@benchmark('classify.document_cells', doc=list(DOCUMENTS))
+def bench_classify_document(doc):
+    classifier = grammar_at(DOCUMENTS[doc]).get_cell_classifier()
+    contents = [cw.cell.content for cw in document(doc).get_view().iterate_cells()]
+
+    def run():
+        classifier.clear_cache()
+        for text in contents:
+            classifier.match(text, 5)
+    return run
+
+
+@benchmark('classify.vocabulary')
+def bench_classify_vocabulary():
+    """ Distinct cell values collected from real schedules (materials/*unique-values.txt, group names). """
+    classifier = grammar_at(DOCUMENTS[VSTU_DOCUMENTS[0]]).get_cell_classifier()
+    paths = [*sorted((ROOT / 'materials').glob('*unique-values.txt')), ROOT / 'materials' / 'groupnames.txt']
+    contents = [line.strip() for path in paths for line in path.read_text(encoding='utf-8').splitlines()]
+    contents = [text for text in contents if text]
+
+    def run():
+        classifier.clear_cache()
+        for text in contents:
+            classifier.match(text, 5)
+    return run
+
+
+@benchmark('match.find_all', kind=list(MATCHER_KINDS), doc=VSTU_DOCUMENTS)
+def bench_matcher_kind(kind, doc):
+    """ Search again for all independently matchable patterns of the matcher kind
+        over the completely parsed document (i.e. with all their dependencies known). """
+    gm = parsed(doc)
+    patterns = [
+        pattern
+        for wave in gm.grammar.dependency_waves()
+        for pattern in sorted(wave)
+        if pattern.independently_matchable() and type(pattern.get_matcher(gm)) is MATCHER_KINDS[kind]
+    ]
+
+    def run():
+        reset_global_caches()
+        gm.result_cache.clear()
+        for pattern in patterns:
+            pattern.get_matcher(gm).find_all(match_limit=pattern.count_in_document.stop)
+    return run
+
+
+@benchmark('match.area_search', search=[s.value for s in ComponentSearch], doc=VSTU_DOCUMENTS)
+def bench_area_component_search(search, doc):
+    """ `match.find_all[kind=area]` with the component search strategy (`component_search`) set for all area patterns. """
+    gm = parsed(doc)
+    patterns = [
+        pattern
+        for wave in gm.grammar.dependency_waves()
+        for pattern in sorted(wave)
+        if pattern.independently_matchable() and isinstance(pattern, AreaPattern)
+    ]
+
+    def run():
+        reset_global_caches()
+        gm.result_cache.clear()
+        for pattern in patterns:
+            default, pattern.component_search = pattern.component_search, ComponentSearch(search)
+            try:
+                pattern.get_matcher(gm).find_all(match_limit=pattern.count_in_document.stop)
+            finally:
+                pattern.component_search = default
+    return run
+
+
+@benchmark('parse.run_match', doc=list(DOCUMENTS))
+def bench_run_match(doc):
+    grammar, grid = grammar_at(DOCUMENTS[doc]), document(doc)
+
+    def run():
+        reset_global_caches()
+        grammar.get_cell_classifier().clear_cache()
+        GrammarMatcher(grammar).run_match(grid)
+    return run
+
+
+@benchmark('parse.synthetic', groups=[2, 4, 8])
+def bench_run_match_synthetic(groups):
+    """ Growth of parsing time with the width of a generated schedule (see `load.excel_grid_vstu_synthetic`). """
+    grammar, grid = grammar_at(VSTU_GRAMMAR), ExcelGrid.read_xlsx(synthetic_xlsx(groups))
+
+    def run():
+        reset_global_caches()
+        grammar.get_cell_classifier().clear_cache()
+        GrammarMatcher(grammar).run_match(grid)
+    return run
+
+
+@benchmark('export.schedule_json', doc=VSTU_DOCUMENTS)
+def bench_export_json(doc):
+    root_match = parsed(doc).matches_by_element[grammar_at(DOCUMENTS[doc]).root][0]
+    dst_path = Path(tempfile.mkdtemp()) / 'schedule.json'
+
+    def run():
+        with redirect_stdout(io.StringIO()):  # export reports to stdout
+            export_schedule_document_as_json(root_match, dst_path=str(dst_path))
+    return run
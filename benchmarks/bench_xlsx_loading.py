@@ -0,0 +1,69 @@
+""" Замер загрузки листа Excel в `ExcelGrid` на синтетических данных.
+
+Запуск из корня проекта:
+    python benchmarks/bench_xlsx_loading.py [--rows 500] [--cols 200] [--merged 5000]
+Тот же замер входит в общий набор (`benchmarks/run.py`) как `load.excel_grid_synthetic`.
+"""
+import argparse
+from io import BytesIO
+
+import openpyxl
+from harness import benchmark
+
+from vstuxls.converters.xlsx import ExcelGrid, MergedCellsIndex
+from vstuxls.utils import Checkpointer
+
+
+def make_synthetic_workbook(rows=500, cols=200, merged=5000) -> BytesIO:
+    """ Книга с одним заполненным листом `rows` x `cols`
+    и `merged` объединёнными областями 1x2 (по вертикали), расставленными равномерно. """
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in range(1, rows + 1):
+        ws.append([f'r{row}c{col}' for col in range(1, cols + 1)])
+
+    # Области 1x2 на нечётных строках: (rows // 2) * cols мест.
+    slots = (rows // 2) * cols
+    step = max(1, slots // merged)
+    for slot in range(0, min(slots, merged * step), step):
+        row = (slot // cols) * 2 + 1
+        col = slot % cols + 1
+        ws.merge_cells(start_row=row, start_column=col, end_row=row + 1, end_column=col)
+
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+@benchmark('load.excel_grid_synthetic', rows=[100, 500])
+def bench_synthetic_worksheet(rows):
+    worksheet = openpyxl.load_workbook(make_synthetic_workbook(rows, cols=100, merged=rows * 10)).active
+    return lambda: ExcelGrid(worksheet)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--cols', type=int, default=200)
+    parser.add_argument('--merged', type=int, default=5000)
+    args = parser.parse_args()
+
+    ch = Checkpointer()
+    buffer = make_synthetic_workbook(args.rows, args.cols, args.merged)
+    ch.hit('generate workbook')
+
+    worksheet = openpyxl.load_workbook(buffer).active
+    ch.hit('openpyxl.load_workbook')
+    print('merged ranges:', len(worksheet.merged_cells.ranges))
+
+    MergedCellsIndex.of_worksheet(worksheet)
+    ch.hit('MergedCellsIndex.of_worksheet')
+
+    grid = ExcelGrid(worksheet)
+    ch.hit('ExcelGrid(worksheet)')
+    print('grid bounding box:', grid.get_bounding_box())
+
+
+if __name__ == '__main__':
+    main()
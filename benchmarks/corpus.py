@@ -0,0 +1,52 @@
+""" Входные данные замеров: грамматики, документы и результаты их разбора (загружаются один раз на процесс). """
+import tempfile
+from functools import cache
+from pathlib import Path
+
+from harness import ROOT, TEST_DATA
+
+from vstuxls.converters.synthetic import ScheduleSpec, generate_schedule
+from vstuxls.converters.text import TxtGrid
+from vstuxls.converters.xlsx import ExcelGrid
+from vstuxls.grammar2d import Grammar, GrammarMatcher, read_grammar
+from vstuxls.grid import Grid
+
+VSTU_GRAMMAR = ROOT / 'cnf' / 'grammar_root.yml'
+
+# документ → грамматика, которой он разбирается
+DOCUMENTS = {
+    'ОН_ФЭВТ_4 курс 2023 lite.xlsx': VSTU_GRAMMAR,
+    'grid1.tsv': TEST_DATA / 'simple_grammar_txt.yml',
+}
+VSTU_DOCUMENTS = [doc for doc, grammar in DOCUMENTS.items() if grammar == VSTU_GRAMMAR]
+
+# групп на самом широком реальном листе (231 столбец; см. `vstuxls.converters.synthetic`)
+LARGEST_SHEET_GROUPS = 56
+
+
+@cache
+def grammar_at(path: Path) -> Grammar:
+    return read_grammar(path)
+
+
+@cache
+def document(name: str) -> Grid:
+    path = TEST_DATA / name
+    if path.suffix == '.tsv':
+        return TxtGrid(path.read_text(encoding='utf-8'))
+    return ExcelGrid.read_xlsx(path)
+
+
+@cache
+def parsed(name: str) -> GrammarMatcher:
+    """ Matcher that has completed parsing of the document. """
+    gm = GrammarMatcher(grammar_at(DOCUMENTS[name]))
+    gm.run_match(document(name))
+    return gm
+
+
+@cache
+def synthetic_xlsx(groups: int, seed: int = 0) -> Path:
+    """ Synthetic VSTU schedule of `groups` groups (2 weeks, 6 days), saved to a temporary file. """
+    path = Path(tempfile.mkdtemp()) / f'synthetic_{groups}_groups.xlsx'
+    return generate_schedule(ScheduleSpec(groups=groups, seed=seed)).save_xlsx(path)
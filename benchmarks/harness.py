@@ -0,0 +1,183 @@
+""" Минимальный каркас замеров в духе asv: регистрация замеров, прогон, сохранение и сравнение результатов.
+
+Замер — функция, помеченная `@benchmark(...)`: она готовит данные (это время не учитывается)
+и возвращает функцию без аргументов, время вызова которой измеряется.
+Параметры (`params`) перебираются декартовым произведением, каждая комбинация — отдельный замер
+с именем вида `group.name[param=value,...]`.
+
+Результаты сохраняются в JSON (см. `save_results`); два таких файла сравниваются `compare_results`.
+"""
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from timeit import default_timer as timer
+
+ROOT = Path(__file__).resolve().parent.parent
+TEST_DATA = ROOT / 'tests' / 'test_data'
+
+# Формат файла результатов; меняется при несовместимых изменениях.
+RESULTS_FORMAT = 1
+
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[..., Callable[[], object]]
+    params: dict[str, list] = field(default_factory=dict)
+
+    def cases(self) -> Iterable[tuple[str, dict]]:
+        names = list(self.params)
+        for values in itertools.product(*self.params.values()):
+            kwargs = dict(zip(names, values))
+            suffix = ','.join(f'{k}={v}' for k, v in kwargs.items())
+            yield (f'{self.name}[{suffix}]' if suffix else self.name), kwargs
+
+
+@dataclass
+class Timing:
+    """ Время одного вызова, секунды: по `repeat` прогонам из `number` вызовов. """
+    min: float
+    median: float
+    mean: float
+    stdev: float
+    repeat: int
+    number: int
+
+
+REGISTRY: list[Benchmark] = []
+
+
+def benchmark(name: str, **params: list):
+    """ Register a benchmark; `params` map argument names to lists of values to sweep. """
+    def decorator(func):
+        REGISTRY.append(Benchmark(name, func, params))
+        return func
+    return decorator
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, min_time: float = 0.05) -> Timing:
+    """ Time `fn`: one warm-up call, then `repeat` runs of `number` calls each,
+        where `number` is chosen so that a run takes at least `min_time` seconds. """
+    start = timer()
+    fn()
+    elapsed = timer() - start
+
+    number = 1
+    if 0 < elapsed < min_time:
+        number = min(1000, int(min_time / elapsed) + 1)
+
+    times = []
+    for _ in range(repeat):
+        start = timer()
+        for _ in range(number):
+            fn()
+        times.append((timer() - start) / number)
+
+    return Timing(
+        min=min(times),
+        median=statistics.median(times),
+        mean=statistics.fmean(times),
+        stdev=statistics.stdev(times) if len(times) > 1 else 0.0,
+        repeat=repeat,
+        number=number,
+    )
+
+
+def run_benchmarks(selected: Iterable[Benchmark], name_filter: str | None = None,
+                   repeat: int = 5, min_time: float = 0.05, report=print) -> dict[str, Timing]:
+    results = {}
+    for bench in selected:
+        for case_name, kwargs in bench.cases():
+            if name_filter and name_filter not in case_name:
+                continue
+            fn = bench.func(**kwargs)
+            timing = results[case_name] = measure(fn, repeat=repeat, min_time=min_time)
+            report(f'{case_name:<60} {format_seconds(timing.min):>10} (median {format_seconds(timing.median)})')
+    return results
+
+
+def environment_info() -> dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'format': RESULTS_FORMAT,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def save_results(results: dict[str, Timing], path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        'meta': environment_info(),
+        'results': {name: asdict(timing) for name, timing in sorted(results.items())},
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+    return path
+
+
+def load_results(path: Path) -> dict[str, Timing]:
+    data = json.loads(path.read_text(encoding='utf-8'))
+    if data.get('meta', {}).get('format') != RESULTS_FORMAT:
+        raise ValueError(f'Unsupported results format in {path}')
+    return {name: Timing(**timing) for name, timing in data['results'].items()}
+
+
+def compare_results(base: dict[str, Timing], new: dict[str, Timing],
+                    threshold: float = 0.1, report=print) -> list[str]:
+    """ Print ratios new/base of minimal times; return names of benchmarks
+        that became slower by more than `threshold` (0.1 is 10 %). """
+    regressions = []
+    for name in sorted(base.keys() | new.keys()):
+        if name not in new or name not in base:
+            side = 'base' if name in base else 'new'
+            report(f'{name:<60} only in {side}')
+            continue
+
+        ratio = new[name].min / base[name].min if base[name].min else float('inf')
+        mark = ''
+        if ratio > 1 + threshold:
+            mark = '  REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            mark = '  improved'
+        report(f'{name:<60} {format_seconds(base[name].min):>10} → {format_seconds(new[name].min):>10}'
+               f'  x{ratio:.2f}{mark}')
+    return regressions
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.3f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
+
+
+def reset_global_caches():
+    """ Clear process-wide memoization of the clash subsystem, so that repeated calls
+        measure the work instead of cache lookups (as in a fresh worker process).
+        Clash caches proper are scoped to a call (see `vstuxls.clash.caching`) and need no reset. """
+    from vstuxls.clash import clashing_element, resolving
+
+    for module in (clashing_element, resolving):
+        for obj in vars(module).values():
+            candidates = [obj, *vars(obj).values()] if isinstance(obj, type) else [obj]
+            for candidate in candidates:
+                if callable(cache_clear := getattr(candidate, 'cache_clear', None)):
+                    cache_clear()
@@ -0,0 +1,89 @@
+""" Прогон набора замеров (все модули `benchmarks/bench_*.py`).
+
+Запуск из корня проекта:
+    python benchmarks/run.py                             # все замеры, результаты в benchmarks/results/<commit>.json
+    python benchmarks/run.py -k clash --repeat 3         # только замеры, в имени которых есть `clash`
+    python benchmarks/run.py --compare benchmarks/results/base.json --fail-on-regression
+    python benchmarks/run.py --compare base.json --against new.json   # сравнить сохранённые результаты без прогона
+"""
+import argparse
+import importlib
+import sys
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path[:0] = [str(HERE), str(HERE.parent / 'src')]
+
+from loguru import logger  # noqa: E402
+
+from harness import (  # noqa: E402
+    REGISTRY,
+    compare_results,
+    environment_info,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
+
+
+def load_benchmark_modules():
+    for path in sorted(HERE.glob('bench_*.py')):
+        importlib.import_module(path.stem)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', dest='name_filter', help='Run only benchmarks whose names contain this substring.')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark.')
+    parser.add_argument('--min-time', type=float, default=0.05, help='Minimal duration of a timed run, seconds.')
+    parser.add_argument('--output', type=Path, help='Results file (default: benchmarks/results/<commit>.json).')
+    parser.add_argument('--compare', type=Path, help='Results file to compare with.')
+    parser.add_argument('--against', type=Path,
+                        help='Instead of running, compare saved results of this file with `--compare` file.')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Slowdown considered a regression when comparing (0.1 is 10 %%).')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='Exit with code 1 if any regression is found.')
+    parser.add_argument('--list', action='store_true', help='List benchmarks and exit.')
+    args = parser.parse_args()
+
+    # parsing logs much at INFO/DEBUG level
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    if args.against:
+        if not args.compare:
+            parser.error('--against requires --compare')
+        regressions = compare_results(load_results(args.compare), load_results(args.against),
+                                      threshold=args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+        return
+
+    load_benchmark_modules()
+
+    if args.list:
+        for bench in REGISTRY:
+            for case_name, _ in bench.cases():
+                if not args.name_filter or args.name_filter in case_name:
+                    print(case_name)
+        return
+
+    results = run_benchmarks(REGISTRY, args.name_filter, repeat=args.repeat, min_time=args.min_time)
+
+    output = args.output or HERE / 'results' / f"{environment_info()['commit'] or 'latest'}.json"
+    print('Saved results to', save_results(results, output))
+
+    if args.compare:
+        print(f'\nComparison with {args.compare}:')
+        base = {
+            name: timing for name, timing in load_results(args.compare).items()
+            if not args.name_filter or args.name_filter in name
+        }
+        regressions = compare_results(base, results, threshold=args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
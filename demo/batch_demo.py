@@ -4,10 +4,7 @@ from pathlib import Path
 
 from loguru import logger
 
-from vstuxls.converters.xlsx import ExcelGrid
-from vstuxls.export.vstu import export_schedule_document_as_json
-from vstuxls.grammar2d import read_grammar
-from vstuxls.services import DocumentParsingService, WaveDebugExporter
+from vstuxls.services.batch import BatchJob, BatchProcessor, collect_jobs, load_grammar, process_document
 from vstuxls.utils import Checkpointer
 from vstuxls.utils.convert import convert_all_in_dir
 
@@ -77,6 +74,12 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Не сохранять parsing_diagnostics.json в папку отчёта по каждому файлу.",
     )
+    parser.add_argument(
+        "-j", "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes; 0 runs in the current process (default: number of CPUs)",
+    )
     return parser.parse_args()
 
 
@@ -90,68 +93,21 @@ def process_single_file(
     enable_diagnostics: bool = True,
 ) -> bool:
     """Обрабатывает один XLSX файл и сохраняет отчёты в подпапку с уникальным именем."""
+    if not json_output_dir:
+        root_dir = Path(__file__).resolve().parent.parent
+        json_output_dir = root_dir / "data" / "imports"
+
+    job = BatchJob(
+        input_path=input_path,
+        json_output_dir=json_output_dir,
+        reports_dir=reports_output_base,
+        enable_json=enable_json,
+        enable_excel=enable_excel,
+        enable_diagnostics=enable_diagnostics,
+    )
     try:
-        logger.info("Processing file: {}", input_path)
-
-        # Генерируем уникальное имя для подпапки (на основе имени исходного файла, без подпути)
-        file_stem = input_path.stem
-        output_dir = reports_output_base / file_stem
-        # Убеждаемся, что директория для отчётов существует, прежде чем экспортировать unused_patterns.*
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        # Читаем грамматику
-        grammar = read_grammar(grammar_path)
-
-        # Загружаем документ
-        grid = ExcelGrid.read_xlsx(input_path)
-
-        # Создаём экспортёр с уникальной папкой для этого файла
-        exporter = WaveDebugExporter(
-            output_dir=output_dir,
-            enable_json=enable_json,
-            enable_excel=enable_excel,
-            only_wave_indices=(999, ),
-        )
-
-        # Создаём сервис
-        service = DocumentParsingService(
-            grammar=grammar,
-            wave_exporter=exporter,
-            diagnostics_output_dir=output_dir if enable_diagnostics else None,
-            document_source_path=input_path,
-            grammar_source_path=grammar_path,
-        )
-
-        # Распознаём документ
-        matches = service.parse_document(grid)
-
-        logger.info("  Found {} root matches", len(matches))
-        if enable_diagnostics:
-            logger.info("  Diagnostics: {}", (output_dir / "parsing_diagnostics.json").resolve())
-
-        # Экспортируем финальный отчёт о неиспользованных паттернах
-        if matches:
-            document_match = matches[0]
-
-            service.export_final_report(document_match=document_match)
-            logger.info("  Saved reports to {}", output_dir.resolve())
-
-            # Экспортируем JSON-расписание в общую папку импорта
-            if not json_output_dir:
-                root_dir = Path(__file__).resolve().parent.parent
-                json_output_dir = root_dir / "data" / "imports"
-            json_output_dir.mkdir(parents=True, exist_ok=True)
-            json_path = json_output_dir / f"{file_stem}.json"
-
-            export_schedule_document_as_json(
-                document_match,
-                dst_path=str(json_path),
-                source_path=input_path,
-            )
-            logger.info("  Exported JSON schedule to {}", json_path.resolve())
-
+        process_document(job, load_grammar(grammar_path), grammar_path)
         return True
-
     except Exception as exc:
         logger.error("  Failed to process {}: {}", input_path, exc)
         return False
@@ -164,30 +120,19 @@ def process_many(
         enable_excel: bool,
         input_path_base: Path | None = None,
         enable_diagnostics: bool = True,
+        workers: int | None = None,
 ) -> None:
-    """Обрабатывает несколько XLSX файлов.
+    """Обрабатывает несколько XLSX файлов в пуле процессов (см. `vstuxls.services.batch`).
     input_path_base: если задано, то в целевой папке будет воссоздана такая же структура подкаталогов, как и в источнике относительно заданного пути. Должно быть подпутём всх путей из paths или None (без подкаталогов).
+    workers: число процессов (None — по числу ядер, 0 — в текущем процессе).
     """
     ch = Checkpointer()
-    success_count = 0
-
-    for path in paths:
-        # prepare paths
-        target_dir = report_base
-        json_output_dir = output_base
-        if input_path_base:
-            # cut input_path_base from path
-            if path.is_relative_to(input_path_base):
-                subpath = path.parent.relative_to(input_path_base)
-                target_dir = report_base / subpath
-                json_output_dir = output_base / subpath
-
-        # run extracting info from sheet under path
-        if process_single_file(
-            path, grammar_path, json_output_dir, target_dir,
-            enable_json, enable_excel, enable_diagnostics,
-        ):
-            success_count += 1
+    jobs = collect_jobs(
+        paths, output_base, report_base, input_path_base,
+        enable_json, enable_excel, enable_diagnostics,
+    )
+    processor = BatchProcessor(grammar_path=grammar_path, workers=workers)
+    success_count = sum(result.ok for result in processor.run(jobs))
 
     ch.hit(f'Completed: {success_count}/{len(paths)} files processed')
 
@@ -200,6 +145,7 @@ def process_all_in_dir(
     enable_json: bool = True,
     enable_excel: bool = True,
     enable_diagnostics: bool = True,
+    workers: int | None = None,
 ) -> None:
     """Обрабатывает все XLSX файлы в указанной папке (рекурсивно).
 
@@ -214,7 +160,7 @@ def process_all_in_dir(
     logger.info("Found {} XLSX files in {}", len(paths), folder_path)
     process_many(
         paths, grammar_path, output_base, report_base,
-        enable_json, enable_excel, folder_path, enable_diagnostics,
+        enable_json, enable_excel, folder_path, enable_diagnostics, workers,
     )
 
 
@@ -234,6 +180,7 @@ def main() -> None:
         enable_json=args.waves_json,
         enable_excel=args.waves_excel,
         enable_diagnostics=not args.no_diagnostics,
+        workers=args.workers,
     )
 
     logger.info("Batch processing completed.")
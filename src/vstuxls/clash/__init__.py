@@ -19,19 +19,84 @@
 Задача решается в абстрактных терминах, 
 так что вызывающий код волен самостоятельно определять, 
 что есть накладка между элементами.
-Чтобы указать, что некоторая пара элементов конфликтует, нужно снабдить эти элементы одинаковыми компонентами.
+Чтобы указать, что некоторая пара элементов конфликтует, нужно снабдить эти элементы одинаковыми компонентами
+(или битовыми картами занятых позиций с общими битами, если компонентов у элемента много — `occupancy_getter`).
+
+Внутри накладки считаются на битовых масках: элементы универсума нумеруются (`MemberIndex`),
+и множество элементов, как и набор занятых элементом компонентов, представляется целым числом.
+
+Несвязанные между собой кластеры накладок разрешаются по отдельности (`find_component_arrangements`):
+раскладки всего набора — это произведение раскладок связных компонент, которое не материализуется,
+а лучшая раскладка собирается из лучших раскладок компонент.
+Раскладки можно получать и по очереди, от лучших к худшим по складывающейся оценке (`ArrangementProduct.ranked`).
+
+Промежуточные результаты (накладки пар элементов, раскладки подмножеств) кэшируются только в пределах
+области `clash_cache_scope()`: главные функции открывают её на время вызова, а вызывающий код может
+открыть более широкую, общую для нескольких вызовов. По выходе из области кэши освобождаются.
 """
 
+from vstuxls.clash.caching import CacheStats, ClashCacheScope, clash_cache_scope
 from vstuxls.clash.clashing_element import *
-from vstuxls.clash.resolving import fill_clashing_elements, resolve_clashes5
+from vstuxls.clash.mwis import MWISResult, find_max_weight_independent_set
+from vstuxls.clash.resolving import (
+    ArrangementProduct,
+    fill_clashing_elements,
+    resolve_clashes5,
+    resolve_component,
+    split_into_components,
+)
 from vstuxls.utils import sorted_list
 
 
+def find_component_arrangements(
+        elements: Iterable,
+        pair_compatibility_checker=None,
+        components_getter=None,
+        max_elements: int | None = None,
+        occupancy_getter=None,
+    ) -> ArrangementProduct:
+    """ Раскладки элементов, найденные отдельно для каждой связной компоненты графа накладок
+    и объединяемые лениво (см. `ArrangementProduct`).
+
+    max_elements: ограничение числа элементов раскладки связывает компоненты между собой,
+        поэтому при нём универсум разрешается целиком, как одна компонента.
+    occupancy_getter: альтернатива `components_getter` для элементов, занимающих много компонентов (например, ячеек):
+        obj -> {линия: битовая маска занятых на ней позиций} (см. `ClashingRegion`).
+    """
+
+    assert pair_compatibility_checker or components_getter or occupancy_getter, "Any of parameters: `pair_compatibility_checker`, `components_getter` or `occupancy_getter` should be set!"
+
+    # Оборачивание объектов во внутренние обёртки
+    clashing_set = ClashingElementSet.make(
+        elements,
+        # pair_compatibility_checker,
+        components_getter,
+        occupancy_getter,
+    )
+
+    if pair_compatibility_checker:
+        set_pair_compatibility_checker(pair_compatibility_checker)
+
+    relation = components_getter or occupancy_getter or pair_compatibility_checker
+    with clash_cache_scope():
+        if max_elements is not None:
+            components = [clashing_set]
+        else:
+            # Независимые кластеры накладок не перемножаются при переборе и не упираются в MAX_SIZE_FOR_FULL_SEARCH.
+            components = split_into_components(clashing_set)
+
+        return ArrangementProduct(
+            resolve_component(component, relation, max_elements)
+            for component in components
+        )
+
+
 def find_combinations_of_compatible_elements(
         elements: Iterable,
         pair_compatibility_checker=None,
         components_getter=None,
-        max_elements: int | None = None
+        max_elements: int | None = None,
+        occupancy_getter=None,
     ) -> list[list]:
     """ Главная функция.
 
@@ -39,26 +104,30 @@ def find_combinations_of_compatible_elements(
 
     Returns
         One or more subsets of given elements, sorted for stability.
+        The whole universe is resolved at once and all arrangements are materialized:
+        prefer `find_component_arrangements` (its `best()` or `ranked()`) when only the best arrangements are needed.
     """
 
-    assert pair_compatibility_checker or components_getter, "Any of parameters: `pair_compatibility_checker` or `components_getter` should be set!"
+    assert pair_compatibility_checker or components_getter or occupancy_getter, "Any of parameters: `pair_compatibility_checker`, `components_getter` or `occupancy_getter` should be set!"
 
     # Оборачивание объектов во внутренние обёртки
     clashing_set = ClashingElementSet.make(
         elements,
         # pair_compatibility_checker,
         components_getter,
+        occupancy_getter,
     )
 
     if pair_compatibility_checker:
         set_pair_compatibility_checker(pair_compatibility_checker)
 
-    # Пред-вычисление взаимных накладок
-    # (!!!) prepare for resolve_clashes*()
-    fill_clashing_elements(clashing_set)
+    with clash_cache_scope():
+        # Пред-вычисление взаимных накладок
+        # (!!!) prepare for resolve_clashes*()
+        fill_clashing_elements(clashing_set)
 
-    clash_sets = resolve_clashes5(clashing_set,
-                                  max_elements)  # latest and best implementation
+        clash_sets = resolve_clashes5(clashing_set,
+                                      max_elements)  # latest and best implementation
     # Extract objects back
     return sorted_list(
         clash_set.get_bare_objs()
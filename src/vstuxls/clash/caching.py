@@ -0,0 +1,116 @@
+""" Кэши подсистемы накладок, ограниченные областью (scope) разрешения.
+
+Раньше функции и методы подсистемы кэшировались `functools.cache` на уровне модуля,
+и кэши удерживали все обёртки, наборы и исходные объекты (например, `Match2d`) до конца процесса.
+Теперь результаты хранятся в текущей области `clash_cache_scope()` и освобождаются при выходе из неё:
+    • `find_combinations_of_compatible_elements` и `find_component_arrangements` открывают область на время вызова;
+    • вызывающий код может открыть более широкую область, чтобы переиспользовать результаты между вызовами, —
+      вложенные области используют внешнюю (разбор документа так не делает: на больших документах
+      поиск в разросшихся таблицах обходится дороже повторного разрешения);
+    • вне области кэширование не выполняется.
+Область своя у каждого потока.
+"""
+
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+
+from loguru import logger
+
+
+@dataclass
+class CacheStats:
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+
+
+class _Table:
+    __slots__ = ('data', 'hits', 'misses')
+
+    def __init__(self):
+        self.data = {}
+        self.hits = 0
+        self.misses = 0
+
+
+@dataclass
+class ClashCacheScope:
+    """ Кэши одной области: по таблице на кэшируемую функцию (по её `__qualname__`). """
+    tables: dict[str, _Table] = field(default_factory=dict)
+
+    def stats(self) -> dict[str, CacheStats]:
+        """ Размер и попадания по каждой таблице. """
+        return {
+            name: CacheStats(len(table.data), table.hits, table.misses)
+            for name, table in self.tables.items()
+        }
+
+    def total_stats(self) -> CacheStats:
+        total = CacheStats()
+        for stats in self.stats().values():
+            total.size += stats.size
+            total.hits += stats.hits
+            total.misses += stats.misses
+        return total
+
+    def clear(self):
+        self.tables.clear()
+
+
+_local = threading.local()
+
+
+def current_cache_scope() -> ClashCacheScope | None:
+    return getattr(_local, 'scope', None)
+
+
+@contextmanager
+def clash_cache_scope() -> Iterator[ClashCacheScope]:
+    """ Открыть область кэширования (или использовать уже открытую в этом потоке).
+    Кэши области освобождаются при выходе из самой внешней из вложенных областей. """
+    scope = current_cache_scope()
+    if scope is not None:
+        yield scope
+        return
+
+    scope = _local.scope = ClashCacheScope()
+    try:
+        yield scope
+    finally:
+        _local.scope = None
+        if scope.tables:
+            total = scope.total_stats()
+            logger.trace(f'clash cache scope released: {total.size} entries, {total.hits} hits, {total.misses} misses')
+        scope.clear()
+
+
+def scoped_cache(func: Callable) -> Callable:
+    """ Как `functools.cache`, но результаты хранятся в текущей области `clash_cache_scope()`.
+    Вне области функция просто вызывается. """
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        scope = current_cache_scope()
+        if scope is None:
+            return func(*args, **kwargs)
+
+        try:
+            table = scope.tables[name]
+        except KeyError:
+            table = scope.tables[name] = _Table()
+
+        key = (args, frozenset(kwargs.items())) if kwargs else args
+        try:
+            result = table.data[key]
+        except KeyError:
+            table.misses += 1
+            result = table.data[key] = func(*args, **kwargs)
+        else:
+            table.hits += 1
+        return result
+
+    return wrapper
@@ -1,11 +1,12 @@
 # clashing_element.py
 
-from collections.abc import Callable, Hashable, Iterable, Sized
-from functools import cache
+from collections.abc import Callable, Hashable, Iterable, Iterator, Mapping, Sequence, Sized
+from functools import cached_property
 from typing import Self, override
 
 from adict import adict
 
+from vstuxls.clash.caching import scoped_cache
 from vstuxls.utils import safe_adict
 
 # Функция (obj1, obj2) -> bool
@@ -32,6 +33,121 @@ def retain_longest_only(objects: Iterable) -> set:
     return set(objects)
 
 
+def split_mask_into_components(mask: int, adjacency: Sequence[int]) -> list[int]:
+    """ Connected components of the graph restricted to `mask`:
+     `adjacency[i]` is the bitmask of neighbours of vertex `i`. Components go in the order of their lowest bits. """
+    components = []
+    while mask:
+        component = frontier = mask & -mask
+        while frontier:
+            low = frontier & -frontier
+            frontier ^= low
+            new = adjacency[low.bit_length() - 1] & mask & ~component
+            component |= new
+            frontier |= new
+        components.append(component)
+        mask &= ~component
+    return components
+
+
+class MemberIndex:
+    """ Битовое представление подмножеств одного универсума элементов.
+
+    Каждый элемент получает свой бит (`elem.data.bit`, порядок битов — порядок обхода универсума),
+    так что любое подмножество кодируется целым числом — маской членов.
+    Заполняется в `fill_clashing_elements()` вместе с маской конфликтующих `elem.data.clashing_mask`;
+    проверки накладок сводятся к побитовым операциям над такими масками.
+    """
+    elements: list['ClashingElement']
+
+    def __init__(self, elements: Iterable['ClashingElement']):
+        self.elements = list(elements)
+        for i, el in enumerate(self.elements):
+            el.data.bit = 1 << i
+            el.data.member_index = self
+
+    def mask_of(self, elements: Iterable['ClashingElement']) -> int | None:
+        """ Bitmask of given elements, or None if any of them is not indexed here
+         (e.g. it comes from another universe). """
+        mask = 0
+        for el in elements:
+            if el.data.member_index is not self:
+                return None
+            mask |= el.data.bit
+        return mask
+
+    def decode(self, mask: int) -> Iterator['ClashingElement']:
+        """ Elements whose bits are set in `mask`, in the order of the universe. """
+        elements = self.elements
+        while mask:
+            low = mask & -mask
+            yield elements[low.bit_length() - 1]
+            mask ^= low
+
+    def masks_by_component(self) -> dict['ClashingComponent', int] | None:
+        """ For containers: bitmask of members containing each component
+         (members sharing a component pairwise clash, i.e. form a clique). None for bare elements. """
+        if not all(isinstance(el, ClashingContainer) for el in self.elements):
+            return None
+        members_by_component: dict[ClashingComponent, int] = {}
+        for el in self.elements:
+            for component in el.components:
+                members_by_component[component] = members_by_component.get(component, 0) | el.data.bit
+        return members_by_component
+
+    def connected_components(self) -> list[int]:
+        """ Member masks of connected components of the clash graph (after `fill_clashing_masks`). """
+        return split_mask_into_components(
+            (1 << len(self.elements)) - 1,
+            [el.data.clashing_mask for el in self.elements])
+
+    def fill_clashing_masks(self):
+        """ Set `elem.data.clashing_mask` for every element: members that clash with it (not itself). """
+        if (members_by_component := self.masks_by_component()) is not None:
+            # Накладка — это общий компонент: собрать по каждому компоненту маску содержащих его элементов.
+            for el in self.elements:
+                mask = 0
+                for component in el.components:
+                    mask |= members_by_component[component]
+                el.data.clashing_mask = mask & ~el.data.bit
+        elif self.elements and all(isinstance(el, ClashingRegion) for el in self.elements):
+            self._fill_clashing_masks_of_regions()
+        else:
+            for el in self.elements:
+                mask = 0
+                for other in self.elements:
+                    if other is not el and el.clashes_with(other):
+                        mask |= other.data.bit
+                el.data.clashing_mask = mask
+
+    def _fill_clashing_masks_of_regions(self):
+        """ Regions clash if their bitmaps intersect on a common line (see `ClashingRegion`).
+         On each line only regions with overlapping bit spans are compared: a sweep over spans sorted by the lowest bit. """
+        spans_by_line: dict[Hashable, list[tuple[int, int, int, int]]] = {}
+        for i, el in enumerate(self.elements):
+            for line, mask in el.occupancy.items():
+                # (lowest bit, highest bit, mask, member number)
+                spans_by_line.setdefault(line, []).append(((mask & -mask).bit_length(), mask.bit_length(), mask, i))
+
+        clashing = [0] * len(self.elements)
+        for spans in spans_by_line.values():
+            if len(spans) < 2:
+                continue
+            spans.sort()
+            active: list[tuple[int, int, int, int]] = []
+            for span in spans:
+                low, _, mask, i = span
+                active = [other for other in active if other[1] >= low]
+                for _, _, other_mask, j in active:
+                    if mask & other_mask:
+                        clashing[i] |= 1 << j
+                        clashing[j] |= 1 << i
+                active.append(span)
+
+        for el, mask in zip(self.elements, clashing):
+            el.data.clashing_mask = mask
+
+
 class ObjWithDataWrapper(Hashable):
     """ A generic wrapper for an arbitrary Hashable object,
         optionally associated with some arbitrary data.
@@ -79,12 +195,12 @@ class ClashingElement(ObjWithDataWrapper):
     # clashes_with: frozenset['ClashingElement']
     # cluster: None | int
 
-    @cache
+    @scoped_cache
     def clashes_with(self, other: 'ClashingElement') -> bool:
         assert _pair_compatibility_checker
         return not _pair_compatibility_checker(self.obj, other.obj)
 
-    @cache
+    @scoped_cache
     def coupling_with(self, other: 'ClashingElement') -> int:
         if not isinstance(other, ClashingElement):
             return 0
@@ -119,7 +235,7 @@ class ClashingElement(ObjWithDataWrapper):
         # TODO: use `!=`, not `is not` ???
 
     def clone(self):
-        return type(self)(**self.__dict__)
+        return type(self)(obj=self.obj, data=self.data)
 
 
 class ClashingContainer(ClashingElement):
@@ -132,6 +248,19 @@ class ClashingContainer(ClashingElement):
         super().__init__(obj, data)
         self._components = frozenset(components) if components is not None else frozenset()
 
+    @cached_property
+    def components_mask(self) -> int | None:
+        """ Bitmask of occupied components (see `ClashingElementSet.make`);
+         None if the components are not numbered or numbered in different registries. """
+        mask = 0
+        registry = None
+        for component in self._components:
+            if component.bit is None or (registry is not None and component.registry is not registry):
+                return None
+            registry = component.registry
+            mask |= component.bit
+        return mask
+
     @property
     def components(self) -> frozenset['ClashingComponent']:
         return self._components
@@ -141,12 +270,20 @@ class ClashingContainer(ClashingElement):
 
     # _all_directly_overlapping_cache = None
 
-    @cache
+    @scoped_cache
     def clashes_with(self, other: 'ClashingContainer') -> bool:
         assert isinstance(other, ClashingContainer), type(other)
+        if self.components_mask is not None and other.components_mask is not None and self._same_registry(other):
+            return bool(self.components_mask & other.components_mask)
         return any(component in other.components for component in self.components)
 
-    @cache
+    def _same_registry(self, other: 'ClashingContainer') -> bool:
+        """ Components of both were numbered by the same `ClashingElementSet.make` call (or one has none). """
+        if not self._components or not other._components:
+            return True
+        return next(iter(self._components)).registry is next(iter(other._components)).registry
+
+    @scoped_cache
     def coupling_with(self, other: 'ClashingContainer') -> int:
         if not isinstance(other, ClashingContainer):
             return super().coupling_with(other)
@@ -181,11 +318,64 @@ class ClashingContainer(ClashingElement):
     #         # component.belongs_to.remove(self)
 
 
+class ClashingRegion(ClashingElement):
+    """ A kind of ClashingElement that occupies a bitmap: `occupancy` maps a line (any hashable, e.g. a grid row)
+    to the bitmask of occupied positions on it. Regions clash if they occupy a common position of a common line.
+    Equivalent to a `ClashingContainer` with a component per occupied position, without creating them
+    (see `ClashingElementSet.make`). """
+    occupancy: Mapping[Hashable, int]
+
+    def __init__(self, obj: Hashable, data: adict | None = None, occupancy: Mapping[Hashable, int] | None = None):
+        super().__init__(obj, data)
+        self.occupancy = {line: mask for line, mask in (occupancy or {}).items() if mask}
+
+    def __str__(self):
+        return f"{type(self).__name__}({self.obj!r}, occupancy={self.occupancy})"
+
+    def common_count(self, other: 'ClashingRegion') -> int:
+        """ Number of positions occupied by both. """
+        a, b = (self.occupancy, other.occupancy) if len(self.occupancy) <= len(other.occupancy) else (other.occupancy, self.occupancy)
+        return sum((mask & b.get(line, 0)).bit_count() for line, mask in a.items())
+
+    @scoped_cache
+    def clashes_with(self, other: 'ClashingRegion') -> bool:
+        assert isinstance(other, ClashingRegion), type(other)
+        a, b = (self.occupancy, other.occupancy) if len(self.occupancy) <= len(other.occupancy) else (other.occupancy, self.occupancy)
+        return any(mask & b.get(line, 0) for line, mask in a.items())
+
+    @scoped_cache
+    def coupling_with(self, other: 'ClashingRegion') -> int:
+        if not isinstance(other, ClashingRegion):
+            return super().coupling_with(other)
+        near_self = self.data.globally_clashing or set()
+        near_other = other.data.globally_clashing or set()
+        common_elements = near_self & near_other
+        if not common_elements:
+            return 0
+
+        # Same as for `ClashingContainer`: positions are the components.
+        return max((
+                self.common_count(common_element) + other.common_count(common_element)
+                for common_element in common_elements
+                if isinstance(common_element, ClashingRegion)
+            ),
+            default=0
+        )
+
+    def clone(self):
+        return type(self)(obj=self.obj, data=self.data, occupancy=self.occupancy)
+
+
 class ClashingComponent(ObjWithDataWrapper):
-    """ A part of one or more `ClashingContainer`s. """
+    """ A part of one or more `ClashingContainer`s.
+    `bit` is the position of the component in the `registry` it was numbered in (see `ClashingElementSet.make`). """
+    bit: int | None
+    registry: dict | None
 
-    def __init__(self, obj: Hashable, data: adict | None = None):
+    def __init__(self, obj: Hashable, data: adict | None = None, bit: int | None = None, registry: dict | None = None):
         super().__init__(obj, data)
+        self.bit = bit
+        self.registry = registry
 
     def __str__(self):
         return f"{type(self).__name__}({self.obj!r})"
@@ -194,6 +384,8 @@ class ClashingComponent(ObjWithDataWrapper):
         fields = {
             'obj': self.obj,
             'data': self.data,
+            'bit': self.bit,
+            'registry': self.registry,
         }
         return type(self)(**fields)
 
@@ -221,12 +413,24 @@ class ClashingElementSet(set['ClashingElement'], Hashable):
         s.remove(*elements)
         return s
 
-    @cache
+    def member_mask(self) -> int | None:
+        """ Bitmask of this set's elements if all of them are indexed by the same `MemberIndex`, else None. """
+        if not self:
+            return 0
+        index = next(iter(self)).data.member_index
+        return index.mask_of(self) if index is not None else None
+
+    @scoped_cache
     def free_subset(self) -> Self:
         """ Make a subset that it contains only elements not clashing with any other (in this) """
         s = type(self)()
+        self_mask = self.member_mask()
         for el in self:
-            if not el.all_clashing_among(self):
+            if self_mask is not None:
+                free = not (el.data.clashing_mask & self_mask)
+            else:
+                free = not el.all_clashing_among(self)
+            if free:
                 s.add(el.clone())
 
         return s
@@ -246,7 +450,10 @@ class ClashingElementSet(set['ClashingElement'], Hashable):
     def make(cls,
              elements: Iterable,
              # pair_compatibility_checker=None,
-             components_getter=None) -> Self:
+             components_getter=None,
+             occupancy_getter=None) -> Self:
+        """ Wrap objects: into `ClashingContainer`s if `components_getter` is set,
+         into `ClashingRegion`s if `occupancy_getter` (obj -> {line: bitmask}) is set, else into bare `ClashingElement`s. """
 
         # Вспомогательное для объединения и наполнения компонентов
         hash2component: dict[int, ClashingComponent] = {}
@@ -256,7 +463,8 @@ class ClashingElementSet(set['ClashingElement'], Hashable):
             h = hash(component_obj)
             comp = hash2component.get(h)
             if not comp:
-                hash2component[h] = comp = ClashingComponent(component_obj)
+                hash2component[h] = comp = ClashingComponent(
+                    component_obj, bit=1 << len(hash2component), registry=hash2component)
             return comp
 
         # Подготовить объекты, упаковав их в наши обёртки
@@ -268,6 +476,8 @@ class ClashingElementSet(set['ClashingElement'], Hashable):
                     get_component(component)  #, el)
                     for component in components_getter(element)
                 })
+            elif occupancy_getter:
+                el = ClashingRegion(obj=element, occupancy=occupancy_getter(element))
             else:
                 el = ClashingElement(obj=element)
 
@@ -318,6 +528,11 @@ class Arrangement(ClashingElementSet):
 
     def try_add_all(self, new_elements: Iterable[ClashingElement]) -> tuple[bool, set]:
         """Returns True if all given elements were added successfully"""
+        new_elements = list(new_elements)
+        masks = self._masks_for(new_elements)
+        if masks is not None:
+            return self._try_add_all_bitwise(new_elements, *masks)
+
         ok = True
         not_added = set()
         for new_elem in new_elements:
@@ -327,6 +542,36 @@ class Arrangement(ClashingElementSet):
                 not_added.add(new_elem)
         return ok, not_added
 
+    def _masks_for(self, new_elements: list[ClashingElement]) -> tuple[int, int] | None:
+        """ Masks of members and of incompatible elements if this set and `new_elements`
+         are all indexed by the same `MemberIndex` (see `fill_clashing_elements()`), else None. """
+        some = next(iter(self), None) or (new_elements[0] if new_elements else None)
+        index = some.data.member_index if some is not None else None
+        if index is None or index.mask_of(new_elements) is None:
+            return None
+        members_mask = index.mask_of(self)
+        incompatible_mask = index.mask_of(self.incompatible)
+        if members_mask is None or incompatible_mask is None:
+            return None
+        return members_mask, incompatible_mask
+
+    def _try_add_all_bitwise(self, new_elements: list[ClashingElement],
+                             members_mask: int, incompatible_mask: int) -> tuple[bool, set]:
+        """ Same as `try_add` for each element, with compatibility checks done on bitmasks. """
+        not_added = set()
+        for new_elem in new_elements:
+            data = new_elem.data
+            if data.bit & incompatible_mask or data.clashing_mask & members_mask:
+                not_added.add(new_elem)
+                continue
+            if data.bit & members_mask:
+                continue  # already present
+            self.add(new_elem)
+            self.incompatible |= data.globally_clashing
+            members_mask |= data.bit
+            incompatible_mask |= data.clashing_mask
+        return not not_added, not_added
+
     def find_all_incompatible(self) -> ClashingElementSet:
         """ Return from universe the elements that do clash with this set. """
         all_incompatible = ClashingElementSet()
@@ -0,0 +1,334 @@
+""" Точное решение задачи о независимом множестве максимального веса (maximum weight independent set)
+на графе накладок.
+
+В отличие от `resolve_clashes5`, который перечисляет локально оптимальные раскладки (и при большом
+числе элементов переходит на эвристики), здесь сразу ищется одна лучшая раскладка:
+    максимальный суммарный вес элементов, затем — максимальное их количество.
+
+Метод — ветвление с отсечениями по верхней оценке и запоминанием решённых подзадач:
+    • подзадача — маска ещё не рассмотренных элементов (см. `MemberIndex`);
+    • элементы, не легче всех своих соседей вместе взятых, берутся сразу, а соседи элемента, образующие клику
+      и не тяжелее его, выбрасываются — без ветвления и без углубления рекурсии;
+    • затем подзадача раскладывается на связные компоненты графа накладок,
+      которые решаются независимо;
+    • компонента-дерево (в т.ч. цепочка накладок) решается динамическим программированием за линейное время;
+    • иначе ветвление по элементу с наибольшим числом накладок: сначала взять его (и выбросить соседей),
+      затем — не брать; подзадача отсекается, если её оценка сверху (по покрытию кликами)
+      не лучше уже найденного решения.
+
+Ограничение по времени (`time_budget`): по его исчерпании оставшиеся подзадачи решаются жадно,
+так что результат всегда есть (anytime); тогда `MWISResult.exact` = False.
+"""
+
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from math import lcm
+
+from loguru import logger
+
+from vstuxls.clash.clashing_element import (
+    ClashingElementSet,
+    MemberIndex,
+    set_pair_compatibility_checker,
+    split_mask_into_components,
+)
+
+# Максимальная глубина ветвления; более глубокие подзадачи решаются жадно.
+MAX_BRANCHING_DEPTH = 400
+
+# Решение подзадачи: (ценность, маска выбранных элементов).
+_Value = tuple[int, int]
+
+
+@dataclass
+class MWISResult:
+    elements: list  # выбранные объекты, отсортированные для стабильности
+    weight: float
+    exact: bool  # False, если сработало ограничение по времени или глубине
+    subproblems: int  # число решённых (не взятых из кэша) связных подзадач
+
+
+def _integer_values(weights: list[float]) -> list[int]:
+    """ Точные целые ценности элементов: вес, приведённый к общему знаменателю,
+    и единица в младших разрядах — так что сумма ценностей сравнивает раскладки
+    сначала по суммарному весу, затем по числу элементов, без ошибок округления. """
+    ratios = [float(w).as_integer_ratio() for w in weights]
+    denominator = lcm(1, *(d for _, d in ratios))
+    count_base = len(weights) + 1
+    return [n * (denominator // d) * count_base + 1 for n, d in ratios]
+
+
+class _Solver:
+    def __init__(self, values: list[int], adjacency: list[int], deadline: float | None,
+                 element_cliques: list[tuple[int, ...]] | None = None):
+        self.values = values
+        self.adjacency = adjacency
+        # Известные клики, содержащие элемент (по убыванию размера) — для дешёвой оценки сверху.
+        self.element_cliques = element_cliques
+        self.deadline = deadline
+        self.memo: dict[int, _Value] = {}  # точные решения подзадач
+        self.bounds: dict[int, int] = {}  # доказанные оценки сверху для отсечённых подзадач
+        self.exact = True
+        self.subproblems = 0
+
+    @staticmethod
+    def _bits(mask: int) -> Iterator[int]:
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def upper_bound(self, mask: int) -> int:
+        """ Оценка сверху по жадному покрытию кликами: из клики берётся не более одного элемента. """
+        if (solution := self.memo.get(mask)) is not None:
+            return solution[0]
+        values, adjacency = self.values, self.adjacency
+        order = sorted(self._bits(mask), key=values.__getitem__, reverse=True)
+
+        if (element_cliques := self.element_cliques) is not None:
+            # Элемент покрыт, если уже открыта клика, содержащая его; иначе открывается его наибольшая клика.
+            opened = set()
+            bound = 0
+            for i in order:
+                if opened.isdisjoint(element_cliques[i]):
+                    bound += values[i]
+                    opened.update(element_cliques[i][:1])
+            return min(bound, self.bounds.get(mask, bound))
+
+        cliques: list[list[int]] = []  # [маска общих соседей всех членов клики, ценность первого = наибольшая]
+        for i in order:
+            for clique in cliques:
+                if clique[0] >> i & 1:
+                    clique[0] &= adjacency[i]
+                    break
+            else:
+                cliques.append([adjacency[i] & mask, values[i]])
+        bound = sum(top for _, top in cliques)
+        return min(bound, self.bounds.get(mask, bound))
+
+    def greedy(self, mask: int) -> _Value:
+        """ Жадно: сначала более ценные элементы, при равенстве — с меньшим числом накладок. """
+        values, adjacency = self.values, self.adjacency
+        order = sorted(self._bits(mask), key=lambda i: (-values[i], (adjacency[i] & mask).bit_count(), i))
+        value, chosen, blocked = 0, 0, 0
+        for i in order:
+            if not blocked >> i & 1:
+                value += values[i]
+                chosen |= 1 << i
+                blocked |= adjacency[i]
+        return value, chosen
+
+    def solve(self, mask: int, need: int, depth: int = 0) -> _Value | None:
+        """ Лучшая раскладка элементов маски, если её ценность больше `need`; иначе None. """
+        if (solution := self.memo.get(mask)) is not None:
+            return solution if solution[0] > need else None
+        if not mask:
+            return (0, 0) if need < 0 else None
+
+        taken_value, taken, rest = self.reduce(mask)
+        if rest != mask:
+            sub = self.solve(rest, need - taken_value, depth)
+            solution = None if sub is None else (sub[0] + taken_value, sub[1] | taken)
+            if self.exact and solution is not None:
+                self.memo[mask] = solution
+            return solution
+
+        components = split_mask_into_components(mask, self.adjacency)
+        if len(components) == 1:
+            solution = self._solve_connected(mask, need, depth)
+        else:
+            # Компоненты независимы: порог для очередной — с учётом уже решённых и оценок остальных.
+            bounds = [self.upper_bound(component) for component in components]
+            rest = sum(bounds)
+            value, chosen = 0, 0
+            for component, bound in zip(components, bounds):
+                rest -= bound
+                sub = self.solve(component, need - value - rest, depth)
+                if sub is None:
+                    solution = None
+                    break
+                value, chosen = value + sub[0], chosen | sub[1]
+            else:
+                solution = (value, chosen)
+
+        if not self.exact:
+            pass  # после жадного довычисления ни решения, ни оценки подзадач не доказаны
+        elif solution is None:
+            self.bounds[mask] = min(need, self.bounds.get(mask, need))
+        else:
+            self.memo[mask] = solution
+        return solution
+
+    def reduce(self, mask: int) -> tuple[int, int, int]:
+        """ Упрощение подзадачи без ветвления (повторяется до неподвижной точки):
+            • элемент, который не легче всех своих соседей вместе взятых, берётся сразу;
+            • если соседи элемента попарно накладываются друг на друга (образуют клику),
+              то соседи не тяжелее его выбрасываются: в любой раскладке такого соседа можно заменить этим элементом.
+        Returns: (ценность взятых, маска взятых, маска оставшихся). """
+        values, adjacency = self.values, self.adjacency
+        taken_value, taken = 0, 0
+        # очередь проверки: упрощение меняет соседство только у соседей выброшенных элементов
+        queue, queued = list(self._bits(mask)), mask
+        while queue:
+            i = queue.pop()
+            queued &= ~(1 << i)
+            if not mask >> i & 1:
+                continue  # уже выброшен
+            neighbours = adjacency[i] & mask
+
+            removed = 0
+            surplus = values[i]
+            for j in self._bits(neighbours):
+                surplus -= values[j]
+                if surplus < 0:
+                    break
+            else:
+                taken_value += values[i]
+                taken |= 1 << i
+                removed = neighbours | 1 << i
+            if not removed and all(neighbours & ~adjacency[j] == 1 << j for j in self._bits(neighbours)):
+                for j in self._bits(neighbours):
+                    if values[j] <= values[i]:
+                        removed |= 1 << j
+
+            if removed:
+                mask &= ~removed
+                for r in self._bits(removed):
+                    for j in self._bits(adjacency[r] & mask & ~queued):
+                        queue.append(j)
+                        queued |= 1 << j
+        return taken_value, taken, mask
+
+    def solve_tree(self, mask: int) -> _Value:
+        """ Точное решение для компоненты без циклов: динамика по дереву, от листьев к корню. """
+        values, adjacency = self.values, self.adjacency
+        root = (mask & -mask).bit_length() - 1
+        order, parent = [root], {root: -1}
+        for i in order:  # обход в ширину; список растёт по ходу
+            for j in self._bits(adjacency[i] & mask):
+                if j != parent[i]:
+                    parent[j] = i
+                    order.append(j)
+
+        # лучшее решение поддерева: с корнем поддерева и без него
+        with_i: dict[int, _Value] = {}
+        without_i: dict[int, _Value] = {}
+        for i in reversed(order):
+            value_with, chosen_with, value_without, chosen_without = values[i], 1 << i, 0, 0
+            for j in self._bits(adjacency[i] & mask):
+                if j == parent[i]:
+                    continue
+                value_with += without_i[j][0]
+                chosen_with |= without_i[j][1]
+                best = max(with_i[j], without_i[j], key=lambda solution: solution[0])
+                value_without += best[0]
+                chosen_without |= best[1]
+            with_i[i] = (value_with, chosen_with)
+            without_i[i] = (value_without, chosen_without)
+        return max(with_i[root], without_i[root], key=lambda solution: solution[0])
+
+    def _solve_connected(self, mask: int, need: int, depth: int) -> _Value | None:
+        self.subproblems += 1
+        values, adjacency = self.values, self.adjacency
+
+        if mask & (mask - 1) == 0:
+            # один элемент
+            value = values[mask.bit_length() - 1]
+            return (value, mask) if value > need else None
+
+        # Связная компонента без циклов: рёбер на одно меньше, чем элементов.
+        degrees = sum((adjacency[i] & mask).bit_count() for i in self._bits(mask))
+        if degrees == 2 * (mask.bit_count() - 1):
+            solution = self.solve_tree(mask)
+            return solution if solution[0] > need else None
+
+        if self.upper_bound(mask) <= need:
+            return None
+
+        if depth > MAX_BRANCHING_DEPTH or (self.deadline is not None and time.perf_counter() > self.deadline):
+            self.exact = False
+            solution = self.greedy(mask)
+            return solution if solution[0] > need else None
+
+        # Упрощать здесь нечего (см. `reduce`): ветвимся по элементу с наибольшим числом накладок.
+        branch, branch_degree = -1, -1
+        for i in self._bits(mask):
+            if (degree := (adjacency[i] & mask).bit_count()) > branch_degree:
+                branch, branch_degree = i, degree
+
+        # Ветвление: сначала взять элемент (это даёт хороший порог для второй ветви), затем — не брать.
+        best = None
+        bit = 1 << branch
+        sub = self.solve(mask & ~adjacency[branch] & ~bit, need - values[branch], depth + 1)
+        if sub is not None:
+            best = (sub[0] + values[branch], sub[1] | bit)
+            need = best[0]
+        sub = self.solve(mask & ~bit, need, depth + 1)
+        return best if sub is None else sub
+
+
+def find_max_weight_independent_set(
+        elements: Iterable,
+        weight: Callable[[object], float],
+        pair_compatibility_checker=None,
+        components_getter=None,
+        max_elements: int | None = None,
+        time_budget: float | None = None,
+        occupancy_getter=None,
+    ) -> MWISResult:
+    """ Наилучшая раскладка: подмножество попарно не конфликтующих элементов
+    с максимальным суммарным весом `weight(obj)`, а при равенстве — с наибольшим числом элементов.
+
+    Накладки задаются так же, как для `find_combinations_of_compatible_elements`.
+    max_elements: если найденная раскладка больше, в ней оставляются самые тяжёлые элементы.
+    time_budget: ограничение по времени, секунды; по его исчерпании решение доводится жадно.
+    """
+
+    assert pair_compatibility_checker or components_getter or occupancy_getter, "Any of parameters: `pair_compatibility_checker`, `components_getter` or `occupancy_getter` should be set!"
+
+    universe = ClashingElementSet.make(elements, components_getter, occupancy_getter)
+
+    if pair_compatibility_checker:
+        set_pair_compatibility_checker(pair_compatibility_checker)
+
+    # Порядок битов задаёт порядок ветвления, поэтому он не должен зависеть от порядка обхода множества.
+    index = MemberIndex(sorted(universe))
+    index.fill_clashing_masks()
+    members = index.elements
+
+    element_cliques = None
+    if (masks_by_component := index.masks_by_component()) is not None:
+        # Элементы с общим компонентом попарно конфликтуют, т.е. компоненты задают клики.
+        clique_sizes = {component: mask.bit_count() for component, mask in masks_by_component.items()}
+        element_cliques = [
+            tuple(sorted((c for c in el.components if clique_sizes[c] > 1), key=clique_sizes.__getitem__, reverse=True))
+            for el in members
+        ]
+
+    solver = _Solver(
+        values=_integer_values([weight(el.obj) for el in members]),
+        adjacency=[el.data.clashing_mask for el in members],
+        deadline=time.perf_counter() + time_budget if time_budget is not None else None,
+        element_cliques=element_cliques,
+    )
+    everything = (1 << len(members)) - 1
+    # Жадное решение — начальный порог: точный поиск возвращает только то, что лучше него.
+    greedy = solver.greedy(everything)
+    _, chosen_mask = solver.solve(everything, greedy[0]) or greedy
+
+    if not solver.exact:
+        logger.warning(f'find_max_weight_independent_set: time/depth limit reached for {len(members)} elements, '
+                       f'the solution may be not optimal')
+
+    chosen = [el.obj for el in index.decode(chosen_mask)]
+    if max_elements is not None and len(chosen) > max_elements:
+        chosen = sorted(chosen, key=weight, reverse=True)[:max_elements]
+
+    chosen.sort()
+    return MWISResult(
+        elements=chosen,
+        weight=sum(map(weight, chosen)),
+        exact=solver.exact,
+        subproblems=solver.subproblems,
+    )
@@ -1,7 +1,13 @@
+import heapq
 from collections import deque
+from collections.abc import Callable
+from functools import cache
+from itertools import chain, count, product
+from math import prod
 
 from loguru import logger
 
+from vstuxls.clash.caching import scoped_cache
 from vstuxls.clash.clashing_element import *
 
 # Максимальная глубина рекурсии
@@ -17,18 +23,26 @@ def fill_clashing_elements(universe: 'ClashingElementSet'):
     - neighbours: independent elements sharing common clashing elements.
     """
 
+    # Накладки вычисляются побитово (см. `MemberIndex`); множества строятся в порядке обхода универсума.
+    index = MemberIndex(universe)
+    index.fill_clashing_masks()
+
     for elem in universe:
-        elem.data.globally_clashing = elem.all_clashing_among(universe)
+        elem.data.globally_clashing = ClashingElementSet(index.decode(elem.data.clashing_mask))
         elem.data.globally_independent = elem.all_independent_among(universe)
 
-    for elem in universe:
-        clashing = elem.data.globally_clashing
-        if not clashing:
-            elem.data.neighbours = set()
+    # Same as `universe.get_all_clashing()` but without clones: set operations on the same objects
+    # compare them by identity, not by `__eq__`.
+    all_clashing = ClashingElementSet(
+        clashing_element
+        for elem in universe
+        for clashing_element in elem.data.globally_clashing
+    )
 
+    for elem in universe:
         independent: ClashingElementSet = elem.data.globally_independent # type: ignore
         # clashing twice, filtered by (limited to) independent
-        elem.data.neighbours = ClashingElementSet(universe.get_all_clashing() & independent)
+        elem.data.neighbours = ClashingElementSet(all_clashing & independent)
         # elem.data.neighbours.remove(elem)  # not a neighbour of itself.
 
     return universe
@@ -213,7 +227,7 @@ def resolve_clashes5_iterative(clashing_set: 'ClashingElementSet',
     return final_arrangements
 
 
-@cache
+@scoped_cache
 def resolve_clashes5(
     clashing_set: "ClashingElementSet", element_limit=None, _depth=0
 ) -> set[Arrangement] | set["ClashingElementSet"]:
@@ -291,3 +305,114 @@ def resolve_clashes5(
                 arrangements.add(Arrangement(ready | sa))
 
     return arrangements
+
+
+def split_into_components(universe: 'ClashingElementSet') -> list['ClashingElementSet']:
+    """ Связные компоненты графа накладок (в порядке обхода универсума).
+    Элементы разных компонент между собой не конфликтуют, так что раскладки компонент ищутся независимо,
+    а раскладки всего универсума — всевозможные объединения раскладок компонент, по одной от каждой. """
+    index = MemberIndex(universe)
+    index.fill_clashing_masks()
+    return [ClashingElementSet(index.decode(mask)) for mask in index.connected_components()]
+
+
+@scoped_cache
+def resolve_component(component: 'ClashingElementSet', relation: Callable | None = None,
+                      element_limit=None) -> tuple[tuple, ...]:
+    """ Раскладки одной связной компоненты в виде кортежей исходных объектов (отсортированы для стабильности).
+
+    Кэшируется в текущей области (`clash_cache_scope`) по составу компоненты (исходным объектам)
+    и способу определения накладок `relation` (components_getter или pair_compatibility_checker),
+    так что повторяющиеся в пределах области кластеры накладок разрешаются один раз.
+    """
+    if len(component) <= 1:
+        return tuple(component.get_bare_objs()),
+    fill_clashing_elements(component)
+    return tuple(sorted(
+        tuple(arrangement.get_bare_objs())
+        for arrangement in resolve_clashes5(component, element_limit)
+    ))
+
+
+def _add_scores(a, b):
+    """ Сумма оценок: чисел или кортежей чисел (поэлементно). """
+    if isinstance(a, tuple):
+        return tuple(x + y for x, y in zip(a, b))
+    return a + b
+
+
+def _negated_score(a):
+    if isinstance(a, tuple):
+        return tuple(-x for x in a)
+    return -a
+
+
+class ArrangementProduct:
+    """ Все раскладки универсума без их материализации:
+    декартово произведение раскладок связных компонент (`parts`), объединяемых по одной от каждой.
+    """
+    parts: list[tuple[tuple, ...]]
+
+    def __init__(self, parts: Iterable[tuple[tuple, ...]]):
+        self.parts = list(parts)
+
+    def __len__(self) -> int:
+        return prod(len(part) for part in self.parts)
+
+    def __iter__(self) -> Iterator[list]:
+        for combination in product(*self.parts):
+            yield sorted(chain.from_iterable(combination))
+
+    def count_of_parts(self) -> int:
+        """ Сколько раскладок найдено по всем компонентам (без перемножения). """
+        return sum(len(part) for part in self.parts)
+
+    def best(self, key: Callable[[tuple], object]) -> list:
+        """ Лучшая по `key` раскладка, выбранная в каждой компоненте отдельно.
+
+        Годится для ключей, согласованных с объединением: суммы по элементам, их количество
+        (и лексикографические сочетания таких) — тогда лучшая раскладка универсума
+        состоит из лучших раскладок компонент.
+        """
+        return sorted(chain.from_iterable(max(part, key=key) for part in self.parts))
+
+    def ranked(self, score: Callable[[tuple], object]) -> Iterator[list]:
+        """ Раскладки в порядке невозрастания оценки `score` — лениво, без перебора всего произведения.
+
+        Оценка раскладки компоненты — число или кортеж чисел (сравниваются лексикографически),
+        и она должна складываться по компонентам (поэлементно для кортежей):
+        сумма точностей, покрытие, количество элементов со знаком и т.п.
+        Порождение лучшими первыми: в каждой компоненте раскладки упорядочены по убыванию оценки,
+        а в куче хранится только граница перебора — наборы номеров раскладок компонент.
+        Первая выданная раскладка совпадает с `best(score)`, равные по оценке идут в порядке обнаружения.
+        """
+        # sorted(reverse=True) устойчив: равные по оценке сохраняют исходный порядок
+        parts = [sorted(((score(a), a) for a in part), key=lambda t: t[0], reverse=True) for part in self.parts]
+        if not all(parts):
+            return
+
+        def difference(a, b):
+            return _add_scores(a, _negated_score(b))
+
+        first_scores = [part[0][0] for part in parts]
+        start_score = first_scores[0] if first_scores else 0
+        for part_score in first_scores[1:]:
+            start_score = _add_scores(start_score, part_score)
+
+        tie_breaker = count()
+        start = (0,) * len(parts)
+        # (-оценка, порядок добавления, номера раскладок компонент, последняя изменённая компонента, оценка)
+        heap = [(_negated_score(start_score), next(tie_breaker), start, 0, start_score)]
+        while heap:
+            _, _, indices, last, total = heapq.heappop(heap)
+            yield sorted(chain.from_iterable(part[i][1] for part, i in zip(parts, indices)))
+
+            # Каждый набор номеров порождается ровно один раз:
+            # увеличиваются только номера компонент не левее последней изменённой.
+            for k in range(last, len(parts)):
+                i = indices[k]
+                if i + 1 < len(parts[k]):
+                    successor = indices[:k] + (i + 1,) + indices[k + 1:]
+                    successor_score = _add_scores(total, difference(parts[k][i + 1][0], parts[k][i][0]))
+                    heapq.heappush(heap, (_negated_score(successor_score), next(tie_breaker),
+                                          successor, k, successor_score))
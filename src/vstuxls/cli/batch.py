@@ -0,0 +1,150 @@
+import argparse
+import os
+from pathlib import Path
+
+from loguru import logger
+
+from vstuxls.converters.xlsx import READ_MODES
+from vstuxls.services.batch import BatchProcessor, collect_jobs
+from vstuxls.utils import Checkpointer
+
+
+def parse_args() -> argparse.Namespace:
+    root_dir = Path(__file__).resolve().parent.parent.parent.parent
+    default_grammar = root_dir / "cnf" / "grammar_root.yml"
+    default_output_base = root_dir / "data" / "output"
+    default_report_base = root_dir / "data" / "reports"
+
+    parser = argparse.ArgumentParser(
+        description="Parse all XLSX schedules in a directory (recursively) using a pool of worker processes.",
+    )
+    parser.add_argument(
+        "input_dir",
+        type=Path,
+        help="Directory to scan for XLSX files",
+    )
+    parser.add_argument(
+        "--grammar",
+        type=Path,
+        default=default_grammar,
+        help=f"Path to grammar YAML (default: {default_grammar})",
+    )
+    parser.add_argument(
+        "--output-base",
+        type=Path,
+        default=default_output_base,
+        help=f"Base directory for JSON export (default: {default_output_base})",
+    )
+    parser.add_argument(
+        "--report-base",
+        type=Path,
+        default=default_report_base,
+        help=f"Base directory for reports (default: {default_report_base})",
+    )
+    parser.add_argument(
+        "-j", "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes; 0 runs in the current process (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Max files queued in the pool at once (default: 2 x workers)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Per-file time limit in seconds (default: none)",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="Report results as soon as they are ready instead of in input order.",
+    )
+    parser.add_argument(
+        "--waves-json",
+        action="store_true",
+        help="Export wave snapshots as JSON.",
+    )
+    parser.add_argument(
+        "--waves-excel",
+        action="store_true",
+        help="Export wave snapshots as Excel copies.",
+    )
+    parser.add_argument(
+        "--no-diagnostics",
+        action="store_true",
+        help="Не сохранять parsing_diagnostics.json в папку отчёта по каждому файлу.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Сохранять рядом с parsing_diagnostics.json профиль разбора по паттернам и волнам "
+             "(parse_profile.json и parse_profile.collapsed для flame graph).",
+    )
+    parser.add_argument(
+        "--read-mode",
+        choices=READ_MODES,
+        default="streaming",
+        help="How to read workbooks: 'streaming' drops openpyxl objects after loading (default: streaming)",
+    )
+    parser.add_argument(
+        "--no-styles",
+        action="store_true",
+        help="Не извлекать стили ячеек (если грамматика не использует оформление).",
+    )
+    parser.add_argument(
+        "--no-convert",
+        action="store_true",
+        help="Не конвертировать `.xls` в `.xlsx` перед обработкой.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    if not args.no_convert:
+        from vstuxls.utils.convert import convert_all_in_dir
+        convert_all_in_dir(args.input_dir)
+
+    paths = sorted(args.input_dir.rglob("*.xlsx"))
+    logger.info("Found {} XLSX files in {}", len(paths), args.input_dir)
+
+    jobs = collect_jobs(
+        paths, args.output_base, args.report_base,
+        input_path_base=args.input_dir,
+        enable_json=args.waves_json,
+        enable_excel=args.waves_excel,
+        enable_diagnostics=not args.no_diagnostics,
+        enable_profiling=args.profile,
+        read_mode=args.read_mode,
+        with_styles=not args.no_styles,
+    )
+    processor = BatchProcessor(
+        grammar_path=args.grammar,
+        workers=args.workers,
+        max_in_flight=args.max_in_flight,
+        timeout=args.timeout,
+        ordered=not args.unordered,
+    )
+
+    ch = Checkpointer()
+    failed = []
+    for result in processor.run(jobs):
+        if result.ok:
+            logger.info("OK   {} ({} root matches, {:.1f} s)", result.job.input_path, result.root_matches, result.elapsed)
+        else:
+            logger.error("FAIL {}: {}", result.job.input_path, result.error)
+            failed.append(result)
+
+    ch.hit(f'Completed: {len(jobs) - len(failed)}/{len(jobs)} files processed')
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
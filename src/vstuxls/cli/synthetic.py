@@ -0,0 +1,64 @@
+import argparse
+from pathlib import Path
+
+from loguru import logger
+
+from vstuxls.converters.synthetic import MATERIALS_DIR, ScheduleSpec, ScheduleVocabulary, generate_schedule
+
+
+def parse_args() -> argparse.Namespace:
+    defaults = ScheduleSpec()
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic VSTU-style schedule sheet (XLSX, or TSV for TxtGrid) of given size.",
+    )
+    parser.add_argument(
+        "output",
+        type=Path,
+        help="Output file: `.xlsx` or `.tsv`",
+    )
+    parser.add_argument("--groups", type=int, default=defaults.groups,
+                        help=f"Number of student groups, i.e. columns of 4 cells (default: {defaults.groups})")
+    parser.add_argument("--weeks", type=int, default=defaults.weeks,
+                        help=f"Number of weeks (default: {defaults.weeks})")
+    parser.add_argument("--days", type=int, default=defaults.days,
+                        help=f"Week days per week (default: {defaults.days})")
+    parser.add_argument("--pairs", type=int, default=defaults.pairs,
+                        help=f"Lesson pairs per day (default: {defaults.pairs})")
+    parser.add_argument("--density", type=float, default=defaults.lesson_density,
+                        help=f"Share of busy group x pair slots (default: {defaults.lesson_density})")
+    parser.add_argument("--merged-ratio", type=float, default=defaults.merged_ratio,
+                        help=f"Share of lessons common to neighbour groups (default: {defaults.merged_ratio})")
+    parser.add_argument("--lab-ratio", type=float, default=defaults.lab_ratio,
+                        help=f"Share of half-group labs (default: {defaults.lab_ratio})")
+    parser.add_argument("--seed", type=int, default=defaults.seed,
+                        help=f"Random seed (default: {defaults.seed})")
+    parser.add_argument("--materials", type=Path, default=MATERIALS_DIR,
+                        help=f"Directory with `*unique-values.txt` and `groupnames.txt` of real schedules "
+                             f"to take cell values from (default: {MATERIALS_DIR})")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    spec = ScheduleSpec(
+        groups=args.groups,
+        weeks=args.weeks,
+        days=args.days,
+        pairs=args.pairs,
+        lesson_density=args.density,
+        merged_ratio=args.merged_ratio,
+        lab_ratio=args.lab_ratio,
+        seed=args.seed,
+        vocabulary=ScheduleVocabulary.from_materials(args.materials),
+    )
+    schedule = generate_schedule(spec)
+
+    if args.output.suffix.lower() == ".tsv":
+        args.output.write_text(schedule.to_tsv(), encoding="utf-8")
+    else:
+        schedule.save_xlsx(args.output)
+    logger.info("Saved {} ({}x{} cells, {} lessons)", args.output, schedule.width, schedule.height, len(schedule.lessons))
+
+
+if __name__ == "__main__":
+    main()
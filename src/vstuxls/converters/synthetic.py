@@ -0,0 +1,355 @@
+""" Генератор синтетических расписаний в формате ВолгГТУ (для замеров и нагрузочных тестов).
+
+Разметка повторяет реальные листы (см. tests/test_data/ОН_ФЭВТ_4 курс 2023.xlsx):
+шапка с утверждением и заголовком, строка месяцев и групп (по 4 столбца на группу),
+недели из дней (по 3 строки на пару) с календарём дат слева, занятия в столбцах групп, подвал.
+Объём задаётся параметрами `ScheduleSpec`; результат детерминирован при одинаковом `seed`.
+
+Пример:
+    schedule = generate_schedule(ScheduleSpec(groups=40, seed=1))
+    grid = schedule.to_excel_grid()      # или schedule.save_xlsx(path), schedule.to_txt_grid()
+"""
+
+import io
+import random
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Self
+
+import openpyxl
+from loguru import logger
+from openpyxl.styles import Border, Side
+from openpyxl.workbook import Workbook
+from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
+from openpyxl.worksheet.merge import MergedCellRange
+
+from vstuxls.converters.text import TxtGrid
+from vstuxls.converters.xlsx import ExcelGrid
+
+# Каталог `materials` в корне репозитория (в установленном пакете его нет, см. `ScheduleVocabulary.from_materials`).
+MATERIALS_DIR = Path(__file__).resolve().parents[3] / 'materials'
+
+MONTH_NAMES = ['январь', 'февраль', 'март', 'апрель', 'май', 'июнь',
+               'июль', 'август', 'сентябрь', 'октябрь', 'ноябрь', 'декабрь']
+WEEK_DAYS = ['ПОНЕДЕЛЬНИК', 'ВТОРНИК', 'СРЕДА', 'ЧЕТВЕРГ', 'ПЯТНИЦА', 'СУББОТА']
+HOURS = [' 1- 2', '3- 4', '5- 6', '7- 8', ' 9-10', ' 11-12']
+
+# columns: 5 month columns, week day, hours; then groups
+MONTHS_IN_SEMESTER = 5
+FIRST_GROUP_X = 7
+GROUP_WIDTH = 4
+ROWS_PER_PAIR = 3
+HEADER_Y = 5
+
+_TEACHER_RE = re.compile(
+    r'(?:(?:доц|проф|ст\.\s?пр|асс|преп)\.\s*)?[А-ЯЁ][а-яё]+(?:-[А-ЯЁ][а-яё]+)?\s+[А-ЯЁ]\.\s?[А-ЯЁ]\.')
+_ROOM_RE = re.compile(r'(?:[АБВ][- ]?\s?)?\d{3,4}[а-яё]?(?:-\d)?')
+# строки-продолжения длинных названий ("И ТЕОРИЯ ...", "В ПРОФ. ...") не берём
+_DISCIPLINE_RE = re.compile(r'(?![А-ЯЁ]{1,2}\s)[А-ЯЁ][А-ЯЁ .,\-]{4,}[А-ЯЁ.]')
+_GROUP_RE = re.compile(r'[А-ЯЁ][А-ЯЁа-яё]{0,3}-\d{3}')
+
+
+@dataclass
+class ScheduleVocabulary:
+    """ Значения ячеек, из которых составляется расписание. """
+    groups: list[str]
+    disciplines: list[str]
+    teachers: list[str]
+    rooms: list[str]
+
+    @classmethod
+    def from_materials(cls, materials_dir: Path = MATERIALS_DIR) -> Self:
+        """ Collect values from `*unique-values.txt` and `groupnames.txt` of real schedules;
+            built-in values are used for anything not found there. """
+        builtin = cls.builtin()
+        if not materials_dir.is_dir():
+            logger.warning("Materials directory {} not found; using the built-in vocabulary of synthetic schedules.",
+                           materials_dir)
+            return builtin
+
+        lines = set()
+        for path in sorted(materials_dir.glob('*unique-values.txt')):
+            lines.update(line.strip() for line in path.read_text(encoding='utf-8').splitlines())
+
+        group_names = materials_dir / 'groupnames.txt'
+        groups = sorted({
+            line.strip()
+            for line in (group_names.read_text(encoding='utf-8').splitlines() if group_names.exists() else ())
+            if _GROUP_RE.fullmatch(line.strip())
+        })
+
+        def select(regex: re.Pattern, exclude=()) -> list[str]:
+            return sorted(line for line in lines if regex.fullmatch(line) and line not in exclude)
+
+        not_disciplines = {*WEEK_DAYS, 'СОГЛАСОВАНО:', 'УТВЕРЖДАЮ:'}
+        return cls(
+            groups=groups or builtin.groups,
+            disciplines=select(_DISCIPLINE_RE, not_disciplines) or builtin.disciplines,
+            teachers=select(_TEACHER_RE) or builtin.teachers,
+            rooms=select(_ROOM_RE) or builtin.rooms,
+        )
+
+    @classmethod
+    def builtin(cls) -> Self:
+        return cls(
+            groups=['ИВТ-460', 'ИВТ-463', 'ИВТ-465', 'ПрИн-466', 'ПрИн-467', 'Ф-469', 'ИИТ-473'],
+            disciplines=['ОСНОВЫ МАШИННОГО ОБУЧЕНИЯ', 'МИКРОПРОЦЕССОРЫ', 'МЕТР, СТАНД. И СЕРТ.',
+                         'ТЕРМОДИН., СТАТИСТ.', 'ДЕЛ.ОБЩЕН.В ПРОФ.', 'ФИЗ.КОНДЕНС.СОСТ.'],
+            teachers=['доц. Конченков В.И.', 'проф. Васильева В.Д.', 'ст.пр. Дмитриев А.С.',
+                      'Крючков С.В.', 'Кизим А.В.', 'Драгунов С.Е.'],
+            rooms=['В 1302', 'В 803', 'А 407', 'Б 402', '314', '422'],
+        )
+
+
+@dataclass
+class ScheduleSpec:
+    """ Параметры синтетического расписания. """
+    groups: int = 7
+    # недели (верхняя/нижняя); грамматика допускает 1..2
+    weeks: int = 2
+    # дни недели, начиная с понедельника; грамматика допускает 5..6
+    days: int = 6
+    # пары в день; при 4 и меньше даты соседних дней сливаются в одну область month_days
+    pairs: int = 6
+    # доля занятых ячеек "группа × пара"
+    lesson_density: float = 0.4
+    # доля занятий, общих для нескольких соседних групп (объединённые ячейки через группы)
+    merged_ratio: float = 0.2
+    # доля лабораторных (полгруппы, две пары подряд)
+    lab_ratio: float = 0.15
+    seed: int = 0
+    year: int = 2023
+    # первый месяц семестра (1..12)
+    first_month: int = 2
+    vocabulary: ScheduleVocabulary | None = field(default=None, repr=False)
+
+    def __post_init__(self):
+        assert self.groups >= 1, self.groups
+        assert 1 <= self.days <= len(WEEK_DAYS), self.days
+        assert 2 <= self.pairs <= len(HOURS), self.pairs
+        assert self.weeks >= 1, self.weeks
+
+
+@dataclass(frozen=True)
+class PlacedCell:
+    """ Ячейка листа (возможно объединённая), координаты 0-based. """
+    x: int
+    y: int
+    w: int
+    h: int
+    text: str
+    # рамка по границе ячейки (как в таблице расписания)
+    bordered: bool = True
+
+
+@dataclass
+class SyntheticSchedule:
+    spec: ScheduleSpec
+    cells: list[PlacedCell]
+    # области занятий (с названием дисциплины); общее для нескольких групп занятие — одна область
+    lessons: list[PlacedCell]
+
+    @property
+    def width(self) -> int:
+        return max(c.x + c.w for c in self.cells)
+
+    @property
+    def height(self) -> int:
+        return max(c.y + c.h for c in self.cells)
+
+    def to_workbook(self) -> Workbook:
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Расписание'
+        thin = Side(style='thin')
+        border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        merged = []
+        for c in self.cells:
+            cell = ws.cell(row=c.y + 1, column=c.x + 1, value=c.text)
+            if c.bordered:
+                cell.border = border
+            if c.w > 1 or c.h > 1:
+                # `ws.merge_cells()` checks overlaps with all ranges merged before, which is quadratic,
+                # and generated cells never overlap. Only the top-left cell of the range has been created,
+                # so `format()` is all that is left: it adds the covered cells and copies the borders.
+                mcr = MergedCellRange(ws, CellRange(min_col=c.x + 1, min_row=c.y + 1,
+                                                    max_col=c.x + c.w, max_row=c.y + c.h).coord)
+                mcr.format()
+                merged.append(mcr)
+        ws.merged_cells = MultiCellRange(merged)
+        return wb
+
+    def save_xlsx(self, path: str | Path) -> Path:
+        path = Path(path)
+        self.to_workbook().save(path)
+        return path
+
+    def to_excel_grid(self) -> ExcelGrid:
+        # round trip through xlsx bytes: a workbook created in memory has no theme that styles refer to
+        buffer = io.BytesIO()
+        self.to_workbook().save(buffer)
+        buffer.seek(0)
+        return ExcelGrid(openpyxl.load_workbook(buffer).active)
+
+    def to_tsv(self) -> str:
+        """ Text table for `TxtGrid`: text of a merged cell goes to its top-left corner only.
+            Merged areas are lost, so the table suits loading/classification, not parsing with the VSTU grammar. """
+        rows = [[''] * self.width for _ in range(self.height)]
+        for c in self.cells:
+            rows[c.y][c.x] = c.text.replace('\t', ' ').replace('\n', ' ')
+        return ''.join('\t'.join(row) + '\n' for row in rows)
+
+    def to_txt_grid(self) -> TxtGrid:
+        return TxtGrid(self.to_tsv())
+
+
+def generate_schedule(spec: ScheduleSpec) -> SyntheticSchedule:
+    return _ScheduleBuilder(spec).build()
+
+
+class _ScheduleBuilder:
+    def __init__(self, spec: ScheduleSpec):
+        self.spec = spec
+        self.rnd = random.Random(spec.seed)
+        self.vocabulary = spec.vocabulary or ScheduleVocabulary.from_materials()
+        self.cells: list[PlacedCell] = []
+        self.lessons: list[PlacedCell] = []
+        self.group_names = self._pick_group_names()
+        self.months = [(spec.first_month - 1 + i) % 12 + 1 for i in range(MONTHS_IN_SEMESTER)]
+
+    def build(self) -> SyntheticSchedule:
+        spec = self.spec
+        self._add_approval_header()
+        self._add_months_and_groups(HEADER_Y)
+
+        y = HEADER_Y + 1
+        week_height = spec.days * spec.pairs * ROWS_PER_PAIR
+        for week in range(spec.weeks):
+            self._add_week(week, y)
+            y += week_height + 1  # one row between weeks
+
+        y -= 1
+        self._add_months_and_groups(y)
+        self._add_footer(y + 1)
+        return SyntheticSchedule(spec, self.cells, self.lessons)
+
+    def _add(self, x: int, y: int, w: int, h: int, text: str, bordered: bool = True):
+        self.cells.append(PlacedCell(x, y, w, h, text, bordered))
+
+    def _pick_group_names(self) -> list[str]:
+        names = list(self.vocabulary.groups)
+        self.rnd.shuffle(names)
+        # number the extra groups if the vocabulary is not enough
+        extra = (f'{prefix}-{100 + i}' for i in range(self.spec.groups)
+                 for prefix in ('ИВТ', 'ПрИн', 'САПР', 'ИИТ'))
+        while len(names) < self.spec.groups:
+            name = next(extra)
+            if name not in names:
+                names.append(name)
+        return names[:self.spec.groups]
+
+    def _add_approval_header(self):
+        spec = self.spec
+        self._add(0, 0, 1, 1, '    УТВЕРЖДАЮ:', bordered=False)
+        self._add(0, 1, 1, 1, 'Проректор по учебной работе', bordered=False)
+        self._add(0, 2, 1, 1, '_______________И.Л. Гоник', bordered=False)
+        self._add(0, 3, 1, 1, f'"___"______________{spec.year}г.', bordered=False)
+        semester = 2 if spec.first_month < 8 else 1
+        first_year = spec.year - 1 if semester == 2 else spec.year
+        title = (f'Учебные занятия  {self.rnd.randint(1, 4)}  курса    ФЭВТ   на  {semester}  семестр   '
+                 f'{first_year}-{first_year + 1}  учебного  года')
+        self._add(8, 2, 1, 1, title, bordered=False)
+
+    def _add_months_and_groups(self, y: int):
+        for i, month in enumerate(self.months):
+            self._add(i, y, 1, 1, MONTH_NAMES[month - 1])
+        for i, name in enumerate(self.group_names):
+            self._add(FIRST_GROUP_X + i * GROUP_WIDTH, y, GROUP_WIDTH, 1, name)
+
+    def _add_footer(self, y: int):
+        self._add(0, y, 1, 1, 'СОГЛАСОВАНО:', bordered=False)
+        self._add(0, y + 1, 1, 1, 'Декан факультета ', bordered=False)
+        self._add(6, y + 1, 1, 1, '________________________ Авдеюк О.А.', bordered=False)
+
+    def _add_week(self, week: int, y: int):
+        spec = self.spec
+        day_height = spec.pairs * ROWS_PER_PAIR
+        for day in range(spec.days):
+            day_y = y + day * day_height
+            self._add(5, day_y, 1, day_height, WEEK_DAYS[day])
+            for pair in range(spec.pairs):
+                self._add(6, day_y + pair * ROWS_PER_PAIR, 1, ROWS_PER_PAIR, HOURS[pair])
+            self._add_month_days(week, day, day_y)
+            self._add_lessons(day_y)
+
+    def _add_month_days(self, week: int, day: int, day_y: int):
+        """ Dates of the week day in every month of the semester, for weeks of given parity
+            (dates go down in the pair rows, starting from the second pair). """
+        spec = self.spec
+        start = date(spec.year, spec.first_month, 1)
+        start += timedelta(days=(day - start.weekday()) % 7 + 7 * (week % 2))
+        by_month: dict[int, list[int]] = {}
+        current = start
+        while current.month in self.months and current < start + timedelta(days=31 * MONTHS_IN_SEMESTER):
+            by_month.setdefault(current.month, []).append(current.day)
+            current += timedelta(days=14)
+
+        for x, month in enumerate(self.months):
+            for slot, day_of_month in enumerate(by_month.get(month, [])[:spec.pairs - 1], start=1):
+                self._add(x, day_y + slot * ROWS_PER_PAIR, 1, ROWS_PER_PAIR, str(day_of_month))
+
+    def _add_lessons(self, day_y: int):
+        spec, rnd, vocab = self.spec, self.rnd, self.vocabulary
+        busy: set[tuple[int, int]] = set()  # (group, pair)
+        for pair in range(spec.pairs):
+            y = day_y + pair * ROWS_PER_PAIR
+            for group in range(spec.groups):
+                if (group, pair) in busy or rnd.random() >= spec.lesson_density:
+                    continue
+
+                x = FIRST_GROUP_X + group * GROUP_WIDTH
+                free_run = 1
+                while group + free_run < spec.groups and (group + free_run, pair) not in busy and free_run < 3:
+                    free_run += 1
+
+                kind = rnd.random()
+                if kind < spec.merged_ratio and free_run > 1:
+                    # lecture for 2-3 neighbour groups
+                    n = rnd.randint(2, free_run)
+                    discipline = rnd.choice(vocab.disciplines)
+                    self._add(x, y, GROUP_WIDTH * n, 2, discipline)
+                    self._add(x, y + 2, 1, 1, rnd.choice(vocab.teachers))
+                    self._add(x + GROUP_WIDTH * n - 1, y + 2, 1, 1, rnd.choice(vocab.rooms))
+                    busy.update((g, pair) for g in range(group, group + n))
+                    self.lessons.append(PlacedCell(x, y, GROUP_WIDTH * n, ROWS_PER_PAIR, discipline))
+                elif kind < spec.merged_ratio + spec.lab_ratio and pair + 1 < spec.pairs \
+                        and (group, pair + 1) not in busy:
+                    # labs of half-groups, two pairs long
+                    halves = [0, 1] if rnd.random() < 0.5 else [rnd.randint(0, 1)]
+                    for half in halves:
+                        self._add_lab(x + half * GROUP_WIDTH // 2, y)
+                    busy.update({(group, pair), (group, pair + 1)})
+                else:
+                    discipline = rnd.choice(vocab.disciplines)
+                    self._add(x, y, GROUP_WIDTH, 1, discipline)
+                    self._add(x, y + 2, 1, 1, rnd.choice(vocab.teachers))
+                    self._add(x + GROUP_WIDTH - 1, y + 2, 1, 1, rnd.choice(vocab.rooms))
+                    busy.add((group, pair))
+                    self.lessons.append(PlacedCell(x, y, GROUP_WIDTH, ROWS_PER_PAIR, discipline))
+
+    def _add_lab(self, x: int, y: int):
+        rnd, vocab = self.rnd, self.vocabulary
+        width = GROUP_WIDTH // 2
+        # long names are written in two lines
+        discipline = rnd.choice(vocab.disciplines)
+        words = discipline.split()
+        middle = (len(words) + 1) // 2
+        self._add(x, y, width, 1, ' '.join(words[:middle]))
+        if words[middle:]:
+            self._add(x, y + 1, width, 1, ' '.join(words[middle:]))
+        self._add(x, y + 2, width, 1, 'лаб. 4 час.')
+        self._add(x, y + 3, width, 1, rnd.choice(vocab.rooms))
+        self._add(x, y + 5, width, 1, rnd.choice(vocab.teachers))
+        self.lessons.append(PlacedCell(x, y, width, 2 * ROWS_PER_PAIR, discipline))
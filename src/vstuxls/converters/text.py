@@ -1,6 +1,6 @@
 from vstuxls.converters.abstract import AbstractGridBuilder
 from vstuxls.geom2d.point import Point
-from vstuxls.grid import Cell, Grid
+from vstuxls.grid import Cell, DenseGrid, Grid
 
 
 class TxtGrid(Grid, AbstractGridBuilder):
@@ -18,3 +18,7 @@ class TxtGrid(Grid, AbstractGridBuilder):
                     continue
                 cell = Cell(self, Point(x, y), content=content)
                 self.register_cell(cell)
+
+
+class DenseTxtGrid(DenseGrid, TxtGrid):
+    """ `TxtGrid` с плотным (массивным) хранением ячеек, см. `DenseGrid`. """
@@ -1,21 +1,44 @@
+from collections.abc import Iterable, Iterator
+from dataclasses import replace
 from pathlib import Path
 from typing import Self
 
 import openpyxl
 from openpyxl import Workbook
+from openpyxl.cell.read_only import ReadOnlyCell
 from openpyxl.styles import Color
 from openpyxl.styles.colors import COLOR_INDEX
+from loguru import logger
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+from openpyxl.worksheet.cell_range import CellRange
 from openpyxl.worksheet.worksheet import Worksheet
 
 from vstuxls.converters.abstract import AbstractGridBuilder
 from vstuxls.geom2d.point import Point
 from vstuxls.geom2d.size import Size
-from vstuxls.grid import Cell, CellStyle, Grid
+from vstuxls.grid import Cell, CellStyle, DenseGrid, Grid
 from vstuxls.utils.openpyxl_colorconvert import theme_and_tint_to_rgb
 
+# Однопроходное чтение в режиме 'streaming' опирается на внутренности openpyxl (проверено с openpyxl 3.1.5):
+# `WorkSheetParser`, `ReadOnlyWorksheet._get_source()`, `._shared_strings` и `Workbook._date_formats`.
+# Если их нет, лист читается в обычном режиме (см. `ExcelGrid._load_cells_streaming`).
+try:
+    from openpyxl.worksheet._reader import WorkSheetParser
+except ImportError:
+    WorkSheetParser = None
+
 COORD_PAD = 1  # Use to turn Excel's 1-based coordinates to 0-based indices.
 # COORD_PAD = 0  # Use to keep coordinates as-is.
 
+# Режимы чтения книги в `ExcelGrid.read_xlsx`:
+#  full — обычная загрузка openpyxl, ссылки на исходные ячейки сохраняются в `cell.data`;
+#  streaming — read-only режим openpyxl, один проход по листу, объекты openpyxl не удерживаются.
+READ_MODES = ('full', 'streaming')
+
+# Ключ стиля ячейки: индексы шрифта, заливки и рамки в таблицах стилей книги.
+# Только от них зависит `CellStyle`, поэтому ячейки с одинаковым ключом разделяют один экземпляр стиля.
+StyleKey = tuple[int, int, int]
+
 
 def get_rgb(color: Color, wb: Workbook) -> str | None:
     """
@@ -49,24 +72,137 @@ def get_rgb(color: Color, wb: Workbook) -> str | None:
     return None  # Если ничего не найдено
 
 
+class MergedCellsIndex:
+    """ Поиск объединённой области по координатам любой покрытой ею ячейки за O(1).
+    Lookup of a merged range by (row, column) of any cell it covers (1-based, as in openpyxl).
+
+    Заменяет перебор всех `worksheet.merged_cells.ranges` для каждой ячейки листа:
+    объединённые области не пересекаются, поэтому размер индекса не превышает площади листа.
+    """
+    ranges: list[CellRange]
+    # openpyxl-ячейки в левых верхних углах областей, встреченные при обходе листа.
+    anchor_cells: dict[tuple[int, int], object]
+
+    def __init__(self, ranges: Iterable[CellRange] = ()) -> None:
+        self.ranges = list(ranges)
+        self.anchor_cells = {}
+        self._covering: dict[tuple[int, int], CellRange] = {}
+        for merged_range in self.ranges:
+            for row in range(merged_range.min_row, merged_range.max_row + 1):
+                for col in range(merged_range.min_col, merged_range.max_col + 1):
+                    self._covering[(row, col)] = merged_range
+
+    @classmethod
+    def of_worksheet(cls, worksheet: Worksheet) -> Self:
+        merged_cells = worksheet.merged_cells
+        return cls(merged_cells.ranges if merged_cells else ())
+
+    def get(self, row: int, col: int) -> CellRange | None:
+        return self._covering.get((row, col))
+
+    def __contains__(self, row_col: tuple[int, int]) -> bool:
+        return row_col in self._covering
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+
 class ExcelGrid(Grid, AbstractGridBuilder):
     """A Grid implementation that builds a model from an Excel worksheet using openpyxl.
-    Stores references to original openpyxl cells for style and formatting access."""
+    Stores references to original openpyxl cells for style and formatting access
+    (unless the worksheet was read in streaming mode, see `read_xlsx`).
+
+    Cell styles are interned: cells sharing font, fill & border share one `CellStyle` instance.
+    With `with_styles=False` no styles are extracted at all (`cell.style` is None, as in `TxtGrid`)."""
 
-    def __init__(self, worksheet: Worksheet) -> None:
+    def __init__(self, worksheet: Worksheet | ReadOnlyWorksheet, source_path: str | Path | None = None,
+                 with_styles: bool = True) -> None:
         super().__init__()
         self._worksheet = worksheet
+        self._sheet_title = worksheet.title
+        self._source_path = Path(source_path) if source_path else None
+        self._streamed = isinstance(worksheet, ReadOnlyWorksheet)
+        self._with_styles = with_styles
+        self._styles_by_key: dict[StyleKey, CellStyle] = {}
+        self._interned_styles: dict[CellStyle, CellStyle] = {}
         self._load_cells(worksheet)
+        if self._streamed:
+            # Read-only лист больше не нужен; при необходимости он будет открыт заново (см. `get_worksheet`).
+            self._worksheet = None
+
+    @property
+    def sheet_title(self) -> str:
+        return self._sheet_title
 
     @classmethod
-    def read_xlsx(cls, filepath: str | Path, _sheet=None) -> Self:
-        """ Read Grid from the first active sheet from workbook at given path.
-         TODO: implement sheet choosing.
+    def read_xlsx(cls, filepath: str | Path, sheet: str | int | None = None, mode: str = 'full',
+                  with_styles: bool = True) -> Self:
+        """ Read Grid from a sheet of workbook at given path.
+
+         `sheet`: name or 0-based index of the worksheet; the active sheet is taken by default.
+
+         `mode`: one of `READ_MODES`.
+            'full' (default) keeps the workbook and references to openpyxl cells in memory;
+            'streaming' reads the sheet in openpyxl's read-only mode in a single pass
+            and drops all openpyxl objects afterwards (less memory & time for large workbooks).
+
+         `with_styles`: set to False to skip extraction of cell styles (e.g. when the grammar does not use them).
          """
-        return ExcelGrid(openpyxl.load_workbook(Path(filepath)).active)
+        filepath = Path(filepath)
+        workbook = cls._open_workbook(filepath, mode)
+        try:
+            return cls(cls._select_worksheet(workbook, sheet), source_path=filepath, with_styles=with_styles)
+        finally:
+            if mode == 'streaming':
+                workbook.close()
 
-    def _load_cells(self, data: Worksheet) -> None:
+    @classmethod
+    def iter_sheets(cls, filepath: str | Path, mode: str = 'full', with_styles: bool = True) -> Iterator[Self]:
+        """ Yield a Grid for every worksheet of the workbook at given path (in workbook order).
+        The workbook container is opened & decompressed only once. See `read_xlsx` for `mode` & `with_styles`. """
+        filepath = Path(filepath)
+        workbook = cls._open_workbook(filepath, mode)
+        try:
+            for worksheet in workbook.worksheets:
+                yield cls(worksheet, source_path=filepath, with_styles=with_styles)
+        finally:
+            if mode == 'streaming':
+                workbook.close()
+
+    @staticmethod
+    def _open_workbook(filepath: Path, mode: str) -> Workbook:
+        if mode not in READ_MODES:
+            raise ValueError(f'ExcelGrid: reading `mode` must be one of {READ_MODES}, got: `{mode}`.')
+        return openpyxl.load_workbook(filepath, read_only=(mode == 'streaming'))
+
+    @staticmethod
+    def _select_worksheet(workbook: Workbook, sheet: str | int | None) -> Worksheet | ReadOnlyWorksheet:
+        if sheet is None:
+            return workbook.active
+        if isinstance(sheet, int):
+            try:
+                return workbook.worksheets[sheet]
+            except IndexError:
+                raise IndexError(f'Workbook has {len(workbook.worksheets)} worksheet(s), cannot take one at index {sheet}.')
+        return workbook[sheet]  # KeyError for unknown name.
+
+    def get_worksheet(self) -> Worksheet:
+        """ Original (editable) worksheet of this grid.
+        If the grid was read in streaming mode, the workbook is reopened by path on first request. """
+        if self._worksheet is None:
+            if not self._source_path:
+                raise ValueError(f'Cannot reopen worksheet `{self._sheet_title}`: source path of the workbook is unknown.')
+            self._worksheet = openpyxl.load_workbook(self._source_path)[self._sheet_title]
+        return self._worksheet
+
+    def _load_cells(self, data: Worksheet | ReadOnlyWorksheet) -> None:
         """Load cells from the provided worksheet, creating Cell objects and storing openpyxl cell references."""
+        if isinstance(data, ReadOnlyWorksheet):
+            self._load_cells_streaming(data)
+            return
+
+        merged_index = MergedCellsIndex.of_worksheet(data)
+
         # Iterate through all cells in the worksheet's defined dimensions
         for row in data.iter_rows(
             min_row=1,
@@ -78,11 +214,11 @@ class ExcelGrid(Grid, AbstractGridBuilder):
                 if excel_cell.value is None:
                     continue  # Skip empty cells
 
-                is_merged = any(
-                    excel_cell.coordinate in merged_range
-                    for merged_range in data.merged_cells.ranges
-                )
-                if is_merged:
+                row_col = (excel_cell.row, excel_cell.column)
+                if merged_range := merged_index.get(*row_col):
+                    if row_col == (merged_range.min_row, merged_range.min_col):
+                        # Запомним угловую ячейку: её содержимое станет содержимым всей области.
+                        merged_index.anchor_cells[row_col] = excel_cell
                     continue
 
                 x = excel_cell.column - COORD_PAD
@@ -107,9 +243,132 @@ class ExcelGrid(Grid, AbstractGridBuilder):
                 self.register_cell(cell)
 
         # Handle merged cells
-        self._process_merged_cells()
+        self._process_merged_cells(merged_index)
+
+    @staticmethod
+    def _can_parse_streaming(data: ReadOnlyWorksheet) -> bool:
+        """ Are the openpyxl internals used by `_load_cells_streaming` available? """
+        workbook = data.parent
+        return (WorkSheetParser is not None
+                and all(hasattr(data, attr) for attr in ('_get_source', '_shared_strings'))
+                and all(hasattr(workbook, attr) for attr in ('_date_formats', '_timedelta_formats')))
+
+    def _load_cells_fallback(self, data: ReadOnlyWorksheet) -> None:
+        """ Read the sheet in full mode when the streaming parser is not available in this openpyxl version.
+        Read-only worksheets don't expose merged ranges publicly, so the workbook is reopened by path. """
+        if not self._source_path:
+            raise ValueError(f'Cannot read worksheet `{data.title}` in streaming mode with openpyxl {openpyxl.__version__}'
+                             ' and cannot reopen it: source path of the workbook is unknown.')
+        logger.warning("Streaming reader is not supported with openpyxl {}; reading `{}` in full mode.",
+                       openpyxl.__version__, self._source_path)
+        self._load_cells(openpyxl.load_workbook(self._source_path)[data.title])
+
+    def _load_cells_streaming(self, data: ReadOnlyWorksheet) -> None:
+        """Load cells from a read-only worksheet in a single pass over the sheet's XML.
+        Merged ranges are stored at the end of the sheet's XML, so cells are collected first
+        and turned into `Cell`s once the ranges are known. No openpyxl objects are kept."""
+        workbook = data.parent
+        if not self._can_parse_streaming(data):
+            self._load_cells_fallback(data)
+            return
 
-    def _create_cell_style(self, excel_cell) -> CellStyle:
+        # Непустые ячейки: (row, column, value, style_id)
+        filled: list[tuple[int, int, object, int]] = []
+        # Стили ячеек (кроме стиля по умолчанию): нужны для углов объединённых областей.
+        style_ids: dict[tuple[int, int], int] = {}
+
+        with data._get_source() as src:
+            parser = WorkSheetParser(
+                src,
+                data._shared_strings,
+                data_only=workbook.data_only,
+                epoch=workbook.epoch,
+                date_formats=workbook._date_formats,
+                timedelta_formats=workbook._timedelta_formats,
+            )
+            for _, row in parser.parse():
+                for cell_dict in row:
+                    row_col = (cell_dict['row'], cell_dict['column'])
+                    style_id = cell_dict.get('style_id') or 0
+                    if style_id:
+                        style_ids[row_col] = style_id
+                    if cell_dict['value'] is None:
+                        continue
+                    filled.append((*row_col, cell_dict['value'], style_id))
+
+        merged_cells = parser.merged_cells
+        merged_index = MergedCellsIndex(
+            CellRange(merge_cell.ref) for merge_cell in merged_cells.mergeCell
+        ) if merged_cells else MergedCellsIndex()
+
+        for row, column, value, style_id in filled:
+            excel_cell = ReadOnlyCell(data, row, column, value, style_id=style_id)
+            if merged_range := merged_index.get(row, column):
+                if (row, column) == (merged_range.min_row, merged_range.min_col):
+                    merged_index.anchor_cells[(row, column)] = excel_cell
+                continue
+
+            cell = Cell(
+                grid=self,
+                point=Point(column - COORD_PAD, row - COORD_PAD),
+                size=Size(1, 1),
+                content=str(value),
+                style=self._create_cell_style(excel_cell),
+            )
+            cell.data = {}
+            self.register_cell(cell)
+
+        # Пустые угловые ячейки: берём только стиль, не обращаясь к листу повторно.
+        for merged_range in merged_index.ranges:
+            anchor = (merged_range.min_row, merged_range.min_col)
+            if anchor not in merged_index.anchor_cells:
+                merged_index.anchor_cells[anchor] = ReadOnlyCell(
+                    data, *anchor, None, style_id=style_ids.get(anchor, 0))
+
+        self._process_merged_cells(merged_index)
+
+        # Как и openpyxl в обычном режиме (см. `MergedCellRange._get_borders`),
+        # правую и нижнюю границы объединённой ячейки берём у её правой нижней ячейки.
+        if not self._with_styles:
+            return
+        for merged_range in merged_index.ranges:
+            corner = (merged_range.max_row, merged_range.max_col)
+            if not (style_id := style_ids.get(corner)):
+                continue
+            corner_border = ReadOnlyCell(data, *corner, None, style_id=style_id).border
+            extra_borders = {
+                side
+                for side in ('right', 'bottom')
+                if (border_side := getattr(corner_border, side)) and border_side.style
+            }
+            cell = self.get_cell(Point(merged_range.min_col - COORD_PAD, merged_range.min_row - COORD_PAD))
+            if cell and extra_borders - cell.style.borders:
+                cell.style = self._intern_style(replace(cell.style, borders=cell.style.borders | extra_borders))
+
+    @staticmethod
+    def _style_key(excel_cell) -> StyleKey:
+        if isinstance(excel_cell, ReadOnlyCell):
+            style_array = excel_cell.style_array
+        else:
+            style_array = excel_cell._style
+            if style_array is None:
+                return (0, 0, 0)
+        return (style_array.fontId, style_array.fillId, style_array.borderId)
+
+    def _intern_style(self, style: CellStyle) -> CellStyle:
+        return self._interned_styles.setdefault(style, style)
+
+    def _create_cell_style(self, excel_cell) -> CellStyle | None:
+        """Get (shared) CellStyle for openpyxl cell; None if styles are not extracted."""
+        if not self._with_styles:
+            return None
+        key = self._style_key(excel_cell)
+        style = self._styles_by_key.get(key)
+        if style is None:
+            style = self._styles_by_key[key] = self._intern_style(self._extract_cell_style(excel_cell))
+        return style
+
+    def _extract_cell_style(self, excel_cell) -> CellStyle:
         """Create a CellStyle object from openpyxl cell properties."""
 
         # Initialize style attributes
@@ -155,12 +414,12 @@ class ExcelGrid(Grid, AbstractGridBuilder):
             font_color=font_color,
         )
 
-    def _process_merged_cells(self) -> None:
+    def _process_merged_cells(self, merged_index: MergedCellsIndex | None = None) -> None:
         """Process merged cell ranges, updating Cell objects with appropriate sizes."""
-        if not self._worksheet.merged_cells:
-            return
+        if merged_index is None:
+            merged_index = MergedCellsIndex.of_worksheet(self._worksheet)
 
-        for merged_range in self._worksheet.merged_cells.ranges:
+        for merged_range in merged_index.ranges:
             min_col, min_row, max_col, max_row = (
                 merged_range.min_col,
                 merged_range.min_row,
@@ -183,7 +442,9 @@ class ExcelGrid(Grid, AbstractGridBuilder):
             cell = self.get_cell(point)
             if not cell:
                 # Create a new cell if none exists (e.g., empty merged cell)
-                excel_cell = self._worksheet.cell(row=min_row, column=min_col)
+                excel_cell = merged_index.anchor_cells.get((min_row, min_col))
+                if excel_cell is None:
+                    excel_cell = self._worksheet.cell(row=min_row, column=min_col)
                 style = self._create_cell_style(excel_cell)
                 cell = Cell(
                     grid=self,
@@ -192,7 +453,7 @@ class ExcelGrid(Grid, AbstractGridBuilder):
                     content=str(excel_cell.value or ""),
                     style=style,
                 )
-                cell.data = {"openpyxl_cell": excel_cell}
+                cell.data = {} if self._streamed else {"openpyxl_cell": excel_cell}
             else:
                 # Update existing cell's size
                 cell.size = size
@@ -203,3 +464,7 @@ class ExcelGrid(Grid, AbstractGridBuilder):
     def supports_cell_merging(self) -> bool:
         """ExcelGrid supports merged cells."""
         return True
+
+
+class DenseExcelGrid(DenseGrid, ExcelGrid):
+    """ `ExcelGrid` с плотным (массивным) хранением ячеек, см. `DenseGrid`. """
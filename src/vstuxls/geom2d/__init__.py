@@ -8,8 +8,10 @@ from functools import reduce
 """
 
 from vstuxls.geom2d.box import Box
+from vstuxls.geom2d.box_index import BoxIndex, bounds_cover, box_within_bounds, region_bounds
 from vstuxls.geom2d.direction import DOWN, LEFT, RIGHT, UP, Direction
 from vstuxls.geom2d.manhattan_distance import ManhattanDistance
+from vstuxls.geom2d.occupancy import Occupancy
 from vstuxls.geom2d.open_range import open_range
 from vstuxls.geom2d.partial_box import PartialBox
 from vstuxls.geom2d.point import Point
@@ -7,7 +7,6 @@ from vstuxls.geom2d.direction import DOWN, RIGHT, Direction
 from vstuxls.geom2d.manhattan_distance import ManhattanDistance
 from vstuxls.geom2d.point import Point
 from vstuxls.geom2d.size import Size
-from vstuxls.utils import reverse_if
 
 
 class Box:
@@ -216,12 +215,11 @@ class Box:
         if isinstance(other, Box):
             if other in self or self in other:
                 return ManhattanDistance(0, 0) if per_axis else 0
-            return min(
-                corner1.manhattan_distance_to(corner2, per_axis=per_axis)
-                for corner1, corner2 in zip(
-                    self.iterate_corners(),
-                    other.iterate_corners())
-            )
+            # Минимум по парам соответственных углов: смещения по осям выбираются независимо
+            # (левые или правые стороны, верхние или нижние).
+            dx = min(abs(self.left - other.left), abs(self.right - other.right))
+            dy = min(abs(self.top - other.top), abs(self.bottom - other.bottom))
+            return ManhattanDistance(dx, dy) if per_axis else dx + dy
         raise TypeError(other)
 
     def manhattan_distance_to_touch(self, other: Point | Self, per_axis=False) -> int | ManhattanDistance:
@@ -321,6 +319,23 @@ class Box:
 
         Yields: Point
         """
+        outer, inner, outer_is_x = self.traversal_ranges(directions)
+
+        for i in outer:
+            for j in inner:
+                point = (i, j) if outer_is_x else (j, i)
+                if exclude_top_left and point == (self.x, self.y):
+                    continue
+                ###
+                # print(' → ', point)
+                ###
+                yield Point(*point)
+
+    def traversal_ranges(self, directions=(RIGHT, DOWN)) -> tuple[range, range, bool]:
+        """ Coordinate sequences for traversal of this rectangle in given `directions` (see `iterate_points`).
+
+        Returns: (outer loop coordinates, inner loop coordinates, True if outer loop goes along X axis).
+        """
         # repair `directions` if needed
         if not directions:
             directions = (RIGHT, DOWN)
@@ -350,15 +365,12 @@ class Box:
         # print((level1, level2))
         ###
 
-        for i in reverse_if(range(*level1.range), level1.flip):
-            for j in reverse_if(range(*level2.range), level2.flip):
-                point = (i, j) if level1.index == 0 else (j, i)
-                if exclude_top_left and point == (self.x, self.y):
-                    continue
-                ###
-                # print(' → ', point)
-                ###
-                yield Point(*point)
+        # Note: ranges (unlike `reversed()` iterators) can be traversed repeatedly.
+        outer, inner = (
+            range(*level.range)[::-1] if level.flip else range(*level.range)
+            for level in (level1, level2)
+        )
+        return outer, inner, level1.index == 0
 
     def project(self, direction='h') -> LinearSegment:
         """ direction: 'h' - horizontal or 'v' - vertical """
@@ -0,0 +1,149 @@
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from typing import Generic, TypeVar
+
+from vstuxls.geom2d.box import Box
+from vstuxls.geom2d.ranged_box import RangedBox
+
+T = TypeVar('T')
+
+Bounds = tuple[int | None, int | None, int | None, int | None]
+
+
+def region_bounds(region: Box | RangedBox | None) -> Bounds:
+    """ Outline of region as (left, top, right, bottom); `None` stands for an unbounded side.
+        Any box `b in region` lies within the outline. """
+    if region is None:
+        return None, None, None, None
+    if isinstance(region, RangedBox):
+        # outline of the probable area
+        return region.rx.a.start, region.ry.a.start, region.rx.b.stop, region.ry.b.stop
+    return region.left, region.top, region.right, region.bottom
+
+
+def box_within_bounds(box: Box, bounds: Bounds) -> bool:
+    """ True iff the box lies within outline `bounds` (same as `box in region` for the region's outline). """
+    x1, y1, x2, y2 = bounds
+    return (
+        (x1 is None or x1 <= box.left) and
+        (y1 is None or y1 <= box.top) and
+        (x2 is None or box.right <= x2) and
+        (y2 is None or box.bottom <= y2)
+    )
+
+
+def bounds_cover(outer: Bounds, inner: Bounds) -> bool:
+    """ True iff outline `inner` lies within outline `outer`. """
+    x1, y1, x2, y2 = outer
+    ix1, iy1, ix2, iy2 = inner
+    return (
+        (x1 is None or ix1 is not None and x1 <= ix1) and
+        (y1 is None or iy1 is not None and y1 <= iy1) and
+        (x2 is None or ix2 is not None and ix2 <= x2) and
+        (y2 is None or iy2 is not None and iy2 <= y2)
+    )
+
+
+class BoxIndex(Generic[T]):
+    """ Пространственный индекс прямоугольников: равномерная сетка корзин размером `bucket_size`.
+
+        Каждый элемент регистрируется во всех корзинах, которые задевает его прямоугольник
+        (прямоугольник рассматривается как замкнутый, т.е. касание тоже учитывается).
+        Запросы возвращают элементы в порядке добавления.
+        Подходит как `spatial_index_factory` для `GrammarMatcher`.
+    """
+    bucket_size: int
+
+    # (bucket x, bucket y) → sequence numbers of entries
+    _buckets: dict[tuple[int, int], list[int]]
+    _boxes: list[Box]
+    _items: list[T]
+    # overall extent of added boxes: left, top, right, bottom
+    _extent: tuple[int, int, int, int] | None
+
+    def __init__(self, items: Iterable[tuple[Box, T]] = (), bucket_size: int = 8):
+        assert bucket_size > 0, bucket_size
+        self.bucket_size = bucket_size
+        self._buckets = defaultdict(list)
+        self._boxes = []
+        self._items = []
+        self._extent = None
+        for box, item in items:
+            self.add(box, item)
+
+    @classmethod
+    def for_boxes(cls, items: Iterable[tuple[Box, T]]) -> 'BoxIndex[T]':
+        """ Build index with bucket size close to the average side of given boxes. """
+        items = list(items)
+        sides = sum(max(box.w, box.h) for box, _ in items)
+        bucket_size = max(1, round(sides / len(items))) if items else 8
+        return cls(items, bucket_size=bucket_size)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._items)
+
+    def add(self, box: Box, item: T):
+        seq = len(self._items)
+        self._boxes.append(box)
+        self._items.append(item)
+        bounds = box.left, box.top, box.right, box.bottom
+        for key in self._bucket_keys(bounds):
+            self._buckets[key].append(seq)
+
+        if self._extent is None:
+            self._extent = bounds
+        else:
+            x1, y1, x2, y2 = self._extent
+            self._extent = min(x1, bounds[0]), min(y1, bounds[1]), max(x2, bounds[2]), max(y2, bounds[3])
+
+    def intersecting(self, box: Box) -> list[T]:
+        """ Items whose (closed) boxes intersect or touch `box`. """
+        x1, y1, x2, y2 = bounds = box.left, box.top, box.right, box.bottom
+        return self._query(bounds, lambda b: b.left <= x2 and x1 <= b.right and b.top <= y2 and y1 <= b.bottom)
+
+    def within(self, region: Box | RangedBox) -> list[T]:
+        """ Items whose boxes are inside `region` (same as filtering by `item_box in region`). """
+        bounds = region_bounds(region)
+        return self._query(bounds, lambda b: box_within_bounds(b, bounds))
+
+    def _query(self, bounds: Bounds, accept) -> list[T]:
+        if self._extent is None:
+            return []
+        # clip query to the extent of stored boxes (also replaces unbounded ends)
+        bounds = tuple(
+            e if b is None else (max(b, e) if i < 2 else min(b, e))
+            for i, (b, e) in enumerate(zip(bounds, self._extent))
+        )
+
+        if bounds[0] > bounds[2] or bounds[1] > bounds[3]:
+            candidates = ()
+        elif self._bucket_count(bounds) >= len(self._items):
+            # query spans more buckets than there are items: plain scan is cheaper
+            candidates = range(len(self._items))
+        else:
+            seen = set()
+            for key in self._bucket_keys(bounds):
+                if bucket := self._buckets.get(key):
+                    seen.update(bucket)
+            candidates = sorted(seen)
+
+        boxes, items = self._boxes, self._items
+        return [items[seq] for seq in candidates if accept(boxes[seq])]
+
+    def _bucket_range(self, bounds: tuple[int, int, int, int]) -> tuple[range, range]:
+        s = self.bucket_size
+        x1, y1, x2, y2 = bounds
+        return range(x1 // s, x2 // s + 1), range(y1 // s, y2 // s + 1)
+
+    def _bucket_count(self, bounds: tuple[int, int, int, int]) -> int:
+        xs, ys = self._bucket_range(bounds)
+        return len(xs) * len(ys)
+
+    def _bucket_keys(self, bounds: tuple[int, int, int, int]) -> Iterator[tuple[int, int]]:
+        xs, ys = self._bucket_range(bounds)
+        for by in ys:
+            for bx in xs:
+                yield bx, by
@@ -0,0 +1,90 @@
+from collections.abc import Iterable, Iterator
+from typing import Self
+
+from vstuxls.geom2d.box import Box
+from vstuxls.geom2d.point import Point
+
+
+class Occupancy:
+    """ Множество точек на плоскости в виде битовой карты: `rows` — для каждой строки `y` маска занятых `x`
+    (бит номер x ↔ точка (x, y)).
+
+    Прямоугольник представляется одним целым на строку, а не точкой на каждую ячейку,
+    так что и построение, и проверка пересечения больших областей обходятся дёшево.
+    Точки с отрицательным x (левее сетки) не представимы: прямоугольник обрезается по x = 0
+    (ячеек там нет, занимать нечего), а явно заданная такая точка — ошибка.
+    """
+    __slots__ = ('rows',)
+
+    rows: dict[int, int]
+
+    def __init__(self, rows: dict[int, int] | None = None):
+        self.rows = {y: mask for y, mask in rows.items() if mask} if rows else {}
+
+    @classmethod
+    def from_box(cls, box: Box) -> Self:
+        left = max(box.left, 0)
+        if box.right <= left:
+            return cls()
+        mask = ((1 << (box.right - left)) - 1) << left
+        return cls(dict.fromkeys(range(box.top, box.bottom), mask))
+
+    @classmethod
+    def from_points(cls, points: Iterable[Point]) -> Self:
+        rows: dict[int, int] = {}
+        for x, y in points:
+            if x < 0:
+                raise ValueError(f"Occupancy cannot represent points with negative x: {(x, y)}")
+            rows[y] = rows.get(y, 0) | 1 << x
+        return cls(rows)
+
+    @classmethod
+    def union(cls, *occupancies: Self) -> Self:
+        rows: dict[int, int] = {}
+        for occupancy in occupancies:
+            for y, mask in occupancy.rows.items():
+                rows[y] = rows.get(y, 0) | mask
+        return cls(rows)
+
+    def __or__(self, other: Self) -> Self:
+        return self.union(self, other)
+
+    def __and__(self, other: Self | Box) -> Self:
+        """ Общие точки с другой битовой картой или с прямоугольником. """
+        if isinstance(other, Box):
+            other = Occupancy.from_box(other)
+        a, b = (self.rows, other.rows) if len(self.rows) <= len(other.rows) else (other.rows, self.rows)
+        return type(self)({y: mask & b.get(y, 0) for y, mask in a.items()})
+
+    def overlaps(self, other: Self) -> bool:
+        a, b = (self.rows, other.rows) if len(self.rows) <= len(other.rows) else (other.rows, self.rows)
+        return any(mask & b.get(y, 0) for y, mask in a.items())
+
+    def __len__(self) -> int:
+        """ Число занятых точек. """
+        return sum(mask.bit_count() for mask in self.rows.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.rows)
+
+    def __contains__(self, point: Point) -> bool:
+        x, y = point
+        return x >= 0 and bool(self.rows.get(y, 0) >> x & 1)
+
+    def iterate_points(self) -> Iterator[Point]:
+        """ Занятые точки: по строкам сверху вниз, в строке — слева направо. """
+        for y in sorted(self.rows):
+            mask = self.rows[y]
+            while mask:
+                low = mask & -mask
+                yield Point(low.bit_length() - 1, y)
+                mask ^= low
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Occupancy) and self.rows == other.rows
+
+    def __hash__(self) -> int:
+        return hash(frozenset(self.rows.items()))
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.rows!r})'
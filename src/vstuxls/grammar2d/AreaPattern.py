@@ -1,14 +1,31 @@
 from dataclasses import dataclass
+from enum import Enum
 from typing import override
 
 import vstuxls.grammar2d.Grammar as ns
 import vstuxls.grammar2d.Match2d as m2
-from vstuxls.geom2d import Box, Point
+from vstuxls.geom2d import Box, Occupancy
 from vstuxls.grammar2d.MatchRelation import MatchRelation, lt, ne
 from vstuxls.grammar2d.NonTerminal import NonTerminal
 from vstuxls.grammar2d.Pattern2d import Pattern2d, PatternRegistry
 from vstuxls.grammar2d.PatternComponent import PatternComponent
-from vstuxls.utils import sorted_list
+
+
+class ArrangementSolver(Enum):
+    """Способ выбора наилучшей раскладки непересекающихся совпадений среди кандидатов."""
+    ENUMERATE = "enumerate"  # перебор локально оптимальных раскладок (по умолчанию)
+    MWIS = "mwis"  # точный поиск независимого множества максимального веса с ограничением по времени
+
+
+# Ограничение времени точного выбора раскладки (`arrangement_solver: mwis`), секунды.
+# Без ограничения точный поиск на больших плотных графах накладок может не завершиться за разумное время.
+DEFAULT_ARRANGEMENT_TIME_BUDGET = 2.0
+
+
+class ComponentSearch(Enum):
+    """Способ подбора компонентов к совпадению-кандидату (см. `AreaPatternMatcher`)."""
+    DEPTH_FIRST = "depth_first"  # рекурсивный перебор вариантов от лучших к худшим (по умолчанию)
+    BEST_FIRST = "best_first"  # очередь с приоритетом и запоминанием исходов частичных совпадений
 
 
 @PatternRegistry.register
@@ -37,6 +54,53 @@ class AreaPattern(NonTerminal):
     """ Нужно ли после нахождения матчей-кандидатов фильтровать их для исключения накладок (False) или нет (True) """
     allows_overlapping: bool = False
 
+    """ Как выбирать наилучшую раскладку кандидатов при фильтрации (см. `ArrangementSolver`).
+    Перебор раскладок на больших наборах кандидатов переходит к эвристикам и может терять совпадения;
+    `mwis` находит точный оптимум, пока укладывается в `arrangement_time_budget` (секунды). """
+    arrangement_solver: ArrangementSolver = ArrangementSolver.ENUMERATE
+    arrangement_time_budget: float = DEFAULT_ARRANGEMENT_TIME_BUDGET
+
+    """ Как подбирать компоненты к совпадению (см. `ComponentSearch`).
+    `best_first` даёт те же совпадения, что и перебор в глубину, но не повторяет поиск из одинаковых частичных совпадений;
+    `component_beam_width` ограничивает число пробуемых вариантов каждого компонента (только для `best_first`). """
+    component_search: ComponentSearch = ComponentSearch.DEPTH_FIRST
+    component_beam_width: int | None = None
+
+    def __post_init__(self):
+        super().__post_init__()
+        if not isinstance(self.arrangement_solver, ArrangementSolver):
+            try:
+                self.arrangement_solver = ArrangementSolver(self.arrangement_solver)
+            except ValueError:
+                print(
+                    f"SYNTAX WARN: grammar pattern `{self.name}` has invalid arrangement_solver: "
+                    f"{self.arrangement_solver!r}, using '{ArrangementSolver.ENUMERATE.value}'"
+                )
+                self.arrangement_solver = ArrangementSolver.ENUMERATE
+        if not isinstance(self.arrangement_time_budget, (int, float)) or self.arrangement_time_budget < 0:
+            print(
+                f"SYNTAX WARN: grammar pattern `{self.name}` has invalid arrangement_time_budget: "
+                f"{self.arrangement_time_budget!r} (a non-negative number of seconds is expected), "
+                f"using {DEFAULT_ARRANGEMENT_TIME_BUDGET}"
+            )
+            self.arrangement_time_budget = DEFAULT_ARRANGEMENT_TIME_BUDGET
+        if not isinstance(self.component_search, ComponentSearch):
+            try:
+                self.component_search = ComponentSearch(self.component_search)
+            except ValueError:
+                print(
+                    f"SYNTAX WARN: grammar pattern `{self.name}` has invalid component_search: "
+                    f"{self.component_search!r}, using '{ComponentSearch.DEPTH_FIRST.value}'"
+                )
+                self.component_search = ComponentSearch.DEPTH_FIRST
+        if self.component_beam_width is not None and (
+                not isinstance(self.component_beam_width, int) or self.component_beam_width < 1):
+            print(
+                f"SYNTAX WARN: grammar pattern `{self.name}` has invalid component_beam_width: "
+                f"{self.component_beam_width!r}, the beam is not limited"
+            )
+            self.component_beam_width = None
+
     def __hash__(self) -> int:
         return hash(self.name)
 
@@ -83,21 +147,21 @@ class AreaPattern(NonTerminal):
         union = Box.union(*inner_boxes)
         return union
 
-    def get_points_occupied_by_match(self, match: 'm2.Match2d') -> list[Point]:
+    def get_occupancy_of_match(self, match: 'm2.Match2d') -> Occupancy:
         """ For Area: transparent if `pattern.inner_space_transparent` is True  else opaque (the default).
         """
         if not self.inner_space_transparent:
-            return super().get_points_occupied_by_match(match)
+            return super().get_occupancy_of_match(match)
 
         # Взять все занятые ВНУТРЕННИМИ компонентами позиции.
-        component_points = set()
-        for name, comp_match in match.component2match.items():
-            if self.get_component(name).inner:
-                component_points |= set(comp_match.get_occupied_points())
+        component_occupancy = Occupancy.union(*(
+            comp_match.get_occupancy()
+            for name, comp_match in match.component2match.items()
+            if self.get_component(name).inner
+        ))
 
         # Отсечь наружные части внутренних компонентов, если таковые есть (могут быть при отрицательных отступах).
-        inner_points = set(match.box.iterate_points())
-        return sorted_list(inner_points & component_points)
+        return component_occupancy & match.box
 
     # component_by_name: dict[str, PatternComponent] = None
     @property
@@ -1,3 +1,4 @@
+import heapq
 from dataclasses import dataclass
 from typing import Self
 
@@ -7,14 +8,20 @@ from loguru import logger
 # # pip install profilehooks
 # from profilehooks import profile
 import vstuxls.grammar2d.GrammarMatcher as ns
-from vstuxls.clash import find_combinations_of_compatible_elements
+from vstuxls.clash import find_component_arrangements, find_max_weight_independent_set
 from vstuxls.geom2d import Box, RangedBox
-from vstuxls.grammar2d.AreaPattern import AreaPattern
+from vstuxls.grammar2d.AreaPattern import (
+    DEFAULT_ARRANGEMENT_TIME_BUDGET,
+    AreaPattern,
+    ArrangementSolver,
+    ComponentSearch,
+)
 from vstuxls.grammar2d.Match2d import Match2d
 from vstuxls.grammar2d.MatchRelation import MatchRelation
 from vstuxls.grammar2d.Pattern2d import Pattern2d
 from vstuxls.grammar2d.PatternComponent import PatternComponent
 from vstuxls.grammar2d.PatternMatcher import PatternMatcher
+from vstuxls.grammar2d.profiling import ParseProfiler
 
 
 @dataclass(slots=True)
@@ -41,6 +48,27 @@ class PositionInMatchingPlan:
         return type(self)(self.plan, self.component_i)
 
 
+@dataclass(slots=True)
+class PartialAreaMatch:
+    """ Частичное совпадение area при поиске «лучший — первым» (`AreaPatternMatcher._best_first_matches`):
+    подобранные компоненты, рамка внутренних компонентов и область возможного расположения.
+    Дешевле клонирования `Match2d`: рамка наращивается, а `data` не копируется. """
+    component2match: dict[str, Match2d]
+    box: Box | None = None
+    ranged_box: RangedBox | None = None
+
+
+@dataclass(slots=True, eq=False)
+class _SearchNode:
+    """ Узел поиска «лучший — первым»: частичное совпадение с подобранными компонентами плана до `level` (не включая). """
+    partial: PartialAreaMatch | None
+    level: int
+    root: int | None  # ранг варианта первого компонента: ветвь, для которой ищется одно полное совпадение
+    parent: '_SearchNode | None' = None
+    key: tuple | None = None  # ключ запоминания исхода
+    pending: int = 0  # дочерние узлы, исход которых ещё неизвестен
+
+
 @dataclass
 class AreaPatternMatcher(PatternMatcher):
 
@@ -61,13 +89,20 @@ class AreaPatternMatcher(PatternMatcher):
         # Найти все матчи-кандидаты для всех паттернов-компонентов.
         # with time_report('find_match_candidates_') as ch:
         match_candidates = self.find_match_candidates_3(region)
+        profiler = self.grammar_matcher.profiler
+        if profiler:
+            profiler.add('candidates', len(match_candidates))
 
         if self.pattern.allows_overlapping:
             matches = match_candidates
         else:
             # Отсеять невозможные / конфликтующие варианты, при наличии.
             # with time_report('filter_candidates', ch) as ch:
-            matches = self.filter_candidates(match_candidates, match_limit)
+            matches = self.filter_candidates(
+                match_candidates, match_limit, profiler=profiler,
+                solver=self.pattern.arrangement_solver,
+                time_budget=self.pattern.arrangement_time_budget,
+            )
 
         # Отсеять совпадения с точностью ниже порога
         filtered_matches = []
@@ -121,11 +156,11 @@ class AreaPatternMatcher(PatternMatcher):
             if size_constraint:
                 parent_location = parent_location.restricted_by_size(*size_constraint)
 
-            if 'parent_location' not in component_match.data or component_match.data.parent_location is None:
-                # словарь не создан
-                component_match.data.parent_location = dict()
+            # словарь создаётся при первой записи
+            # (setdefault: тот же матч может одновременно использоваться паттернами разных групп волны)
+            parent_locations = component_match.data.setdefault('parent_location', {})
             # Записать в метаданные
-            component_match.data.parent_location[(self.pattern.name, pattern_component.name)] = parent_location
+            parent_locations[(self.pattern.name, pattern_component.name)] = parent_location
 
     def find_match_candidates_3(self, region: Box = None) -> list[Match2d]:
         """ Find all matches no matter if they do apply simultaneously or not.
@@ -205,11 +240,18 @@ class AreaPatternMatcher(PatternMatcher):
         # Запросим варианты главного совпадения по всем элементам первого компонента;
         # по остальным компонентам (уровням рекурсии) задан максимум 1 результат.
         first_comp_matches_count = len(plan[0][1])
-        complete_matches = self._best_matches(
-            plan.get_position(),
-            None,
-            first_comp_matches_count
-        )
+        if self.pattern.component_search is ComponentSearch.BEST_FIRST:
+            complete_matches = self._best_first_matches(
+                plan,
+                first_comp_matches_count,
+                beam_width=self.pattern.component_beam_width,
+            )
+        else:
+            complete_matches = self._best_matches(
+                plan.get_position(),
+                None,
+                first_comp_matches_count
+            )
 
         # Получить окончательную область совпадения area для всех кандидатов (с учётом потенциальных выносов)
         filtered_matches = []
@@ -251,12 +293,295 @@ class AreaPatternMatcher(PatternMatcher):
         ###
 
         rb1: RangedBox = existing_match.data.ranged_box if existing_match else None
+        distance_rb_match_list = self._rank_component_matches(component, match_list, existing_match, rb1)
+
+        # Перебираем варианты и спускаем их на уровень ниже по рекурсии.
+
+        next_level = plan_pos.component_i + 1
+        next_pos = plan.get_position(next_level)
+        can_recurse = next_level < len(plan)
+
+        complete_matches: list[Match2d] = []
+
+        for distance, combined_rb, component_match in distance_rb_match_list:
+
+            # попытаться найти полный матч из текущего частичного матча
+            if existing_match:
+                m2 = existing_match.clone()
+            else:
+                m2 = Match2d(self.pattern,
+                             box=None,
+                             precision=0,
+                             component2match={}
+                             )
+            m2.component2match[component.name] = component_match
+            m2.recalc_box()
+            # m2.precision += component_match.precision * component.weight
+            m2.data.ranged_box = combined_rb
+
+            if can_recurse:
+                sub_results = self._best_matches(next_pos, m2, 1)  # 1: expecting only one component per match.
+                complete_matches.extend(sub_results)
+            else:
+                # Последний компонент добавлен
+                complete_matches.append(m2)
+
+            if len(complete_matches) >= max_results:
+                break
+
+        if not complete_matches and component.optional:
+            # компонент опциональный, здесь его не будет
+            # (он не попал в нашу область),
+            # но матч остаётся.
+
+            if not existing_match:
+                existing_match = Match2d(
+                    self.pattern,
+                    box=None,
+                    precision=0,
+                    component2match={}
+                )
+            if can_recurse:
+                m2 = existing_match
+                sub_results = self._best_matches(next_pos, m2, 1)  # 1: expecting only one component per match.
+                complete_matches.extend(sub_results)
+            else:
+                # Последний компонент добавлен
+                complete_matches.append(existing_match)
+
+        ### logger.debug(f'_best_matches: ← leaving with {len(complete_matches)} results.')
+        ###
+        # limit & return
+        return complete_matches[:max_results]
+
+    def _best_first_matches(self,
+                            plan: MatchingPlan,
+                            max_results: int,
+                            beam_width: int | None = None) -> list[Match2d]:
+        """
+        Поиск «лучший — первым» — альтернатива рекурсивному `_best_matches` с тем же результатом
+        (при неограниченной ширине луча).
+
+        Частичные совпадения извлекаются из очереди с приоритетом по вектору рангов выбранных вариантов компонентов
+        (см. `_rank_component_matches`; пропуск опционального компонента — после всех его вариантов),
+        так что для каждого варианта первого компонента первым находится то же полное совпадение, что и при обходе в глубину.
+
+        Исход поиска из частичного совпадения (полное совпадение или его отсутствие) запоминается по ключу:
+        номер компонента, объединённая область (RangedBox), рамка и совпадения тех подобранных компонентов,
+        что связаны отношениями с оставшимися, — только от этого и зависит дальнейший поиск.
+        Так одинаковые состояния, достигнутые разными путями (например, через разные варианты или пропуски
+        опциональных компонентов), не перебираются заново.
+
+        beam_width: сколько лучших вариантов компонента пробовать для каждого частичного совпадения (None — все).
+
+        Returns list of 0 to `max_results` elements.
+        """
+        if max_results <= 0:
+            return []
+
+        related_names = self._names_related_to_rest(plan)
+        # ключ → ((добавленные компоненты, рамка, область) полного совпадения или None, удерживаемые совпадения)
+        memo: dict[tuple, tuple] = {}
+        results: dict[int, PartialAreaMatch] = {}  # по рангу варианта первого компонента
+        states = memo_hits = 0
+
+        def fail(node: _SearchNode):
+            """ Из узла полное совпадение не получить: запомнить и сообщить родителю. """
+            while node is not None:
+                if node.key is not None:
+                    memo[node.key] = (None, node.partial)
+                node = node.parent
+                if node is None:
+                    return
+                node.pending -= 1
+                if node.pending:
+                    return
+
+        def succeed(node: _SearchNode, leaf: PartialAreaMatch):
+            """ Найдено первое полное совпадение в ветви: оно же — первое для всех узлов на пути к нему. """
+            results[node.root] = leaf
+            while node is not None:
+                if node.key is not None:
+                    added = {name: m for name, m in leaf.component2match.items()
+                             if name not in node.partial.component2match}
+                    memo[node.key] = ((added, leaf.box, leaf.ranged_box), node.partial)
+                node = node.parent
+
+        top = _SearchNode(None, 0, None)
+        top_skip = None
+        queue: list[tuple[tuple[int, ...], _SearchNode]] = [((), top)]
+        while queue and len(results) < max_results:
+            path, node = heapq.heappop(queue)
+            if node.root in results or (node is top_skip and results):
+                continue
+            partial = node.partial
+
+            if node.level == len(plan):
+                # Последний компонент добавлен
+                succeed(node, partial)
+                continue
+
+            if partial is not None:
+                node.key = (
+                    node.level, partial.ranged_box, partial.box,
+                    tuple(id(partial.component2match.get(name)) for name in related_names[node.level]),
+                )
+                if (known := memo.get(node.key)) is not None:
+                    memo_hits += 1
+                    if known[0] is None:
+                        fail(node)
+                    else:
+                        added, box, ranged_box = known[0]
+                        succeed(node, PartialAreaMatch({**partial.component2match, **added}, box, ranged_box))
+                    continue
+
+            states += 1
+            component, match_list = plan[node.level]
+            ranked = self._rank_component_matches(
+                component, match_list, partial, partial.ranged_box if partial else None)
+            if beam_width is not None:
+                ranked = ranked[:beam_width]
+
+            children = [
+                (rank, self._extend_partial(partial, component, component_match, combined_rb))
+                for rank, (_, combined_rb, component_match) in enumerate(ranked)
+            ]
+            if component.optional:
+                # компонент опциональный: совпадение без него — после всех вариантов с ним
+                children.append((len(ranked), partial if partial is not None else PartialAreaMatch({})))
+
+            if not children:
+                fail(node)
+                continue
+            node.pending = len(children)
+            for rank, child_partial in children:
+                child = _SearchNode(child_partial, node.level + 1, rank if node is top else node.root, node)
+                heapq.heappush(queue, ((*path, rank), child))
+            if node is top and component.optional:
+                top_skip = child
+
+        profiler = self.grammar_matcher.profiler
+        if profiler:
+            profiler.add('search_states', states)
+            profiler.add('search_memo_hits', memo_hits)
+
+        complete_matches = []
+        for _, leaf in sorted(results.items())[:max_results]:
+            m = Match2d(self.pattern,
+                        box=leaf.box,
+                        precision=0,
+                        component2match=leaf.component2match)
+            if leaf.ranged_box is not None:
+                m.data.ranged_box = leaf.ranged_box
+            complete_matches.append(m)
+        return complete_matches
+
+    def _extend_partial(self,
+                        partial: PartialAreaMatch | None,
+                        component: PatternComponent,
+                        component_match: Match2d,
+                        combined_rb: RangedBox) -> PartialAreaMatch:
+        """ Новое частичное совпадение: с вариантом компонента и объединённой областью.
+        Рамка — объединение рамок внутренних компонентов (как `AreaPattern.recalc_box_for_match`), наращиваемое по одной. """
+        component2match = dict(partial.component2match) if partial else {}
+        component2match[component.name] = component_match
+        box = partial.box if partial else None
+        if component.inner:
+            box = Box.union(component_match.box) if box is None else Box.union(box, component_match.box)
+        if box is None:
+            # как в `AreaPattern.recalc_box_for_match`: без внутренних компонентов рамку не определить
+            raise ValueError(f"Can't calculate bounding box for pattern `{self.pattern.name}` since it has no pre-made inner components.")
+        return PartialAreaMatch(component2match, box, combined_rb)
+
+    def _names_related_to_rest(self, plan: MatchingPlan) -> list[tuple[str, ...]]:
+        """ Для каждого номера компонента в плане: имена предшествующих компонентов,
+        связанных отношениями (`_check_component_relations`) с ним или последующими. """
+        if self._component_relation_triples is None:
+            self._component_relation_triples = self.pattern.get_component_matches_relations()
+        level_of = {component.name: level for level, (component, _) in enumerate(plan.component_matches_list)}
+        spans = [
+            sorted((level_of[k1.name], level_of[k2.name]))
+            for k1, k2, _ in self._component_relation_triples
+        ]
+        return [
+            tuple(sorted({plan[first][0].name for first, last in spans if first < level <= last}))
+            for level in range(len(plan) + 1)
+        ]
+
+    @staticmethod
+    def filter_candidates(match_candidates: list[Match2d], match_limit=None,
+                          profiler: 'ParseProfiler | None' = None,
+                          solver: ArrangementSolver = ArrangementSolver.ENUMERATE,
+                          time_budget: float | None = DEFAULT_ARRANGEMENT_TIME_BUDGET) -> list[Match2d]:
+        """ Filter given matches so all returned matches do not overlap and the combination seems to be the best.
+
+        Наилучшая раскладка выбирается из соображений количества совместимых совпадений
+        и качества каждого вошедшего совпадения (фактически, максимизируется сумма precision всех совпадений).
+        match_limit: для `mwis` из лучшей раскладки без ограничения оставляются самые точные совпадения —
+            это не обязательно лучшая раскладка из не более чем `match_limit` совпадений.
+        profiler: если задан, в него добавляется число перебранных раскладок (подзадач — для `mwis`).
+        solver: перебор раскладок или точный поиск лучшей (см. `ArrangementSolver`);
+        time_budget: ограничение времени для `mwis`, секунды (None заменяется ограничением по умолчанию).
+        """
+
+        ###
+        pattern_name = match_candidates[0].pattern.name if match_candidates else None
+        logger.info(f'filtering candidates of pattern `{pattern_name}`: {len(match_candidates)}')
+        # logger.info(f'match_candidates (first 2): {match_candidates[:2]}')
+
+        if solver is ArrangementSolver.MWIS:
+            result = find_max_weight_independent_set(
+                match_candidates,
+                weight=lambda m: m.precision,
+                occupancy_getter=Match2d.get_occupied_rows,
+                max_elements=match_limit,
+                time_budget=DEFAULT_ARRANGEMENT_TIME_BUDGET if time_budget is None else time_budget,
+            )
+            if profiler:
+                profiler.add('mwis_subproblems', result.subproblems)
+            return result.elements
+
+        # Независимые кластеры накладок разрешаются по отдельности.
+        arrangements = find_component_arrangements(
+            match_candidates,
+            occupancy_getter=Match2d.get_occupied_rows,
+            max_elements=match_limit
+        )
+
+        # logger.debug(f'Number of arrangements: {arrangements.count_of_parts()}')
+        if profiler:
+            profiler.add('arrangements', arrangements.count_of_parts())
 
+        # Рассчитать точность (precision) для каждой комбинации-варианта,
+        # получив значения точности для каждого элемента в отдельности.
+        # Найти наилучшую раскладку:
+        #   макс. суммарная точность, затем
+        #   макс. кол-во, затем
+        #   лево-верхнее расположение.
+        # Суммы и количество складываются по компонентам, а самое лево-верхнее расположение объединения
+        # лучше всего, когда оно лучшее в каждой компоненте, — так что лучшая раскладка собирается из лучших
+        # раскладок компонент.
+        return arrangements.best(key=lambda arrangement: (
+            sum(m.precision for m in arrangement),
+            len(arrangement),
+            # DESC: минимальная сумма координат:
+            -min((sum(m.box.position) for m in arrangement), default=0),
+        ))
+
+    def _rank_component_matches(self,
+                                component: PatternComponent,
+                                match_list: list[Match2d],
+                                partial_match: 'Match2d | PartialAreaMatch | None',
+                                rb1: RangedBox | None) -> list[tuple[tuple, RangedBox, Match2d]]:
+        """ Варианты компонента, совместимые с частичным совпадением `partial_match` (его область — `rb1`),
+        от лучших к худшим, без слишком далёких.
+        Returns: [(расстояние, объединённая область, совпадение компонента)].
+        """
         #  not match_list and
         if not component.subpattern.independently_matchable():
             # Только сейчас стало возможно искать зависимый компонент,
             # когда часть компонентов уже известна и может подсказать его расположение
-            if existing_match:
+            if partial_match:
                 # Infer expectation for component
                 child_region = component.get_ranged_box_for_component_location(rb1)
             else:
@@ -319,13 +644,13 @@ class AreaPatternMatcher(PatternMatcher):
                 if combined_rb.empty():
                     continue
 
-            if existing_match and not self._check_component_relations(existing_match, (component, component_match)):
+            if partial_match and not self._check_component_relations(partial_match, (component, component_match)):
                 # не подошёл, дальше не рассматриваем
                 continue
 
             # Расстояние до подходящего кандидата
-            if existing_match:
-                distance = component.calc_distance_of_match_to_box(component_match, existing_match.box)
+            if partial_match:
+                distance = component.calc_distance_of_match_to_box(component_match, partial_match.box)
             else:
                 distance = (0, )  # constant, for sorting below
 
@@ -348,117 +673,8 @@ class AreaPatternMatcher(PatternMatcher):
         # Отсечка вдвое больше минимальной, но не меньше 1 (в случае, если минимальная равна нулю)
         cutoff_distance = max(min_distance * CUTOFF_COEF, CUTOFF_MIN_DIST)
 
-        # Перебираем варианты и спускаем их на уровень ниже по рекурсии.
-
-        next_level = plan_pos.component_i + 1
-        next_pos = plan.get_position(next_level)
-        can_recurse = next_level < len(plan)
-
-        complete_matches: list[Match2d] = []
-
-        for distance, combined_rb, component_match in distance_rb_match_list:
-
-            if distance[0] > cutoff_distance:
-                # отсекаем далёкие варианты (в отсортированном списке)
-                break
-
-            # попытаться найти полный матч из текущего частичного матча
-            if existing_match:
-                m2 = existing_match.clone()
-            else:
-                m2 = Match2d(self.pattern,
-                             box=None,
-                             precision=0,
-                             component2match={}
-                             )
-            m2.component2match[component.name] = component_match
-            m2.recalc_box()
-            # m2.precision += component_match.precision * component.weight
-            m2.data.ranged_box = combined_rb
-
-            if can_recurse:
-                sub_results = self._best_matches(next_pos, m2, 1)  # 1: expecting only one component per match.
-                complete_matches.extend(sub_results)
-            else:
-                # Последний компонент добавлен
-                complete_matches.append(m2)
-
-            if len(complete_matches) >= max_results:
-                break
-
-        if not complete_matches and component.optional:
-            # компонент опциональный, здесь его не будет
-            # (он не попал в нашу область),
-            # но матч остаётся.
-
-            if not existing_match:
-                existing_match = Match2d(
-                    self.pattern,
-                    box=None,
-                    precision=0,
-                    component2match={}
-                )
-            if can_recurse:
-                m2 = existing_match
-                sub_results = self._best_matches(next_pos, m2, 1)  # 1: expecting only one component per match.
-                complete_matches.extend(sub_results)
-            else:
-                # Последний компонент добавлен
-                complete_matches.append(existing_match)
-
-        ### logger.debug(f'_best_matches: ← leaving with {len(complete_matches)} results.')
-        ###
-        # limit & return
-        return complete_matches[:max_results]
-
-    @staticmethod
-    def filter_candidates(match_candidates: list[Match2d], match_limit=None) -> list[Match2d]:
-        """ Filter given matches so all returned matches do not overlap and the combination seems to be the best.
-
-        Наилучшая раскладка выбирается из соображений количества совместимых совпадений
-        и качества каждого вошедшего совпадения (фактически, максимизируется сумма precision всех совпадений).
-        """
-
-        ###
-        pattern_name = match_candidates[0].pattern.name if match_candidates else None
-        logger.info(f'filtering candidates of pattern `{pattern_name}`: {len(match_candidates)}')
-        # logger.info(f'match_candidates (first 2): {match_candidates[:2]}')
-
-        arrangements = find_combinations_of_compatible_elements(
-            match_candidates,
-            components_getter=Match2d.get_occupied_points,
-            max_elements=match_limit
-        )
-
-        # logger.debug(f'Number of arrangements: {len(arrangements)}')
-
-        # Рассчитать точность (precision) для каждой комбинации-варианта,
-        # получив значения точности для каждого элемента в отдельности.
-
-        rating_length_arrangement_list = []
-
-        # Найти наилучшую раскладку:
-        #   макс. суммарная точность, затем
-        #   макс. кол-во, затем
-        #   лево-верхнее расположение.
-        for arrangement in arrangements:
-            if not arrangement:
-                # empty
-                continue
-
-            rating_length_arrangement_list.append((
-                arrangement,  # [0]
-                sum(m.precision for m in arrangement),
-                len(arrangement),
-                # DESC: минимальная сумма координат:
-                -min((sum(m.box.position) for m in arrangement), default=0),
-            ))
-
-        best = max(
-            rating_length_arrangement_list, key=lambda t: t[1:],
-            default=([],))
-
-        return best[0]
+        # отсекаем далёкие варианты (в отсортированном списке)
+        return [t for t in distance_rb_match_list if t[0][0] <= cutoff_distance]
 
     def _check_similar_component_pairs(self, partial_match: Match2d,
                                        new_member: tuple[PatternComponent, Match2d] = None) -> bool:
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 
-from vstuxls.geom2d import RangedBox
+from vstuxls.geom2d import Box, RangedBox
 
 from vstuxls.grammar2d.ArrayPatternMatcher import ArrayPatternMatcher
 from vstuxls.grammar2d.Match2d import Match2d
@@ -9,10 +9,8 @@ from vstuxls.grammar2d.Match2d import Match2d
 @dataclass
 class ArrayInContextPatternMatcher(ArrayPatternMatcher):
 
-    def _find_element_candidates(self):
-        item_occurrences = super()._find_element_candidates()
-
-        region = self._region
+    def _find_element_candidates(self, region: Box | RangedBox = None):
+        item_occurrences = super()._find_element_candidates(region)
 
         if isinstance(region, RangedBox) and not region.is_deterministic():
             # Дополнить информацией о нахождении каждого элемента в однозначной или вероятной зоне родителя
@@ -21,10 +19,8 @@ class ArrayInContextPatternMatcher(ArrayPatternMatcher):
             min_box: RangedBox | None = None
 
             for m in item_occurrences:
-                if key1 not in m.data:
-                    touches_probable_zone_map = m.data[key1] = dict()
-                else:
-                    touches_probable_zone_map = m.data[key1]
+                # (setdefault: the same item match may be examined by concurrently matched patterns)
+                touches_probable_zone_map = m.data.setdefault(key1, {})
 
                 if region not in touches_probable_zone_map:
                     # not set yet.
@@ -40,7 +36,7 @@ class ArrayInContextPatternMatcher(ArrayPatternMatcher):
 
         return item_occurrences
 
-    def _remove_extra_matches(self, matches: list[Match2d], limit: int) -> list[Match2d]:
+    def _remove_extra_matches(self, matches: list[Match2d], limit: int, region: Box | RangedBox = None) -> list[Match2d]:
         """ Логика того, как удалить лишние элементы из кластера,
             если превышено количество элементов в кластере.
 
@@ -49,7 +45,6 @@ class ArrayInContextPatternMatcher(ArrayPatternMatcher):
             начиная с последних в списке, пока такие есть.
          """
         key1 = 'touches_probable_zone_map'
-        region = self._region
 
         for m in reversed(matches):  ## [:] ??
             if len(matches) <= limit:
@@ -65,6 +60,6 @@ class ArrayInContextPatternMatcher(ArrayPatternMatcher):
 
         if len(matches) > limit:
             # Всё ещё слишком много
-            return super()._remove_extra_matches(matches, limit)
+            return super()._remove_extra_matches(matches, limit, region)
 
         return matches
@@ -4,7 +4,7 @@ from typing import override
 from loguru import logger
 
 import vstuxls.grammar2d.Match2d as m2
-from vstuxls.geom2d import Point, open_range
+from vstuxls.geom2d import Occupancy, open_range
 from vstuxls.grammar2d.NonTerminal import NonTerminal
 from vstuxls.grammar2d.Pattern2d import Pattern2d, PatternRegistry
 from vstuxls.utils import sorted_list
@@ -84,17 +84,17 @@ class ArrayPattern(NonTerminal):
     def get_kind(cls):
         return "array"  # ???
 
-    def get_points_occupied_by_match(self, match: 'm2.Match2d') -> list[Point]:
+    def get_occupancy_of_match(self, match: 'm2.Match2d') -> Occupancy:
         """ For arrays: transparent.
         Реализация по умолчанию: взять все занятые компонентами позиции.
         """
-        component_points = set()
-        for comp_match in match.component2match.values():
-            component_points |= set(comp_match.get_occupied_points())
+        component_occupancy = Occupancy.union(*(
+            comp_match.get_occupancy()
+            for comp_match in match.component2match.values()
+        ))
 
         # Отсечь наружные части, если таковые есть (могут быть при отрицательных отступах).
-        inner_points = set(match.box.iterate_points())
-        return sorted_list(inner_points & component_points)
+        return component_occupancy & match.box
 
     def get_content_of_match(self, match: 'm2.Match2d', include_position=False) -> dict | list | str:
         """ Компактные данные для экспорта в JSON.
@@ -4,7 +4,7 @@ from itertools import product
 
 from loguru import logger
 
-from vstuxls.clash import find_combinations_of_compatible_elements, trivial_components_getter
+from vstuxls.clash import find_component_arrangements, trivial_components_getter
 from vstuxls.geom2d import DOWN, RIGHT, Box, Direction, Point, RangedBox, VariBox, open_range
 from vstuxls.grammar2d import ArrayPattern
 from vstuxls.grammar2d.Match2d import Match2d
@@ -15,7 +15,6 @@ from vstuxls.grammar2d.PatternMatcher import PatternMatcher
 class ArrayPatternMatcher(PatternMatcher):
     pattern: ArrayPattern
 
-    _region: Box | RangedBox = None
     _neighbours: dict[Box, set[Box]] = None
     _not_neighbours: dict[Box, set[Box]] = None
 
@@ -24,11 +23,8 @@ class ArrayPatternMatcher(PatternMatcher):
         If a region is given, find all matches within the region.
         Note: `match_limit` relates to count of matches returned (not number of items in a match).
         """
-        # Dev WARN: setting this param as instance property may be thread-unsafe
-        #  (if one matcher instance is used to match different regions at once).
-        self._region = region
-
-        item_occurrences = self._find_element_candidates()
+        # region is passed along (not stored in the instance) to keep matcher re-entrant.
+        item_occurrences = self._find_element_candidates(region)
 
         if not item_occurrences:
             return []
@@ -74,14 +70,14 @@ class ArrayPatternMatcher(PatternMatcher):
 
         return filtered_matches
 
-    def _find_element_candidates(self):
+    def _find_element_candidates(self, region: Box | RangedBox = None):
         item = self.pattern.subpattern
         gm = self.grammar_matcher
 
-        item_occurrences = gm.get_pattern_matches(item, self._region)
+        item_occurrences = gm.get_pattern_matches(item, region)
         return item_occurrences or []
 
-    def _remove_extra_matches(self, matches: list[Match2d], limit: int) -> list[Match2d]:
+    def _remove_extra_matches(self, matches: list[Match2d], limit: int, region: Box | RangedBox = None) -> list[Match2d]:
         """ Логика того, как удалить лишние элементы из кластера,
             если превышено количество элементов в кластере.
             (Здесь реализация тривиальная, см. подклассы.)
@@ -506,21 +502,22 @@ class ArrayPatternMatcher(PatternMatcher):
             for boxes in q2boxes.values()
         }
 
-        arrangements: list[list[list[Box]]] = find_combinations_of_compatible_elements(
+        arrangements = find_component_arrangements(
             subcluster_set,
             components_getter=trivial_components_getter,
             max_elements=count_range.stop
         )
+        if profiler := self.grammar_matcher.profiler:
+            profiler.add('arrangements', arrangements.count_of_parts())
 
         # 3.2) Проранжировать итоговые кластеры —
-        # оставить максимальное покрытие и наиболее крупные (меньше по количеству самих кластеров)
-        best_subclusters = max(
-            arrangements,
-            key=lambda subcluster: (
+        # оставить максимальное покрытие и наиболее крупные (меньше по количеству самих кластеров).
+        # Оценка складывается по компонентам, так что достаточно первой раскладки из ранжированных.
+        best_subclusters = next(arrangements.ranked(
+            score=lambda subcluster: (
                 sum(len(item) for item in subcluster),  # ↑ покрытие
                 -len(subcluster),  # ↓ фрагментированность
-            ),
-            default=[])
+            )), [])
 
         return best_subclusters
 
@@ -756,21 +753,22 @@ class ArrayPatternMatcher(PatternMatcher):
             for boxes in q2boxes.values()
         }
 
-        arrangements: list[list[list[Box]]] = find_combinations_of_compatible_elements(
+        arrangements = find_component_arrangements(
             subcluster_set,
             components_getter=trivial_components_getter,
             max_elements=count_range.stop
         )
+        if profiler := self.grammar_matcher.profiler:
+            profiler.add('arrangements', arrangements.count_of_parts())
 
         # 3.2) Проранжировать итоговые кластеры —
-        # оставить максимальное покрытие и наиболее крупные (меньше по количеству самих кластеров)
-        best_subclusters = max(
-            arrangements,
-            key=lambda subcluster: (
+        # оставить максимальное покрытие и наиболее крупные (меньше по количеству самих кластеров).
+        # Оценка складывается по компонентам, так что достаточно первой раскладки из ранжированных.
+        best_subclusters = next(arrangements.ranked(
+            score=lambda subcluster: (
                 sum(len(item) for item in subcluster),  # ↑ покрытие
                 -len(subcluster),  # ↓ фрагментированность
-            ),
-            default=[])
+            )), [])
 
         return best_subclusters
 
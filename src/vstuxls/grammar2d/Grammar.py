@@ -9,11 +9,16 @@ from loguru import logger
 import vstuxls.grammar2d.PatternComponent as pc
 from vstuxls.grammar2d.Pattern2d import Pattern2d, read_pattern
 from vstuxls.grammar2d.Terminal import Terminal
-from vstuxls.string_matching import CellType, read_cell_types
+from vstuxls.string_matching import CellClassifier, CellType, read_cell_types
 from vstuxls.utils import WithCache, find_file_under_path
 
 TARGET_MODES = ('root', 'all')
 
+# Сколько различных текстов ячеек помнит общий классификатор грамматики (LRU).
+# Документ расписания содержит сотни различных строк, так что кэш переиспользуется между документами,
+# но не растёт неограниченно в долгоживущих процессах пакетной обработки.
+CELL_CLASSIFIER_CACHE_SIZE = 10_000
+
 
 @dataclass
 class Grammar(WithCache):
@@ -27,6 +32,9 @@ class Grammar(WithCache):
     # root: оптимизировать процесс для корневого, all: искать все подряд
     target_mode: str = 'root'  # или 'all'
 
+    # размер кэша классификатора ячеек (см. `CellClassifier.cache_size`; None — неограниченный)
+    cell_classifier_cache_size: int | None = CELL_CLASSIFIER_CACHE_SIZE
+
     _root: Pattern2d  | None = None
 
     def __post_init__(self):
@@ -88,16 +96,62 @@ class Grammar(WithCache):
     __repr__ = __str__
 
     def get_effective_cell_types(self) -> dict[str, CellType]:
-        """ Get cell types only used for matching, i.e. omit unused ones. """
+        """ Get cell types only used for matching, i.e. omit unused ones
+            (in `root` target mode, also ones used only by patterns unreachable from root). """
+        reachable = self.reachable_patterns()
         effective_cell_types = {}
+        pruned_cell_types = set()
         for pattern in self.patterns.values():
             if isinstance(pattern, Terminal):
                 requested_cell_type = pattern.cell_type.name
                 assert requested_cell_type in self.cell_types, \
                     f"Used undeclared cell type {requested_cell_type} for pattern {pattern.name}."
-                effective_cell_types[requested_cell_type] = self.cell_types[requested_cell_type]
+                if pattern in reachable:
+                    effective_cell_types[requested_cell_type] = self.cell_types[requested_cell_type]
+                else:
+                    pruned_cell_types.add(requested_cell_type)
+
+        # a cell type shared with a reachable terminal is still needed
+        pruned_cell_types -= effective_cell_types.keys()
+        if pruned_cell_types:
+            logger.info(f'INFO: skipping {len(pruned_cell_types)} cell type(s) used only by patterns unreachable from root: {
+                sorted(pruned_cell_types)}.')
         return effective_cell_types
 
+    def reachable_patterns(self) -> set[Pattern2d]:
+        """ Patterns needed to match the root: its dependencies (recursively)
+            and patterns extending any of them (their matches are also matches of the base).
+            In `all` target mode, all patterns of the grammar. """
+        if not self._cache.reachable_patterns:
+            if self.target_mode != 'root':
+                reachable = set(self.patterns.values())
+            else:
+                if not self.root_name:
+                    # root is inferred there
+                    self.dependency_waves()
+
+                extension_map = self.extension_map
+                reachable = {self.root}
+                stack = [self.root]
+                while stack:
+                    pattern = stack.pop()
+                    for dep in (*pattern.dependencies(recursive=False), *extension_map.get(pattern, ())):
+                        if dep not in reachable:
+                            reachable.add(dep)
+                            stack.append(dep)
+            self._cache.reachable_patterns = reachable
+        return self._cache.reachable_patterns
+
+    def get_cell_classifier(self) -> CellClassifier:
+        """ Classifier over effective cell types, shared by all documents parsed with this grammar
+            so that its memo of cell texts is reused between them. """
+        if not self._cache.cell_classifier:
+            self._cache.cell_classifier = CellClassifier(
+                self.get_effective_cell_types().values(),
+                cache_size=self.cell_classifier_cache_size,
+            )
+        return self._cache.cell_classifier
+
     # dependency_waves: list[set[Pattern2d]] = None
 
     # @property
@@ -141,7 +195,7 @@ class Grammar(WithCache):
                         raise ValueError(
                             f'Grammar root is not specified and cannot be inferred automatically. Suggested options: {waves[-1]}.')
                 elif not self.root_name:
-                    top_elem = waves[-1][0]
+                    top_elem = next(iter(waves[-1]))
                     self.root_name = top_elem.name
                     self._root = top_elem
                     logger.info(f'INFO: Grammar root inferred automatically: {self.root_name}')
@@ -149,7 +203,13 @@ class Grammar(WithCache):
                     logger.warning('WARNING: `root` of grammar is not the top-level pattern!')
 
                 # Optimize waves (drop unnecessary patterns)
-                ... # TODO
+                reachable = self.reachable_patterns()
+                if n_pruned := len(self.patterns) - len(reachable):
+                    logger.info(f'INFO: {n_pruned} of {len(self.patterns)} patterns are unreachable from root `{
+                        self.root_name}` and will not be matched: {
+                        sorted(p.name for p in self.patterns.values() if p not in reachable)}.')
+                    waves = [wave & reachable for wave in waves]
+                    waves = [wave for wave in waves if wave]
 
             self._cache.dependency_waves = waves
 
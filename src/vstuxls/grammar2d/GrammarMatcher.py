@@ -1,17 +1,21 @@
+import threading
 from collections import defaultdict
-from collections.abc import Iterable
-from dataclasses import dataclass
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, field
 from typing import TYPE_CHECKING, Protocol
 
 from loguru import logger
 
 import vstuxls.grammar2d.Pattern2d as pt
-from vstuxls.geom2d import Box, Point, RangedBox
+from vstuxls.geom2d import Box, BoxIndex, Point, RangedBox
 from vstuxls.grammar2d import Grammar
 from vstuxls.grammar2d.diagnostic_sink import ParsingDiagnosticSink
 from vstuxls.grammar2d.Match2d import Match2d
+from vstuxls.grammar2d.match_cache import RegionMatchCache
+from vstuxls.grammar2d.profiling import ParseProfiler
 from vstuxls.grid import CellView, Grid, GridView
-from vstuxls.string_matching import CellClassifier
 
 if TYPE_CHECKING:
     from grammar2d.Pattern2d import Pattern2d
@@ -29,12 +33,64 @@ class _WaveObserver(Protocol):
         ...
 
 
+class _SpatialIndex(Protocol):
+    """ Индекс матчей паттерна по расположению (см. `BoxIndex`). """
+    def __len__(self) -> int:
+        ...
+
+    def __iter__(self) -> Iterator[Match2d]:
+        ...
+
+    def add(self, box: Box, item: Match2d) -> None:
+        ...
+
+    def within(self, region: Box | RangedBox) -> list[Match2d]:
+        """ Matches whose boxes are inside `region`, in order of registration. """
+        ...
+
+
+class _DeferredDiagnostics:
+    """ Запоминает вызовы приёмника диагностики, чтобы передать их ему позже в нужном порядке. """
+
+    def __init__(self):
+        self.calls: list[tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return record
+
+    def replay(self, sink: ParsingDiagnosticSink):
+        for name, args, kwargs in self.calls:
+            getattr(sink, name)(*args, **kwargs)
+
+
+@dataclass
+class _WaveTaskOutcome:
+    """ Side effects of matching one pattern in a wave task, to be merged in wave order. """
+    # all matches registered while matching the pattern (including dependent ones)
+    registered: list[Match2d] = field(default_factory=list)
+    diagnostics: _DeferredDiagnostics | None = None
+
+
 @dataclass
 class GrammarMatcher:
     grammar: Grammar
     wave_observer: '_WaveObserver | None' = None
     # Опциональный приёмник структурированной диагностики (например DiagnosticsCollector).
     diagnostic_sink: ParsingDiagnosticSink | None = None
+    # Фабрика пространственного индекса матчей каждого паттерна (для выборки по области).
+    spatial_index_factory: Callable[[], _SpatialIndex] = BoxIndex
+    # Размер кэша результатов get_pattern_matches (None — без ограничения, 0 — без кэша).
+    result_cache_size: int | None = 4096
+    # Экспериментально. Если задан (пул потоков, например ThreadPoolExecutor), независимые паттерны волны
+    # сопоставляются в разных потоках. Результат тот же, что и без пула, но разбор не ускоряется:
+    # сопоставление написано на чистом Python, и под GIL потоки работают по очереди
+    # (на сборках без GIL выигрыш не измерялся).
+    # Пул процессов не подходит: задачи работают с общим состоянием этого объекта.
+    wave_executor: Executor | None = None
+    # Если задан, собирает затраты времени и памяти по паттернам и волнам (см. `ParseProfiler`).
+    profiler: ParseProfiler | None = None
 
     # projection of processed grid
     _grid_view: GridView = None
@@ -44,12 +100,17 @@ class GrammarMatcher:
 
     # matches related to pattern
     _matches_by_element: dict['Pattern2d', list[Match2d]] = None
+    # the same matches indexed by location
+    _index_by_element: dict['Pattern2d', _SpatialIndex] = None
 
     # scalar info about cells
     type_to_cells: dict[str, list[CellView]] = None
 
     # кэш отфильтрованных матчей по (pattern, region, match_limit, overlap_mode, criteria)
-    _filtered_matches_cache: dict = None
+    _result_cache: RegionMatchCache = None
+
+    # state of the wave task running in current thread (see `_match_wave_concurrently`)
+    _wave_task: threading.local = field(default_factory=threading.local, repr=False)
 
     def get_pattern_matches(
             self,
@@ -70,46 +131,39 @@ class GrammarMatcher:
         if overlap_resolution is None:
             overlap_resolution = pattern.get_overlap_mode_enum()
 
-        # Попытка использовать кэш только для простого случая:
-        # независимый паттерн, нет region и match_limit.
-        use_cache = (
-            pattern.independently_matchable()
-            and region is None
-            and match_limit is None
-        )
-
-        cache_key = None
-        if use_cache:
-            criteria = pattern.get_overlap_criteria()
-            criteria_sig = tuple((c.metric.value, c.order.value) for c in criteria)
-            cache_key = (pattern, overlap_resolution, criteria_sig)
-            if self._filtered_matches_cache is None:
-                self._filtered_matches_cache = {}
-            cached = self._filtered_matches_cache.get(cache_key)
-            if cached is not None:
-                return cached
+        criteria = pattern.get_overlap_criteria()
+        variant = (overlap_resolution, tuple((c.metric.value, c.order.value) for c in criteria))
+        cached = self.result_cache.get(pattern, region, match_limit, variant)
+        if self.profiler:
+            self.profiler.add('cache_misses' if cached is None else 'cache_hits', pattern=pattern.name)
+        if cached is not None:
+            return cached
 
         if pattern.independently_matchable():
-            matches = self.matches_by_element[pattern] or []
-
             if region:
                 # filter by region
-                matches = list(filter(
-                    lambda m: m.box in region,
-                    matches))
+                matches = self._matches_within(pattern, region)
+            else:
+                matches = self.matches_by_element[pattern] or []
 
-            if match_limit is not None and len(matches) > match_limit:
+            truncated = match_limit is not None and len(matches) > match_limit
+            if truncated:
                 # Drop unexpected matches.
                 matches = matches[:match_limit]
 
             result = self._apply_overlap_resolution(matches, overlap_resolution, pattern)
-            if use_cache and cache_key is not None:
-                self._filtered_matches_cache[cache_key] = result
-            return result
+            # Если ничего не отброшено (ни лимитом, ни накладками),
+            # результат для любой подобласти — это просто выборка из этого результата.
+            restrictable = not truncated and len(result) == len(matches)
         else:
             matches = self._find_matches_of_dependent_pattern(pattern, region, match_limit)
-            # Для зависимых паттернов кэш пока не используем (поведение сложнее)
-            return self._apply_overlap_resolution(matches, overlap_resolution, pattern)
+            result = self._apply_overlap_resolution(matches, overlap_resolution, pattern)
+            # Поиск в подобласти может дать иные матчи (например, при сдвиге начала по "чётности"),
+            # поэтому для зависимых паттернов — только точное совпадение области.
+            restrictable = False
+
+        self.result_cache.put(pattern, region, match_limit, variant, result, restrictable)
+        return result
 
     def _apply_overlap_resolution(
             self,
@@ -129,8 +183,8 @@ class GrammarMatcher:
                 f"Unexpected overlap_resolution mode: {overlap_resolution} for pattern {pattern.name}, "
                 f"returning matches without filtering"
             )
-            if self.diagnostic_sink:
-                self.diagnostic_sink.record_unexpected_overlap_mode(
+            if sink := self._get_diagnostic_sink():
+                sink.record_unexpected_overlap_mode(
                     pattern.name, repr(overlap_resolution)
                 )
             return matches
@@ -233,6 +287,12 @@ class GrammarMatcher:
         to_remove = set()
         resolved_overlaps = []  # Для отладочной печати
 
+        # Сравниваются только матчи с общей позицией: группируем индексы по позиции (по возрастанию)
+        indices_by_position = defaultdict(list)
+        for idx, match in enumerate(matches):
+            if match.box:
+                indices_by_position[match.box.position].append(idx)
+
         for i in range(len(matches)):
             if i in to_remove:
                 continue
@@ -241,17 +301,11 @@ class GrammarMatcher:
             if not match1.box:
                 continue
 
-            for j in range(i + 1, len(matches)):
-                if j in to_remove:
+            for j in indices_by_position[match1.box.position]:
+                if j <= i or j in to_remove:
                     continue
 
                 match2 = matches[j]
-                if not match2.box:
-                    continue
-
-                # Проверяем соответствие позиций
-                if match1.box.position != match2.box.position:
-                    continue
 
                 # Проверяем полное наложение
                 if match1.box in match2.box or match2.box in match1.box:
@@ -339,6 +393,10 @@ class GrammarMatcher:
         to_remove = set()
         resolved_overlaps = [] if DEBUG_OVERLAP_RESOLUTION else None  # Для отладочной печати
 
+        # Перекрытие (см. ниже) возможно только у касающихся/пересекающихся прямоугольников:
+        # кандидатов берём из пространственного индекса (индексы матчей по возрастанию)
+        box_index = BoxIndex.for_boxes((match.box, idx) for idx, match in enumerate(matches) if match.box)
+
         for i in range(len(matches)):
             if i in to_remove:
                 continue
@@ -347,13 +405,11 @@ class GrammarMatcher:
             if not match1.box:
                 continue
 
-            for j in range(i + 1, len(matches)):
-                if j in to_remove:
+            for j in box_index.intersecting(match1.box):
+                if j <= i or j in to_remove:
                     continue
 
                 match2 = matches[j]
-                if not match2.box:
-                    continue
 
                 # Проверяем частичное перекрытие (но не полное, так как полные уже обработаны)
                 if match1.box.manhattan_distance_to_overlap(match2.box) == 0:
@@ -429,11 +485,26 @@ class GrammarMatcher:
         :return: List of matches for the root pattern
         """
         self.matches_by_element.clear()
+        self._index_by_element = {}
         # сбрасываем кэш отфильтрованных матчей
-        self._filtered_matches_cache = {}
+        self.result_cache.clear()
         self._grid_view = grid.get_view()
-        self._recognise_all_cells_content()
-        self._roll_matching_waves()
+
+        profiler = self.profiler
+        if profiler:
+            profiler.reset()
+        with profiler.run() if profiler else nullcontext():
+            with self._profile_stage('cell_classification'):
+                self._recognise_all_cells_content()
+            self._roll_matching_waves()
+
+        if profiler:
+            cache = self.result_cache
+            profiler.totals.update(
+                result_cache_hits=cache.hits,
+                result_cache_region_hits=cache.region_hits,
+                result_cache_misses=cache.misses,
+            )
 
         root = self.grammar.root
         # assert root in self._matches_by_element, set(self._matches_by_element.keys())
@@ -442,13 +513,19 @@ class GrammarMatcher:
 
     @property
     def matches_by_position(self) -> dict[Point, list[Match2d]]:
-        if not self._matches_by_position:
+        if self._matches_by_position is None:
             self._matches_by_position = defaultdict(list)
         return self._matches_by_position
 
+    @property
+    def result_cache(self) -> RegionMatchCache:
+        if self._result_cache is None:
+            self._result_cache = RegionMatchCache(self.result_cache_size)
+        return self._result_cache
+
     @property
     def matches_by_element(self) -> dict['Pattern2d', list[Match2d]]:
-        if not self._matches_by_element:
+        if self._matches_by_element is None:
             self._matches_by_element = defaultdict(list)
         return self._matches_by_element
 
@@ -475,19 +552,47 @@ class GrammarMatcher:
         return resolved
 
     def register_match(self, match: Match2d, as_pattern: 'str|Pattern2d' = None, _seen_patterns: set = None):
-        self.matches_by_position[match.box.position].append(match)
-        self.matches_by_element[match.pattern].append(match)
+        outcome: _WaveTaskOutcome | None = getattr(self._wave_task, 'outcome', None)
+        if outcome is not None:
+            # positions are shared by all patterns: fill them later, in wave order
+            outcome.registered.append(match)
+        else:
+            self.matches_by_position[match.box.position].append(match)
+        self._add_match_of_element(match.pattern, match)
 
         # add patterns extended by this too!
         # for base_pattern in self.grammar.extension_map.get(match.pattern) or ():
         for base_pattern in match.pattern.extends_patterns(recursive=True):
-            self.matches_by_element[base_pattern].append(match)
+            self._add_match_of_element(base_pattern, match)
             # ## print(f' + Registered match for {base_pattern} extended by {match.pattern}')
 
+    def _add_match_of_element(self, pattern: 'Pattern2d', match: Match2d):
+        self.matches_by_element[pattern].append(match)
+        # known results for the pattern are outdated now
+        if self._result_cache is not None:
+            self._result_cache.invalidate(pattern)
+
+        if self._index_by_element is None:
+            self._index_by_element = {}
+        index = self._index_by_element.get(pattern)
+        if index is None:
+            index = self._index_by_element[pattern] = self.spatial_index_factory()
+        index.add(match.box, match)
+
+    def _matches_within(self, pattern: 'Pattern2d', region: Box | RangedBox) -> list[Match2d]:
+        """ Known matches of pattern that are within the region (in order of registration). """
+        matches = self.matches_by_element.get(pattern) or []
+        index = (self._index_by_element or {}).get(pattern)
+        if index is None or len(index) != len(matches):
+            # index is missing or out of sync (matches added bypassing `register_match`)
+            return [m for m in matches if m.box in region]
+        return index.within(region)
+
     def _recognise_all_cells_content(self, max_hypotheses_per_cell=5):
 
-        ccl = CellClassifier(self.grammar.get_effective_cell_types().values())
+        ccl = self.grammar.get_cell_classifier()
         self.type_to_cells = defaultdict(list)
+        memo_hits, memo_misses = ccl.cache_hits, ccl.cache_misses
 
         for cw in self._grid_view.iterate_cells():
             match_list = ccl.match(cw.cell.content, max_hypotheses_per_cell)
@@ -506,6 +611,12 @@ class GrammarMatcher:
                 for m in match_list
             }
 
+        if self.profiler:
+            self.profiler.totals.update(
+                cell_classifier_memo_hits=ccl.cache_hits - memo_hits,
+                cell_classifier_memo_misses=ccl.cache_misses - memo_misses,
+            )
+
     def _roll_matching_waves(self, verbose=True):
         """ Find matches of all grammar elements per all matching waves defined by grammar,
             from terminals to the root. """
@@ -519,28 +630,136 @@ class GrammarMatcher:
 
             processed_patterns: list[Pattern2d] = []
 
-            if self.grammar.target_mode == 'root' and self.grammar.root in wave:
-                self._find_matches_of_pattern(self.grammar.root)
-                processed_patterns.append(self.grammar.root)
-            else:
-                for ptt in wave:
-                    if ptt.independently_matchable():
-                        self._find_matches_of_pattern(ptt)
-                        processed_patterns.append(ptt)
+            with self._profile_wave(wave_index, pattern_names) as wave_profile:
+                if self.grammar.target_mode == 'root' and self.grammar.root in wave:
+                    self._find_matches_of_pattern(self.grammar.root)
+                    processed_patterns.append(self.grammar.root)
+                else:
+                    patterns = [ptt for ptt in wave if ptt.independently_matchable()]
+                    if self.wave_executor is not None and len(patterns) > 1:
+                        self._match_wave_concurrently(patterns)
+                    else:
+                        for ptt in patterns:
+                            self._find_matches_of_pattern(ptt)
+                    processed_patterns += patterns
+
+                if wave_profile:
+                    wave_profile.matches = sum(len(self.matches_by_element.get(p) or ()) for p in processed_patterns)
             ...
             self._notify_wave_completed(wave_index, processed_patterns)
 
+    def _match_wave_concurrently(self, patterns: list['Pattern2d']):
+        """ Сопоставить паттерны волны в потоках `wave_executor` (экспериментально, см. `wave_executor`).
+
+        Паттерны, которые могут повлиять друг на друга (через общие зависимые паттерны
+        или базовые паттерны, см. `_split_wave_into_groups`), попадают в одну задачу
+        и обрабатываются в ней по порядку.
+        Результат совпадает с последовательной обработкой `patterns`:
+        совпадения по позициям и диагностика сводятся после завершения задач в порядке `patterns`.
+        """
+        groups = self._split_wave_into_groups(patterns)
+        futures = [self.wave_executor.submit(self._match_wave_group, group) for group in groups]
+
+        outcomes: dict[Pattern2d, _WaveTaskOutcome] = {}
+        for future in futures:
+            outcomes.update(future.result())
+
+        for pattern in patterns:
+            outcome = outcomes[pattern]
+            for match in outcome.registered:
+                self.matches_by_position[match.box.position].append(match)
+            if outcome.diagnostics and self.diagnostic_sink:
+                outcome.diagnostics.replay(self.diagnostic_sink)
+
+    def _match_wave_group(self, group: list['Pattern2d']) -> dict['Pattern2d', _WaveTaskOutcome]:
+        outcomes = {}
+        try:
+            for pattern in group:
+                outcome = self._wave_task.outcome = _WaveTaskOutcome(
+                    diagnostics=_DeferredDiagnostics() if self.diagnostic_sink else None)
+                self._find_matches_of_pattern(pattern)
+                outcomes[pattern] = outcome
+        finally:
+            self._wave_task.outcome = None
+        return outcomes
+
+    @staticmethod
+    def _split_wave_into_groups(patterns: list['Pattern2d']) -> list[list['Pattern2d']]:
+        """ Разбить паттерны волны на группы, которые можно сопоставлять независимо.
+
+        Паттерн "читает" совпадения всех паттернов, от которых он (транзитивно) зависит,
+        и "пишет" совпадения — свои и зависимых паттернов, найденных по ходу дела,
+        а также их базовых паттернов (см. `register_match`).
+        Паттерны, где один пишет то, что другой читает или пишет, объединяются в одну группу.
+        Порядок паттернов внутри групп и самих групп — как в `patterns`.
+        """
+        reads: dict[Pattern2d, set[Pattern2d]] = {}
+        writes: dict[Pattern2d, set[Pattern2d]] = {}
+        for pattern in patterns:
+            seen = {pattern}
+            stack = [pattern]
+            while stack:
+                for dep in stack.pop().dependencies(recursive=False):
+                    if dep not in seen:
+                        seen.add(dep)
+                        stack.append(dep)
+            reads[pattern] = seen
+            writes[pattern] = {
+                written
+                for p in seen
+                if p is pattern or not p.independently_matchable()
+                for written in (p, *p.extends_patterns(recursive=True))
+            }
+
+        # union-find over conflicting pairs
+        parent = list(range(len(patterns)))
+
+        def root(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = i = parent[parent[i]]
+            return i
+
+        for i, p in enumerate(patterns):
+            for j in range(i + 1, len(patterns)):
+                q = patterns[j]
+                if writes[p] & (reads[q] | writes[q]) or writes[q] & reads[p]:
+                    parent[root(j)] = root(i)
+
+        groups: dict[int, list[Pattern2d]] = {}
+        for i, pattern in enumerate(patterns):
+            groups.setdefault(root(i), []).append(pattern)
+        return list(groups.values())
+
+    def _get_diagnostic_sink(self) -> 'ParsingDiagnosticSink | _DeferredDiagnostics | None':
+        """ Приёмник диагностики; в задаче параллельной волны — отложенный (см. `_match_wave_concurrently`). """
+        outcome: _WaveTaskOutcome | None = getattr(self._wave_task, 'outcome', None)
+        if outcome is not None:
+            return outcome.diagnostics
+        return self.diagnostic_sink
+
+    def _profile_pattern(self, pattern: 'Pattern2d') -> AbstractContextManager:
+        return self.profiler.pattern(pattern.name) if self.profiler else nullcontext()
+
+    def _profile_wave(self, wave_index: int, pattern_names: list[str]) -> AbstractContextManager:
+        return self.profiler.wave(wave_index, pattern_names) if self.profiler else nullcontext()
+
+    def _profile_stage(self, name: str) -> AbstractContextManager:
+        return self.profiler.stage(name) if self.profiler else nullcontext()
+
     def _find_matches_of_pattern(self, pattern: 'Pattern2d'):
         """Try finding matches of element on all grid space"""
         matcher = pattern.get_matcher(self)
-        matches = matcher.find_all(match_limit=pattern.count_in_document.stop)
+        with self._profile_pattern(pattern):
+            matches = matcher.find_all(match_limit=pattern.count_in_document.stop)
+            if self.profiler:
+                self.profiler.add('matches', len(matches))
 
         # Check the quantity of matches
         if len(matches) not in pattern.count_in_document:
             logger.warning(f'Found {len(matches)} match(es) of pattern `{pattern.name
                 }` but expected {pattern.count_in_document}.')
-            if self.diagnostic_sink:
-                self.diagnostic_sink.record_pattern_count_mismatch(
+            if sink := self._get_diagnostic_sink():
+                sink.record_pattern_count_mismatch(
                     pattern.name, len(matches), str(pattern.count_in_document)
                 )
 
@@ -549,8 +768,8 @@ class GrammarMatcher:
                 # Drop unexpected matches.
                 matches = matches[:limit]
                 logger.warning(f' ... limited result to {limit} match(es) of this pattern.')
-                if self.diagnostic_sink:
-                    self.diagnostic_sink.record_match_limit_applied(
+                if sink := self._get_diagnostic_sink():
+                    sink.record_match_limit_applied(
                         pattern.name, limit, source='GrammarMatcher._find_matches_of_pattern'
                     )
 
@@ -580,12 +799,9 @@ class GrammarMatcher:
         # Проверить наличие в кэше
         matches = []
         cache_key = 'matched_within_regions'
-        occurrences = self.matches_by_element[pattern] or ()
+        # Только матчи, которые вообще попадают в желаемую область.
+        occurrences = self._matches_within(pattern, region) if region else self.matches_by_element[pattern] or ()
         for m in occurrences:
-            # Проверить, что этот матч вообще попадает в желаемую область.
-            if region and m.box not in region:
-                continue
-
             # We can use a match only if we known that we'll get complete set of matches.
             # Мы можем взять матч, только если точно знаем,
             # что после этого перебора получим исчерпывающий набор совпадений, —
@@ -615,10 +831,13 @@ class GrammarMatcher:
         # Обычный процесс поиска ...
 
         matcher = pattern.get_matcher(self)
-        matches = matcher.find_all(
-            region=region,
-            match_limit=match_limit,
-        )
+        with self._profile_pattern(pattern):
+            matches = matcher.find_all(
+                region=region,
+                match_limit=match_limit,
+            )
+            if self.profiler:
+                self.profiler.add('matches', len(matches))
 
         # Check the quantity of matches ...
         # Do not check the count over all document.
@@ -627,8 +846,8 @@ class GrammarMatcher:
             # Drop unexpected matches.
             matches = matches[:match_limit]
             logger.warning(f' ... limited result to {match_limit} match(es) of this pattern.')
-            if self.diagnostic_sink:
-                self.diagnostic_sink.record_match_limit_applied(
+            if sink := self._get_diagnostic_sink():
+                sink.record_match_limit_applied(
                     pattern.name, match_limit, source='GrammarMatcher._find_matches_of_dependent_pattern'
                 )
 
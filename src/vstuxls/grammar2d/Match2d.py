@@ -4,7 +4,7 @@ from typing import Self
 from adict import adict
 
 import vstuxls.grammar2d.Pattern2d as pt
-from vstuxls.geom2d import Box, Point
+from vstuxls.geom2d import Box, Occupancy, Point
 from vstuxls.utils import safe_adict
 
 
@@ -35,6 +35,13 @@ class Match2d:
     def get_occupied_points(self) -> list[Point]:
         return self.pattern.get_points_occupied_by_match(self)
 
+    def get_occupancy(self) -> Occupancy:
+        return self.pattern.get_occupancy_of_match(self)
+
+    def get_occupied_rows(self) -> dict[int, int]:
+        """ Bitmap of occupied points, {y: mask of x} — for `occupancy_getter` of the clash subsystem. """
+        return self.get_occupancy().rows
+
     def get_text(self) -> list[str]:
         return self.pattern.get_text_of_match(self)
 
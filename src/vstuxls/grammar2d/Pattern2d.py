@@ -6,7 +6,7 @@ from typing import TYPE_CHECKING
 import vstuxls.grammar2d.Grammar as ns
 import vstuxls.grammar2d.PatternMatcher as pm
 from vstuxls.constraints_2d import BoolExprRegistry, SizeConstraint, SpatialConstraint
-from vstuxls.geom2d import Box, Point, open_range
+from vstuxls.geom2d import Box, Occupancy, Point, open_range
 from vstuxls.utils import WithCache, WithSafeCreate, safe_adict, sorted_list
 
 if TYPE_CHECKING:
@@ -226,11 +226,16 @@ class Pattern2d(WithCache, WithSafeCreate):
         ))
         return union
 
-    def get_points_occupied_by_match(self, match: 'Match2d') -> list[Point]:
+    def get_occupancy_of_match(self, match: 'Match2d') -> Occupancy:
         """ Default: opaque.
-        Реализация по умолчанию: Просто берём внутреннюю прямоугольную область.
+        Реализация по умолчанию: Просто берём внутреннюю прямоугольную область (в пределах сетки, x >= 0).
+        """
+        return Occupancy.from_box(match.box)
+
+    def get_points_occupied_by_match(self, match: 'Match2d') -> list[Point]:
+        """ Те же точки, что и `get_occupancy_of_match`, списком.
         """
-        return sorted_list(match.box.iterate_points())
+        return sorted_list(self.get_occupancy_of_match(match).iterate_points())
 
     def get_text_of_match(self, match: 'Match2d') -> list[str]:
         """ Просто всё содержимое всех ячеек.
@@ -0,0 +1,142 @@
+"""Кэш результатов выборки матчей паттерна по области (см. `GrammarMatcher.get_pattern_matches`)."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from vstuxls.geom2d import Box, RangedBox, bounds_cover, box_within_bounds, region_bounds
+
+if TYPE_CHECKING:
+    from vstuxls.grammar2d.Match2d import Match2d
+    from vstuxls.grammar2d.Pattern2d import Pattern2d
+
+
+@dataclass
+class _Entry:
+    region: Box | RangedBox | None
+    bounds: tuple
+    matches: list[Match2d]
+    # result for any sub-region can be obtained by filtering `matches`
+    restrictable: bool
+
+
+class RegionMatchCache:
+    """ LRU-кэш результатов по ключу (паттерн, область, лимит, вариант разрешения накладок).
+
+        Запрос для области, вложенной в ранее закэшированную, отвечается фильтрацией
+        её результата, если тот помечен как `restrictable`
+        (т.е. фильтрация по подобласти даёт то же, что и вычисление заново).
+
+        max_size: None — без ограничения, 0 — кэш отключён.
+        Записи паттерна сбрасываются методом `invalidate` (при появлении новых матчей паттерна).
+        Методы потокобезопасны (см. параллельный режим волн в `GrammarMatcher`).
+    """
+    max_size: int | None
+    hits: int
+    # hits answered from an enclosing region (counted in `hits` too)
+    region_hits: int
+    misses: int
+
+    # pattern → (match_limit, variant) → region → entry
+    _groups: dict[Pattern2d, dict[tuple, dict[Hashable, _Entry]]]
+    # keys in LRU order: (pattern, match_limit, variant, region)
+    _lru: OrderedDict[tuple, None]
+    _lock: threading.Lock
+
+    def __init__(self, max_size: int | None = 4096):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._groups = {}
+        self._lru = OrderedDict()
+        self.hits = self.region_hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def get(self,
+            pattern: Pattern2d,
+            region: Box | RangedBox | None,
+            match_limit: int | None = None,
+            variant: Hashable = None) -> list[Match2d] | None:
+        """ Cached matches for the query or None if unknown. """
+        if self.max_size == 0:
+            return None
+
+        with self._lock:
+            return self._get(pattern, region, match_limit, variant)
+
+    def _get(self, pattern, region, match_limit, variant) -> list[Match2d] | None:
+        group = self._groups.get(pattern, {}).get((match_limit, variant))
+        if group:
+            entry = group.get(region)
+            if entry is not None:
+                self._lru.move_to_end((pattern, match_limit, variant, region))
+                self.hits += 1
+                return list(entry.matches)
+
+            # the smallest enclosing result is the cheapest to filter
+            bounds = region_bounds(region)
+            enclosing = min(
+                (e for e in group.values() if e.restrictable and bounds_cover(e.bounds, bounds)),
+                key=lambda e: len(e.matches),
+                default=None)
+            if enclosing is not None:
+                matches = [m for m in enclosing.matches if box_within_bounds(m.box, bounds)]
+                self._put(pattern, region, match_limit, variant, matches, restrictable=True)
+                self.hits += 1
+                self.region_hits += 1
+                return matches
+
+        self.misses += 1
+        return None
+
+    def put(self,
+            pattern: Pattern2d,
+            region: Box | RangedBox | None,
+            match_limit: int | None,
+            variant: Hashable,
+            matches: list[Match2d],
+            restrictable: bool = False):
+        if self.max_size == 0:
+            return
+
+        with self._lock:
+            self._put(pattern, region, match_limit, variant, matches, restrictable)
+
+    def _put(self, pattern, region, match_limit, variant, matches, restrictable):
+        key = (pattern, match_limit, variant, region)
+        group = self._groups.setdefault(pattern, {}).setdefault((match_limit, variant), {})
+        group[region] = _Entry(region, region_bounds(region), list(matches), restrictable)
+        self._lru[key] = None
+        self._lru.move_to_end(key)
+
+        if self.max_size is not None:
+            while len(self._lru) > self.max_size:
+                self._discard(self._lru.popitem(last=False)[0])
+
+    def invalidate(self, pattern: Pattern2d):
+        """ Forget all results for the pattern. """
+        with self._lock:
+            groups = self._groups.pop(pattern, None)
+            for (match_limit, variant), group in (groups or {}).items():
+                for region in group:
+                    del self._lru[pattern, match_limit, variant, region]
+
+    def clear(self):
+        with self._lock:
+            self._groups.clear()
+            self._lru.clear()
+
+    def _discard(self, key: tuple):
+        pattern, match_limit, variant, region = key
+        groups = self._groups[pattern]
+        group = groups[match_limit, variant]
+        del group[region]
+        if not group:
+            del groups[match_limit, variant]
+            if not groups:
+                del self._groups[pattern]
@@ -0,0 +1,253 @@
+"""Профилирование разбора: затраты по паттернам и волнам (см. `GrammarMatcher.profiler`).
+
+Отчёт — `ParseProfiler.to_json_dict()`;
+для flame graph — `ParseProfiler.to_collapsed_stacks()` (формат "collapsed stacks": flamegraph.pl, speedscope, inferno).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass
+class PatternProfile:
+    """ Затраты на поиск совпадений одного паттерна, суммарно по всем вызовам. """
+    name: str
+    calls: int = 0
+    # seconds, including nested searches of dependent patterns
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    # seconds, excluding nested searches
+    self_wall_time: float = 0.0
+    self_cpu_time: float = 0.0
+    matches: int = 0
+    # candidates before filtering (AreaPatternMatcher)
+    candidates: int = 0
+    # arrangements found for connected components of clashes (find_component_arrangements)
+    arrangements: int = 0
+    # subproblems solved by find_max_weight_independent_set (`arrangement_solver: mwis`)
+    mwis_subproblems: int = 0
+    # partial matches expanded / answered from memory by the best-first component search (`component_search: best_first`)
+    search_states: int = 0
+    search_memo_hits: int = 0
+    # queries of known matches answered by / missed in GrammarMatcher.result_cache
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # max growth of traced memory within a call, bytes (with `trace_memory` only)
+    peak_alloc: int | None = None
+
+
+@dataclass
+class WaveProfile:
+    index: int
+    patterns: list[str]
+    wall_time: float = 0.0
+    # CPU time of the process (all threads)
+    cpu_time: float = 0.0
+    matches: int = 0
+    peak_alloc: int | None = None
+
+
+@dataclass
+class _Frame:
+    label: str
+    stats: PatternProfile | WaveProfile
+    wall_start: float
+    cpu_start: float
+    child_wall: float = 0.0
+    child_cpu: float = 0.0
+    # traced memory at start and max traced memory seen so far (with `trace_memory` only)
+    mem_start: int = 0
+    mem_peak: int = 0
+
+
+@dataclass
+class ParseProfiler:
+    """ Собирает затраты времени (и, опционально, памяти) по паттернам и волнам разбора.
+
+        Поиск паттерна оформляется блоком `with profiler.pattern(name)`, волна — `with profiler.wave(...)`;
+        вложенные поиски (зависимых паттернов) образуют стек, отдельный для каждого потока.
+        Счётчики паттерна, который сейчас ищется в этом потоке, пополняются методом `add`.
+
+        trace_memory: отслеживать пики выделения памяти через tracemalloc (заметно замедляет разбор).
+        Пики измеряются по всему процессу, поэтому при параллельных волнах (`GrammarMatcher.wave_executor`)
+        они приблизительны.
+    """
+    trace_memory: bool = False
+
+    patterns: dict[str, PatternProfile] = field(default_factory=dict)
+    waves: list[WaveProfile] = field(default_factory=list)
+    # run-level figures: total and stage times, memo statistics, etc.
+    totals: dict[str, float | int] = field(default_factory=dict)
+
+    # (wave, pattern, nested pattern, ...) → self wall time, seconds
+    _stacks: Counter[tuple[str, ...]] = field(default_factory=Counter, repr=False)
+    _wave_frame: _Frame | None = field(default=None, repr=False)
+    _local: threading.local = field(default_factory=threading.local, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def reset(self):
+        self.patterns.clear()
+        self.waves.clear()
+        self.totals.clear()
+        self._stacks.clear()
+
+    @contextmanager
+    def run(self) -> Iterator[ParseProfiler]:
+        """ Profile the whole parse run (starts tracemalloc if needed). """
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            self.totals['wall_time'] = time.perf_counter() - wall_start
+            self.totals['cpu_time'] = time.process_time() - cpu_start
+            if self._tracing():
+                self.totals['peak_traced_memory'] = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """ Profile a stage of the run that is not a pattern search (e.g. cell classification). """
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            with self._lock:
+                self.totals[f'{name}_wall_time'] = self.totals.get(f'{name}_wall_time', 0.0) + wall
+                self.totals[f'{name}_cpu_time'] = (
+                    self.totals.get(f'{name}_cpu_time', 0.0) + time.process_time() - cpu_start)
+                self._stacks[name,] += wall
+
+    @contextmanager
+    def wave(self, index: int, patterns: Iterable[str]) -> Iterator[WaveProfile]:
+        """ Profile a matching wave; pattern searches inside it (in any thread) are nested in it. """
+        stats = WaveProfile(index, list(patterns))
+        frame = self._wave_frame = self._open_frame(f'wave {index}', stats, time.process_time())
+        try:
+            yield stats
+        finally:
+            self._wave_frame = None
+            wall = time.perf_counter() - frame.wall_start
+            stats.wall_time = wall
+            stats.cpu_time = time.process_time() - frame.cpu_start
+            stats.peak_alloc = self._close_frame_memory(frame)
+            with self._lock:
+                self.waves.append(stats)
+                # with concurrent tasks, children may take more than the wave itself
+                self._stacks[frame.label,] += max(0.0, wall - frame.child_wall)
+
+    @contextmanager
+    def pattern(self, name: str) -> Iterator[PatternProfile]:
+        """ Profile a search for matches of the pattern. """
+        with self._lock:
+            stats = self._pattern_stats(name)
+        stack = self._stack()
+        parent = stack[-1] if stack else self._wave_frame
+        frame = self._open_frame(name, stats, time.thread_time(), parent)
+        stack.append(frame)
+        try:
+            yield stats
+        finally:
+            stack.pop()
+            wall = time.perf_counter() - frame.wall_start
+            cpu = time.thread_time() - frame.cpu_start
+            peak_alloc = self._close_frame_memory(frame, parent)
+
+            labels = tuple(f.label for f in stack) + (name,)
+            if self._wave_frame is not None:
+                labels = (self._wave_frame.label,) + labels
+
+            with self._lock:
+                stats.calls += 1
+                stats.wall_time += wall
+                stats.cpu_time += cpu
+                stats.self_wall_time += wall - frame.child_wall
+                stats.self_cpu_time += cpu - frame.child_cpu
+                if peak_alloc is not None:
+                    stats.peak_alloc = max(stats.peak_alloc or 0, peak_alloc)
+                if parent is not None:
+                    parent.child_wall += wall
+                    parent.child_cpu += cpu
+                self._stacks[labels] += wall - frame.child_wall
+
+    def add(self, counter: str, n: int = 1, pattern: str | None = None):
+        """ Increase a counter (field of `PatternProfile`) of the pattern,
+            by default — of the one being searched in current thread. """
+        with self._lock:
+            if pattern is not None:
+                stats = self._pattern_stats(pattern)
+            elif stack := self._stack():
+                stats = stack[-1].stats
+            else:
+                return
+            setattr(stats, counter, getattr(stats, counter) + n)
+
+    def to_json_dict(self) -> dict:
+        """ Report: totals, waves in order, patterns from the most expensive (by inclusive wall time). """
+        def rounded(d: dict) -> dict:
+            return {k: round(v, 6) if isinstance(v, float) else v for k, v in d.items()}
+
+        return {
+            'trace_memory': self.trace_memory,
+            'totals': rounded(self.totals),
+            'waves': [rounded(asdict(w)) for w in self.waves],
+            'patterns': [
+                rounded(asdict(p))
+                for p in sorted(self.patterns.values(), key=lambda p: p.wall_time, reverse=True)
+            ],
+        }
+
+    def to_collapsed_stacks(self) -> str:
+        """ Self wall time per stack in "collapsed stacks" format: `frame;frame;... <microseconds>` per line. """
+        lines = [
+            f"{';'.join(label.replace(';', ',') for label in labels)} {round(seconds * 1e6)}"
+            for labels, seconds in sorted(self._stacks.items())
+            if round(seconds * 1e6) > 0
+        ]
+        return ''.join(line + '\n' for line in lines)
+
+    def _pattern_stats(self, name: str) -> PatternProfile:
+        stats = self.patterns.get(name)
+        if stats is None:
+            stats = self.patterns[name] = PatternProfile(name)
+        return stats
+
+    def _stack(self) -> list[_Frame]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _tracing(self) -> bool:
+        return self.trace_memory and tracemalloc.is_tracing()
+
+    def _open_frame(self, label: str, stats, cpu_start: float, parent: _Frame | None = None) -> _Frame:
+        frame = _Frame(label, stats, time.perf_counter(), cpu_start)
+        if self._tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                # keep parent's peak before it is reset for this frame
+                parent.mem_peak = max(parent.mem_peak, peak)
+            tracemalloc.reset_peak()
+            frame.mem_start = frame.mem_peak = current
+        return frame
+
+    def _close_frame_memory(self, frame: _Frame, parent: _Frame | None = None) -> int | None:
+        """ Peak allocation within the frame; passes the peak up to the parent frame. """
+        if not self._tracing():
+            return None
+        frame.mem_peak = max(frame.mem_peak, tracemalloc.get_traced_memory()[1])
+        if parent is not None:
+            parent.mem_peak = max(parent.mem_peak, frame.mem_peak)
+        return frame.mem_peak - frame.mem_start
@@ -1,6 +1,7 @@
 # grid.py
 from abc import ABC
-from collections.abc import Callable
+from array import array
+from collections.abc import Callable, Iterator, Mapping
 from dataclasses import dataclass
 from typing import Optional
 
@@ -18,34 +19,119 @@ class Grid(ABC):
     point2cell: dict[Point, 'Cell']
 
     def __init__(self) -> None:
+        self._reset_summaries()
+        self._init_storage()
+
+    def _init_storage(self) -> None:
         self.point2cell = {}
+
+    def _reset_summaries(self) -> None:
+        # Границы (left, top, right, bottom) всех зарегистрированных ячеек; обновляются в `register_cell`.
+        self._bb_sides: tuple[int, int, int, int] | None = None
         self._bb_cache = None
+        # Занятость строк и столбцов, см. `get_row_spans`; строится по запросу.
+        self._occupancy: tuple[dict[int, list[range]], dict[int, list[range]]] | None = None
 
     def _clear_cells(self) -> None:
         self.point2cell.clear()
+        self._reset_summaries()
 
     def register_cell(self, cell: 'Cell') -> None:
         """ Запомнить ссылку на ячейку (или, если она объединённая, ссылки на ячейку из всех координат внутри неё) """
+        self._store_cell(cell)
+        box = cell.box
+        if sides := self._bb_sides:
+            L, t, r, b = sides
+            if box.left < L or box.top < t or box.right > r or box.bottom > b:
+                self._bb_sides = (min(L, box.left), min(t, box.top), max(r, box.right), max(b, box.bottom))
+                self._bb_cache = None
+        else:
+            self._bb_sides = (box.left, box.top, box.right, box.bottom)
+        self._occupancy = None
+
+    def _store_cell(self, cell: 'Cell') -> None:
         for point in cell.box.iterate_points():
             self.point2cell[point] = cell
-        # super().__init__()
 
     def get_cell(self, point: Point) -> Optional['Cell']:
         return self.point2cell.get(point)
 
+    def iterate_occupied_points(self, box: Box, directions=(RIGHT, DOWN)) -> Iterator[Point]:
+        """ Точки внутри `box`, в которых есть ячейки, в порядке обхода `directions` (см. `Box.iterate_points`).
+            Объединённая ячейка может встретиться несколько раз.
+            Пустые участки строк/столбцов пропускаются без перебора (см. `get_row_spans`). """
+        outer, inner, outer_is_x = box.traversal_ranges(directions)
+        if not outer or not inner:
+            return
+        rows, columns = self._get_occupancy()
+        lines = columns if outer_is_x else rows
+        inner_min, inner_max = min(inner[0], inner[-1]), max(inner[0], inner[-1])
+        forward = inner.step > 0
+        for a in outer:
+            spans = lines.get(a)
+            if not spans:
+                continue
+            for span in (spans if forward else reversed(spans)):
+                for b in _clip_range(span if forward else span[::-1], inner_min, inner_max + 1):
+                    yield Point(a, b) if outer_is_x else Point(b, a)
+
     def get_bounding_box(self, force_recalc=False) -> Box:
         """ Размеры эффективной области расположения данных (за пределами этой области могут быть только пустые ячейки).
-            Default implementation that can be improved by subclasses.
+            Поддерживается по мере регистрации ячеек; `force_recalc` пересчитывает её по текущим ячейкам.
         """
-        if not self._bb_cache or force_recalc:
-            boxes = [cell.box for cell in self.point2cell.values()]
-            L = min(box.left for box in boxes)
-            r = max(box.right for box in boxes)
-            t = min(box.top for box in boxes)
-            b = max(box.bottom for box in boxes)
-            self._bb_cache = Box.from_2points(L, t, r, b)
+        if force_recalc or not self._bb_sides:
+            cells = {id(cell): cell for cell in self.point2cell.values()}.values()
+            boxes = [cell.box for cell in cells]
+            self._bb_sides = (
+                min(box.left for box in boxes),
+                min(box.top for box in boxes),
+                max(box.right for box in boxes),
+                max(box.bottom for box in boxes),
+            )
+            self._bb_cache = None
+        if not self._bb_cache:
+            self._bb_cache = Box.from_2points(*self._bb_sides)
         return self._bb_cache
 
+    def get_row_spans(self, y: int) -> list[range]:
+        """ Непустые участки строки `y`: упорядоченные непересекающиеся диапазоны X занятых точек. """
+        return self._get_occupancy()[0].get(y, [])
+
+    def get_column_spans(self, x: int) -> list[range]:
+        """ Непустые участки столбца `x`: упорядоченные непересекающиеся диапазоны Y занятых точек. """
+        return self._get_occupancy()[1].get(x, [])
+
+    def get_occupied_box(self, box: Box) -> Box | None:
+        """ Наименьший прямоугольник, содержащий все занятые точки внутри `box` (None, если их там нет). """
+        rows = self._get_occupancy()[0]
+        L = t = r = b = None
+        for y in range(box.top, box.bottom):
+            for span in rows.get(y, ()):
+                if span.stop <= box.left or span.start >= box.right:
+                    continue
+                left, right = max(span.start, box.left), min(span.stop, box.right)
+                if t is None:
+                    L, t, r = left, y, right
+                else:
+                    L, r = min(L, left), max(r, right)
+                b = y + 1
+        if t is None:
+            return None
+        return Box.from_2points(L, t, r, b)
+
+    def _get_occupancy(self) -> tuple[dict[int, list[range]], dict[int, list[range]]]:
+        if self._occupancy is None:
+            xs_by_row: dict[int, list[int]] = {}
+            ys_by_column: dict[int, list[int]] = {}
+            for x, y in self.point2cell:
+                xs_by_row.setdefault(y, []).append(x)
+                ys_by_column.setdefault(x, []).append(y)
+            self._occupancy = (
+                {y: _to_spans(xs) for y, xs in xs_by_row.items()},
+                {x: _to_spans(ys) for x, ys in ys_by_column.items()},
+            )
+        return self._occupancy
+
     def get_view(self, box: Box = None) -> Optional['GridView']:
         """Проекция заданной области внутри сетки или всей сетки целиком."""
         bounding_box = self.get_bounding_box()
@@ -56,6 +142,175 @@ class Grid(ABC):
         return False
 
 
+class DenseGrid(Grid):
+    """
+        Хранилище ячеек сетки в виде плотного 2D-массива индексов (`array('i')`) и таблицы объектов `Cell`.
+        Поиск ячейки по точке и обход областей сводятся к арифметике индексов, без хеширования `Point`.
+
+        Используется как примесь к конкретной сетке (см. `DenseTxtGrid`, `DenseExcelGrid`)
+        и полностью заменяет её словарь `point2cell` (он становится представлением только для чтения).
+    """
+    EMPTY = -1
+
+    def _init_storage(self) -> None:
+        self._cells: list[Cell] = []
+        self._cell_indices: dict[int, int] = {}  # id(cell) → индекс в `_cells`
+        # Выделенная под массив область (может быть шире фактических данных).
+        self._left = self._top = 0
+        self._width = self._height = 0
+        self._index = array('i')
+        self._filled = 0  # число занятых точек
+        self.point2cell = _DensePointMap(self)
+
+    def _clear_cells(self) -> None:
+        self._init_storage()
+        self._reset_summaries()
+
+    def _store_cell(self, cell: 'Cell') -> None:
+        box = cell.box
+        self._ensure_area(box)
+        idx = self._cell_indices.get(id(cell))
+        if idx is None:
+            idx = self._cell_indices[id(cell)] = len(self._cells)
+            self._cells.append(cell)
+
+        index, width = self._index, self._width
+        for y in range(box.top, box.bottom):
+            offset = (y - self._top) * width - self._left
+            for k in range(offset + box.left, offset + box.right):
+                if index[k] < 0:
+                    self._filled += 1
+                index[k] = idx
+
+    def _ensure_area(self, box: Box) -> None:
+        """ Расширить массив так, чтобы он покрывал `box`.
+            Растёт с запасом (не менее чем вдвое по расширяемой оси), чтобы построчная загрузка не копировала массив на каждой строке. """
+        left, top, width, height = self._left, self._top, self._width, self._height
+        right, bottom = left + width, top + height
+        if not self._index:
+            left, top, right, bottom = box.left, box.top, box.right, box.bottom
+        elif left <= box.left and box.right <= right and top <= box.top and box.bottom <= bottom:
+            return
+        else:
+            if box.left < left:
+                left = min(box.left, left - width)
+            if box.right > right:
+                right = max(box.right, right + width)
+            if box.top < top:
+                top = min(box.top, top - height)
+            if box.bottom > bottom:
+                bottom = max(box.bottom, bottom + height)
+
+        new_width, new_height = right - left, bottom - top
+        new_index = array('i', [self.EMPTY]) * (new_width * new_height)
+        for row in range(height):
+            offset = (self._top + row - top) * new_width + (self._left - left)
+            new_index[offset:offset + width] = self._index[row * width:(row + 1) * width]
+
+        self._left, self._top, self._width, self._height = left, top, new_width, new_height
+        self._index = new_index
+
+    def get_cell(self, point: Point) -> Optional['Cell']:
+        x, y = point
+        i, j = x - self._left, y - self._top
+        if 0 <= i < self._width and 0 <= j < self._height:
+            idx = self._index[j * self._width + i]
+            if idx >= 0:
+                return self._cells[idx]
+        return None
+
+    def iterate_occupied_points(self, box: Box, directions=(RIGHT, DOWN)) -> Iterator[Point]:
+        # Объединённая ячейка выдаётся один раз — в первой встреченной точке.
+        outer, inner, outer_is_x = box.traversal_ranges(directions)
+        index, width = self._index, self._width
+        merging = self.supports_cell_merging()
+        seen: set[int] = set()
+        if outer_is_x:
+            x_range, y_range = outer, inner
+        else:
+            x_range, y_range = inner, outer
+        # Отбросим координаты за пределами массива, сохраняя направление обхода.
+        x_range = _clip_range(x_range, self._left, self._left + width)
+        y_range = _clip_range(y_range, self._top, self._top + self._height)
+        if not x_range or not y_range:
+            return
+
+        for a in (x_range if outer_is_x else y_range):
+            for b in (y_range if outer_is_x else x_range):
+                x, y = (a, b) if outer_is_x else (b, a)
+                idx = index[(y - self._top) * width + (x - self._left)]
+                if idx < 0 or idx in seen:
+                    continue
+                if merging and self._cells[idx].size != (1, 1):
+                    seen.add(idx)
+                yield Point(x, y)
+
+    def _iterate_filled(self) -> Iterator[tuple[Point, 'Cell']]:
+        """ Все занятые точки с их ячейками (построчно). """
+        cells, width = self._cells, self._width
+        for k, idx in enumerate(self._index):
+            if idx >= 0:
+                y, x = divmod(k, width)
+                yield Point(x + self._left, y + self._top), cells[idx]
+
+
+def _to_spans(coords: list[int]) -> list[range]:
+    """ Упорядоченные диапазоны подряд идущих значений из `coords`. """
+    spans = []
+    start = prev = None
+    for c in sorted(coords):
+        if prev is not None and c == prev + 1:
+            prev = c
+            continue
+        if start is not None:
+            spans.append(range(start, prev + 1))
+        start = prev = c
+    if start is not None:
+        spans.append(range(start, prev + 1))
+    return spans
+
+
+def _clip_range(r: range, start: int, stop: int) -> range:
+    """ Часть `r` (с шагом ±1), лежащая в [start, stop), с тем же направлением. """
+    if r.step > 0:
+        return range(max(r.start, start), min(r.stop, stop))
+    # reversed range: r.start is the largest value, r.stop is exclusive lower bound
+    return range(min(r.start, stop - 1), max(r.stop, start - 1), -1)
+
+
+class _DensePointMap(Mapping):
+    """ Представление `DenseGrid` в виде отображения `Point → Cell` (только для чтения), как `Grid.point2cell`. """
+    __slots__ = ('_grid',)
+
+    def __init__(self, grid: DenseGrid) -> None:
+        self._grid = grid
+
+    def __getitem__(self, point) -> 'Cell':
+        cell = self._grid.get_cell(point)
+        if cell is None:
+            raise KeyError(point)
+        return cell
+
+    def get(self, point, default=None):
+        cell = self._grid.get_cell(point)
+        return default if cell is None else cell
+
+    def __contains__(self, point) -> bool:
+        return self._grid.get_cell(point) is not None
+
+    def __iter__(self) -> Iterator[Point]:
+        return (point for point, _ in self._grid._iterate_filled())
+
+    def __len__(self) -> int:
+        return self._grid._filled
+
+    def items(self):
+        return list(self._grid._iterate_filled())
+
+    def values(self):
+        return [cell for _, cell in self._grid._iterate_filled()]
+
+
 class GridWithCellMerging(Grid):
     """
         Двумерная сетка/решётка ограниченных размеров.
@@ -91,12 +346,19 @@ class Cell:
         return '%s@%s' % (repr(self.content), str(self.box))
 
 
-@dataclass()
+@dataclass(frozen=True)
 class CellStyle:
-    font_style: set
-    background_color: str
-    borders: set
-    font_color: str
+    """ Оформление ячейки. Неизменяемо и хешируемо, поэтому одинаковые стили
+    разных ячеек могут разделять один экземпляр (см. `ExcelGrid`). """
+    font_style: frozenset[str]
+    background_color: str | None
+    borders: frozenset[str]
+    font_color: str | None
+
+    def __post_init__(self) -> None:
+        # Допускаем передачу обычных множеств/списков.
+        object.__setattr__(self, 'font_style', frozenset(self.font_style))
+        object.__setattr__(self, 'borders', frozenset(self.borders))
 
 
 # Проекция 2D-сетки.
@@ -136,7 +398,7 @@ class Region(Box):
         """
         # Note: in case of grid.supports_cell_merging() -> True, cell may repeat.
         cells_seen = set()
-        for point in self.iterate_points(directions):
+        for point in self.grid_view.grid.iterate_occupied_points(self, directions):
             cw = self.get_cell_view(point)
             if cw and cw not in cells_seen:
                 yield cw
@@ -158,7 +420,7 @@ class Region(Box):
             if predicate(cw):
                 yield cw
 
-    def look_outside(self, direction: Direction, distance: int = -1) -> 'Region':
+    def look_outside(self, direction: Direction, distance: int = -1, trim_empty: bool = False) -> 'Region':
         """ Получить регион, снаружи примыкающий к этому с заданной стороны и протяжённый на заданное расстояние
             (по умолчанию до границы проекции решетки).
         Get a region that is externally adjacent to this one from a given side and extended by a given distance
@@ -168,6 +430,8 @@ class Region(Box):
             direction (geom2d.Direction): direction that determines target side.
             distance (int, optional): length of region along `direction`. Values below zero mean maximum possible length.
                 Defaults to -1.
+            trim_empty (bool, optional): if True, cut off the far part of the region that contains no cells
+                (found via grid's occupancy summaries, without scanning). Defaults to False.
 
         Returns:
             Region: new non-overlapping Region having the same adjacent side to this one.
@@ -184,6 +448,14 @@ class Region(Box):
         else:
             coords = self.left, side, self.right, end
 
+        if trim_empty:
+            occupied = self.grid_view.grid.get_occupied_box(Box.from_2points(*coords))
+            end = occupied.get_side_dy_direction(direction) if occupied else side
+            if direction.is_horizontal:
+                coords = side, self.top, end, self.bottom
+            else:
+                coords = self.left, side, self.right, end
+
         return Region(self.grid_view, Box.from_2points(*coords))
 
 
@@ -0,0 +1,334 @@
+"""Пакетная обработка документов в пуле процессов.
+
+Грамматика читается и "прогревается" один раз на каждый рабочий процесс,
+после чего процесс обрабатывает файлы один за другим.
+"""
+
+from __future__ import annotations
+
+import os
+import signal
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from timeit import default_timer as timer
+
+from loguru import logger
+
+from vstuxls.converters.xlsx import ExcelGrid
+from vstuxls.export.vstu import export_schedule_document_as_json
+from vstuxls.grammar2d import Grammar, read_grammar
+from vstuxls.services.debugging import WaveDebugExporter
+from vstuxls.services.document_parser import DocumentParsingService
+
+
+class BatchTimeoutError(TimeoutError):
+    """Обработка файла не уложилась в отведённое время."""
+
+
+@dataclass
+class BatchJob:
+    """Задание на обработку одного XLSX файла."""
+
+    input_path: Path
+    # Папка для JSON-расписания; None — не экспортировать JSON.
+    json_output_dir: Path | None
+    # Папка для отчётов (создаётся подпапка с именем файла).
+    reports_dir: Path
+    enable_json: bool = True
+    enable_excel: bool = True
+    enable_diagnostics: bool = True
+    # Профиль разбора (parse_profile.json/.collapsed) рядом с диагностикой; требует enable_diagnostics.
+    enable_profiling: bool = False
+    # Режим чтения книги (см. `ExcelGrid.read_xlsx`): 'streaming' не держит объекты openpyxl в памяти.
+    read_mode: str = 'streaming'
+    # False — не извлекать стили ячеек (если грамматика не использует оформление).
+    with_styles: bool = True
+
+
+@dataclass
+class BatchResult:
+    """Результат обработки одного файла (передаётся из рабочего процесса)."""
+
+    job: BatchJob
+    ok: bool
+    root_matches: int = 0
+    json_path: Path | None = None
+    error: str | None = None
+    elapsed: float = 0.0
+    # Прервано по ограничению времени: состояние рабочего процесса могло остаться недообновлённым.
+    timed_out: bool = False
+
+
+def collect_jobs(
+    paths: Iterable[Path],
+    output_base: Path,
+    report_base: Path,
+    input_path_base: Path | None = None,
+    enable_json: bool = True,
+    enable_excel: bool = True,
+    enable_diagnostics: bool = True,
+    enable_profiling: bool = False,
+    read_mode: str = 'streaming',
+    with_styles: bool = True,
+) -> list[BatchJob]:
+    """Готовит задания для файлов `paths`.
+
+    input_path_base: если задано, в целевых папках воссоздаётся структура подкаталогов источника
+    относительно этого пути (для файлов вне него подкаталоги не создаются).
+    """
+    jobs = []
+    for path in paths:
+        reports_dir = report_base
+        json_output_dir = output_base
+        if input_path_base and path.is_relative_to(input_path_base):
+            subpath = path.parent.relative_to(input_path_base)
+            reports_dir = report_base / subpath
+            json_output_dir = output_base / subpath
+
+        jobs.append(BatchJob(
+            input_path=path,
+            json_output_dir=json_output_dir,
+            reports_dir=reports_dir,
+            enable_json=enable_json,
+            enable_excel=enable_excel,
+            enable_diagnostics=enable_diagnostics,
+            enable_profiling=enable_profiling,
+            read_mode=read_mode,
+            with_styles=with_styles,
+        ))
+    return jobs
+
+
+def load_grammar(grammar_path: Path) -> Grammar:
+    """Читает грамматику и заранее строит её кэши (волны зависимостей, классификатор ячеек)."""
+    grammar = read_grammar(grammar_path)
+    grammar.dependency_waves()
+    grammar.extension_map  # noqa: B018  (property builds cache)
+    grammar.get_cell_classifier()
+    return grammar
+
+
+def process_document(job: BatchJob, grammar: Grammar, grammar_path: Path | None = None) -> BatchResult:
+    """Обрабатывает один XLSX файл и сохраняет отчёты в подпапку с именем файла.
+
+    Исключения не перехватываются (см. `BatchProcessor`).
+    """
+    input_path = job.input_path
+    logger.info("Processing file: {}", input_path)
+
+    # Подпапка для отчётов — по имени исходного файла, без подпути
+    file_stem = input_path.stem
+    output_dir = job.reports_dir / file_stem
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    grid = ExcelGrid.read_xlsx(input_path, mode=job.read_mode, with_styles=job.with_styles)
+
+    exporter = WaveDebugExporter(
+        output_dir=output_dir,
+        enable_json=job.enable_json,
+        enable_excel=job.enable_excel,
+        only_wave_indices=(999, ),
+    )
+    service = DocumentParsingService(
+        grammar=grammar,
+        wave_exporter=exporter,
+        diagnostics_output_dir=output_dir if job.enable_diagnostics else None,
+        document_source_path=input_path,
+        grammar_source_path=grammar_path,
+        profiling=job.enable_profiling,
+        profile_collapsed_stacks=job.enable_profiling,
+    )
+
+    matches = service.parse_document(grid)
+    logger.info("  Found {} root matches", len(matches))
+
+    result = BatchResult(job=job, ok=True, root_matches=len(matches))
+    if matches:
+        document_match = matches[0]
+        service.export_final_report(document_match=document_match)
+
+        if job.json_output_dir is not None:
+            job.json_output_dir.mkdir(parents=True, exist_ok=True)
+            json_path = job.json_output_dir / f"{file_stem}.json"
+            export_schedule_document_as_json(
+                document_match,
+                dst_path=str(json_path),
+                source_path=input_path,
+            )
+            logger.info("  Exported JSON schedule to {}", json_path.resolve())
+            result.json_path = json_path
+
+    return result
+
+
+# Состояние рабочего процесса: грамматика загружается один раз в `_init_worker`.
+_worker_grammar: Grammar | None = None
+_worker_grammar_path: Path | None = None
+
+
+def _init_worker(grammar_path: Path) -> None:
+    global _worker_grammar, _worker_grammar_path
+    _worker_grammar = load_grammar(grammar_path)
+    _worker_grammar_path = grammar_path
+
+
+@contextmanager
+def _time_limit(seconds: float | None):
+    """Прерывает выполнение по таймеру (SIGALRM); там, где он недоступен, ограничение не действует.
+
+    Исключение возникает в произвольном месте кода, поэтому кэши грамматики (и прочее состояние процесса)
+    могут остаться недообновлёнными: после срабатывания процесс не должен переиспользовать своё состояние
+    (см. `_run_job` и `BatchProcessor`).
+    """
+    if not seconds or not hasattr(signal, 'SIGALRM') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise BatchTimeoutError(f'Processing took more than {seconds} s')
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _run_job(job: BatchJob, timeout: float | None) -> BatchResult:
+    """Обрабатывает задание в рабочем процессе; любая ошибка превращается в неуспешный результат."""
+    start = timer()
+    try:
+        with _time_limit(timeout):
+            result = process_document(job, _worker_grammar, _worker_grammar_path)
+    except Exception as exc:
+        logger.error("  Failed to process {}: {}", job.input_path, exc)
+        result = BatchResult(job=job, ok=False, error=f'{type(exc).__name__}: {exc}',
+                             timed_out=isinstance(exc, BatchTimeoutError))
+    if result.timed_out:
+        # Грамматику с кэшами, прерванными на середине, не переиспользуем: читаем заново
+        _init_worker(_worker_grammar_path)
+    result.elapsed = timer() - start
+    return result
+
+
+@dataclass
+class BatchProcessor:
+    """Обрабатывает множество файлов в пуле процессов, выдавая результаты по мере готовности.
+
+    workers: число рабочих процессов (None — по числу ядер; 0 — в текущем процессе, без пула).
+    max_in_flight: сколько заданий может одновременно находиться в пуле (None — 2 × workers);
+        остальные задания берутся из входного итератора по мере освобождения мест.
+    timeout: ограничение времени на один файл, секунд (работает на платформах с SIGALRM).
+    ordered: выдавать результаты в порядке заданий (иначе — в порядке завершения).
+
+    Если рабочий процесс аварийно завершился, теряются все задания, находившиеся в пуле.
+    Пул пересоздаётся, а потерянные задания перезапускаются по одному,
+    так что неуспешным помечается только то задание, которое действительно роняет процесс.
+
+    После превышения времени процесс перечитывает грамматику, а пул выводится из работы:
+    новые задания идут в новый пул, старый завершается, как только доделает уже отправленные ему задания.
+    """
+
+    grammar_path: Path
+    workers: int | None = None
+    max_in_flight: int | None = None
+    timeout: float | None = None
+    ordered: bool = True
+
+    def run(self, jobs: Iterable[BatchJob]) -> Iterator[BatchResult]:
+        """Запускает обработку; результаты выдаются потоково."""
+        if self.timeout and not hasattr(signal, 'SIGALRM'):
+            logger.warning("Per-file timeout is not supported on this platform and will be ignored.")
+
+        if self.workers == 0:
+            yield from self._run_in_process(jobs)
+        else:
+            yield from self._run_in_pool(jobs)
+
+    def _run_in_process(self, jobs: Iterable[BatchJob]) -> Iterator[BatchResult]:
+        _init_worker(self.grammar_path)
+        for job in jobs:
+            yield _run_job(job, self.timeout)
+
+    def _make_executor(self, workers: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.grammar_path, ),
+        )
+
+    def _run_in_pool(self, jobs: Iterable[BatchJob]) -> Iterator[BatchResult]:
+        workers = self.workers or os.cpu_count() or 1
+        in_flight_limit = max(1, self.max_in_flight or 2 * workers)
+
+        job_iter = enumerate(jobs)
+        # jobs lost when the pool broke; re-run one at a time to find the one that crashes the worker
+        suspects: list[tuple[int, BatchJob]] = []
+        pending: dict[Future, tuple[int, BatchJob]] = {}
+        ready: dict[int, BatchResult] = {}  # completed results waiting for their turn (ordered mode)
+        next_index = 0
+
+        executor = self._make_executor(workers)
+        try:
+            while True:
+                # Дозаполняем пул заданиями
+                isolated = bool(suspects)
+                if isolated:
+                    if not pending:
+                        index, job = suspects.pop(0)
+                        pending[executor.submit(_run_job, job, self.timeout)] = (index, job)
+                else:
+                    while len(pending) < in_flight_limit and (item := next(job_iter, None)) is not None:
+                        pending[executor.submit(_run_job, item[1], self.timeout)] = item
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                pool_broken = False
+                for future in done:
+                    index, job = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as exc:
+                        pool_broken = True
+                        if not isolated:
+                            suspects.append((index, job))
+                            continue
+                        logger.error("  Worker process crashed on {}", job.input_path)
+                        result = BatchResult(job=job, ok=False, error=f'Worker process crashed: {exc}')
+                    except Exception as exc:
+                        result = BatchResult(job=job, ok=False, error=f'{type(exc).__name__}: {exc}')
+
+                    if result.timed_out and not pool_broken:
+                        # Процесс, прерванный по таймеру, больше не получает новых заданий
+                        executor.shutdown(wait=False)
+                        executor = self._make_executor(workers)
+
+                    if not self.ordered:
+                        yield result
+                        continue
+                    ready[index] = result
+                    while next_index in ready:
+                        yield ready.pop(next_index)
+                        next_index += 1
+
+                if pool_broken:
+                    # Остальные задания сломанного пула тоже потеряны
+                    suspects.extend(pending.values())
+                    pending.clear()
+                    suspects.sort(key=lambda item: item[0])
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = self._make_executor(workers)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        # в упорядоченном режиме все результаты уже выданы
+        assert not ready, ready
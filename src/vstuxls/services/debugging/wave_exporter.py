@@ -212,7 +212,7 @@ class WaveDebugExporter:
         excel_grid: ExcelGrid = grid  # type: ignore[assignment]
 
         workbook_copy = self._clone_workbook(excel_grid)
-        worksheet_copy = workbook_copy[excel_grid._worksheet.title]
+        worksheet_copy = workbook_copy[excel_grid.get_worksheet().title]
         self._clear_cell_fills(worksheet_copy)
         pattern_colors = self._resolve_colors(all_matches)
         border_style = self._make_border()
@@ -237,7 +237,7 @@ class WaveDebugExporter:
         excel_grid: ExcelGrid = grid  # type: ignore[assignment]
 
         workbook_copy = self._clone_workbook(excel_grid)
-        worksheet_copy = workbook_copy[excel_grid._worksheet.title]
+        worksheet_copy = workbook_copy[excel_grid.get_worksheet().title]
         self._clear_cell_fills(worksheet_copy)
         pattern_colors = self._resolve_colors(matches)
         border_style = self._make_border()
@@ -263,7 +263,7 @@ class WaveDebugExporter:
     @staticmethod
     def _clone_workbook(grid: "ExcelGrid"):
         """Make a deep copy of the original workbook to avoid altering source files."""
-        workbook = grid._worksheet.parent
+        workbook = grid.get_worksheet().parent
         stream = BytesIO()
         workbook.save(stream)
         stream.seek(0)
@@ -1,7 +1,7 @@
-"""Диагностика парсинга: структурированные отчёты по документу."""
+"""Диагностика парсинга: структурированные отчёты по документу (и профиль разбора)."""
 
 from vstuxls.services.diagnostics.collector import DiagnosticsCollector
-from vstuxls.services.diagnostics.exporter import export_parsing_diagnostics_json
+from vstuxls.services.diagnostics.exporter import export_parse_profile, export_parsing_diagnostics_json
 from vstuxls.services.diagnostics.schema import (
     MATCH_LIMIT_APPLIED,
     OVERLAP_RESOLUTION_UNEXPECTED_MODE,
@@ -21,5 +21,6 @@ __all__ = [
     "DocumentDiagnostics",
     "IssueSeverity",
     "ParsingIssue",
+    "export_parse_profile",
     "export_parsing_diagnostics_json",
 ]
@@ -1,8 +1,9 @@
-"""Запись отчёта parsing_diagnostics.json на диск."""
+"""Запись отчётов parsing_diagnostics.json и parse_profile.json на диск."""
 
 import json
 from pathlib import Path
 
+from vstuxls.grammar2d.profiling import ParseProfiler
 from vstuxls.services.diagnostics.schema import DocumentDiagnostics
 
 
@@ -18,3 +19,21 @@ def export_parsing_diagnostics_json(
         encoding="utf-8",
     )
     return path
+
+
+def export_parse_profile(
+    profiler: ParseProfiler,
+    output_dir: Path,
+    collapsed_stacks: bool = False,
+    filename: str = "parse_profile.json",
+) -> Path:
+    """Пишет профиль разбора в JSON; при `collapsed_stacks` рядом — `<имя>.collapsed` для flame graph."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / filename
+    path.write_text(
+        json.dumps(profiler.to_json_dict(), ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+    if collapsed_stacks:
+        path.with_suffix(".collapsed").write_text(profiler.to_collapsed_stacks(), encoding="utf-8")
+    return path
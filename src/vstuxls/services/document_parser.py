@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 from collections.abc import Iterable, Sequence
+from concurrent.futures import Executor
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
+from vstuxls.converters.xlsx import ExcelGrid
 from vstuxls.grammar2d import Grammar, GrammarMatcher
 from vstuxls.grammar2d.Match2d import Match2d
+from vstuxls.grammar2d.profiling import ParseProfiler
 from vstuxls.services.debugging import WaveDebugExporter
-from vstuxls.services.diagnostics import DiagnosticsCollector, export_parsing_diagnostics_json
+from vstuxls.services.diagnostics import (
+    DiagnosticsCollector,
+    export_parse_profile,
+    export_parsing_diagnostics_json,
+)
 
 # Список паттернов для анализа неиспользованных совпадений
 DEFAULT_UNUSED_PATTERNS_TO_ANALYZE = [
@@ -45,6 +52,15 @@ class DocumentParsingService:
     diagnostics_output_dir: Path | None = None
     document_source_path: str | Path | None = None
     grammar_source_path: str | Path | None = None
+    # Экспериментально: пул потоков для сопоставления паттернов внутри волны (см. `GrammarMatcher.wave_executor`).
+    wave_executor: Executor | None = None
+    # Профилирование по паттернам и волнам (см. `ParseProfiler`); результат — `last_profile`,
+    # а при заданном diagnostics_output_dir — ещё и parse_profile.json рядом с parsing_diagnostics.json.
+    profiling: bool = False
+    # Отслеживать пики выделения памяти (tracemalloc; заметно замедляет разбор).
+    profile_trace_memory: bool = False
+    # Дополнительно писать parse_profile.collapsed (стеки для flame graph).
+    profile_collapsed_stacks: bool = False
 
     _matcher: GrammarMatcher = field(init=False)
     _last_grid: Any = field(default=None, init=False)
@@ -52,7 +68,9 @@ class DocumentParsingService:
     _diagnostics_collector: DiagnosticsCollector | None = field(default=None, init=False, repr=False)
 
     def __post_init__(self) -> None:
-        self._matcher = GrammarMatcher(self.grammar, wave_observer=self)
+        self._matcher = GrammarMatcher(self.grammar, wave_observer=self, wave_executor=self.wave_executor)
+        if self.profiling:
+            self._matcher.profiler = ParseProfiler(trace_memory=self.profile_trace_memory)
 
     def parse_document(self, grid: Any) -> list[Match2d]:
         """Основная точка входа: запускает распознавание документа."""
@@ -86,11 +104,37 @@ class DocumentParsingService:
                 self._diagnostics_collector.mark_finished()
                 doc_diag = self._diagnostics_collector.build_document_diagnostics()
                 export_parsing_diagnostics_json(doc_diag, Path(self.diagnostics_output_dir))
+            if self._matcher.profiler is not None and self.diagnostics_output_dir is not None:
+                export_parse_profile(self._matcher.profiler, Path(self.diagnostics_output_dir),
+                                     collapsed_stacks=self.profile_collapsed_stacks)
             self._matcher.diagnostic_sink = None
             self._diagnostics_collector = None
 
         return matches
 
+    def parse_workbook(self, path: str | Path, mode: str = 'full',
+                       with_styles: bool = True) -> dict[str, list[Match2d]]:
+        """Распознаёт все листы книги Excel; книга открывается (распаковывается) только один раз.
+
+        Возвращает совпадения корневого паттерна по названиям листов.
+        Если задан `diagnostics_output_dir`, диагностика каждого листа пишется в его подпапку
+        `<diagnostics_output_dir>/<название листа>/`.
+        `mode`, `with_styles`: параметры чтения книги, см. `ExcelGrid.read_xlsx`.
+        """
+        diagnostics_base = self.diagnostics_output_dir
+        source_path = self.document_source_path
+        self.document_source_path = path
+        results: dict[str, list[Match2d]] = {}
+        try:
+            for grid in ExcelGrid.iter_sheets(path, mode=mode, with_styles=with_styles):
+                if diagnostics_base is not None:
+                    self.diagnostics_output_dir = Path(diagnostics_base) / grid.sheet_title
+                results[grid.sheet_title] = self.parse_document(grid)
+        finally:
+            self.diagnostics_output_dir = diagnostics_base
+            self.document_source_path = source_path
+        return results
+
     def notify_wave_started(self, wave_index: int, patterns: Iterable[str]) -> None:
         """Вспомогательный метод: уведомляет хуки о запуске волны."""
         if self._diagnostics_collector is not None:
@@ -110,6 +154,11 @@ class DocumentParsingService:
         if self.debug_hooks:
             self.debug_hooks.on_wave_completed(wave_index, matches_list)
 
+    @property
+    def last_profile(self) -> ParseProfiler | None:
+        """Профиль последнего разбора (если включено `profiling`)."""
+        return self._matcher.profiler
+
     @property
     def matcher(self) -> GrammarMatcher:
         """Возвращает внутренний `GrammarMatcher`."""
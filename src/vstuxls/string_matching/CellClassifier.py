@@ -1,26 +1,129 @@
+from collections import OrderedDict, defaultdict
 
 from vstuxls.string_matching.CellType import CellType
 from vstuxls.string_matching.StringMatch import StringMatch
+from vstuxls.string_matching.StringPattern import StringPattern
 
 
 class CellClassifier:
     """ Классификатор для контента ячейки,
         находит для данной строки наиболее подходящие типы
-        из известных CellType """
+        из известных CellType.
+
+        Результаты классификации запоминаются по тексту ячейки
+        (в документах расписаний одни и те же строки повторяются тысячи раз).
+        `cache_size`: None — неограниченный кэш, 0 — без кэша,
+        N > 0 — LRU-кэш не более чем на N строк.
+
+        Перед запуском регулярных выражений паттерны отбираются по дешёвым признакам
+        (см. `PatternPrefilter`): текст предобрабатывается один раз на каждую цепочку `preprocess`,
+        после чего кандидаты выбираются по первому символу и длине строки.
+        Результат совпадает с последовательным перебором `CellType.match`. """
     cell_types: list[CellType]
+    cache_size: int | None
+    cache_hits: int
+    cache_misses: int
+
+    # cell text → all matches sorted by precision DESC
+    _memo: OrderedDict[str, list[StringMatch]]
 
-    def __init__(self, cell_types=None):
+    # preprocess chain → dispatcher over patterns sharing that chain
+    _dispatch: dict[tuple, '_ChainDispatch']
+
+    def __init__(self, cell_types=None, cache_size: int | None = None):
         # if cell_types is not None:
         #     cell_types = ns.read_cell_types().values()
         self.cell_types = list(cell_types)
+        assert cache_size is None or cache_size >= 0, f"cache_size must be non-negative or None, got: {cache_size}"
+        self.cache_size = cache_size
+        self._memo = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._build_dispatch()
+
+    def _build_dispatch(self):
+        entries_by_chain = defaultdict(list)
+        for type_index, ct in enumerate(self.cell_types):
+            for rank, p in enumerate(ct.patterns):
+                entries_by_chain[p.preprocess_chain].append((type_index, rank, p))
+
+        self._dispatch = {
+            chain: _ChainDispatch(entries)
+            for chain, entries in entries_by_chain.items()
+        }
 
     def match(self, cell_text: str, limit=None) -> list[StringMatch]:
         """ Find matches for given `cell_text`, sorted by precision DESC.
          Optionally crop result to `limit` best matches. """
-        matches = []
-        for ct in self.cell_types:
-            if m := ct.match(cell_text):
-                matches.append(m)
+        if self.cache_size == 0:
+            return self._classify(cell_text)[:limit]
+
+        matches = self._memo.get(cell_text)
+        if matches is None:
+            self.cache_misses += 1
+            matches = self._classify(cell_text)
+            self._memo[cell_text] = matches
+            if self.cache_size is not None and len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)  # evict least recently used
+        else:
+            self.cache_hits += 1
+            if self.cache_size is not None:
+                self._memo.move_to_end(cell_text)
 
-        matches.sort(key=lambda m: m.precision, reverse=True)  # Changed confidence → precision
         return matches[:limit]
+
+    def _classify(self, cell_text: str) -> list[StringMatch]:
+        # type index → (rank of matched pattern within the type, match)
+        found: dict[int, tuple[int, StringMatch]] = {}
+
+        for dispatch in self._dispatch.values():
+            string = dispatch.preprocess_string(cell_text)
+            for type_index, rank, p in dispatch.candidates(string):
+                if type_index in found and found[type_index][0] < rank:
+                    continue  # a pattern with higher confidence already matched
+                if m := p.match_preprocessed(string):
+                    found[type_index] = (rank, m)
+
+        # keep the order of cell types for matches of equal precision
+        matches = [found[type_index][1] for type_index in sorted(found)]
+        matches.sort(key=lambda m: m.precision, reverse=True)  # Changed confidence → precision
+        return matches
+
+    def clear_cache(self):
+        self._memo.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class _ChainDispatch:
+    """ Patterns sharing the same preprocess chain, indexed by the first char of preprocessed text. """
+    entries: list[tuple[int, int, StringPattern]]  # (type index, rank in type, pattern)
+
+    # first char ('' for empty string) → entries that can match a string starting with it
+    _by_first_char: dict[str, list[tuple[int, int, StringPattern]]]
+
+    def __init__(self, entries: list[tuple[int, int, StringPattern]]):
+        self.entries = entries
+        self._by_first_char = {}
+
+    def preprocess_string(self, string: str) -> str:
+        return self.entries[0][2].preprocess_string(string)
+
+    def candidates(self, string: str) -> list[tuple[int, int, StringPattern]]:
+        """ Entries (in original order) whose pattern can possibly match preprocessed `string`. """
+        first_char = string[:1]
+        entries = self._by_first_char.get(first_char)
+        if entries is None:
+            entries = self._by_first_char[first_char] = [
+                e for e in self.entries
+                if (prefilter := e[2].prefilter) is None
+                or not first_char
+                or prefilter.admits_first_char(first_char)
+            ]
+
+        length = len(string)
+        return [
+            e for e in entries
+            if (prefilter := e[2].prefilter) is None
+            or prefilter.admits_length(length)
+        ]
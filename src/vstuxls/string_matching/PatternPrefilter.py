@@ -0,0 +1,134 @@
+import re
+
+# Разбор паттерна — внутренние модули `re` (проверено с Python 3.12–3.13).
+# Если они недоступны или изменились, признаки не извлекаются и проверяется каждая строка.
+try:
+    from re import _constants as sre_c
+    from re import _parser as sre_parse
+
+    _CATEGORY_TO_RE = {
+        sre_c.CATEGORY_DIGIT: r'\d',
+        sre_c.CATEGORY_NOT_DIGIT: r'\D',
+        sre_c.CATEGORY_SPACE: r'\s',
+        sre_c.CATEGORY_NOT_SPACE: r'\S',
+        sre_c.CATEGORY_WORD: r'\w',
+        sre_c.CATEGORY_NOT_WORD: r'\W',
+    }
+    _REPEATS = (sre_c.MAX_REPEAT, sre_c.MIN_REPEAT, sre_c.POSSESSIVE_REPEAT)
+    _START_ANCHORS = (sre_c.AT_BEGINNING, sre_c.AT_BEGINNING_STRING)
+except (ImportError, AttributeError):
+    sre_parse = None
+# flags that affect matching of a single character
+_CHAR_FLAGS = re.IGNORECASE | re.ASCII | re.UNICODE
+
+
+class PatternPrefilter:
+    """ Дешёвая проверка, отсекающая строки, которые заведомо не подойдут под регулярное выражение,
+        до запуска самого регулярного выражения.
+
+        Признаки извлекаются из разобранного (`re._parser`) паттерна:
+         - допустимая длина строки (минимальная и, для `fullmatch`, максимальная ширина совпадения);
+         - для паттернов, привязанных к началу строки, — класс первого символа совпадения.
+
+        Проверка консервативна: `admits()` возвращает False, только если совпадение невозможно,
+        поэтому результаты сопоставления не меняются.
+        Если паттерн не удаётся разобрать, признаков нет и пропускается любая строка.
+    """
+    min_len: int = 0
+    max_len: int | None = None
+
+    # matches any possible first character (with the pattern's flags), or None if unknown
+    _head_re: re.Pattern | None = None
+
+    def __init__(self, pattern: str, flags: int = 0, match_method: str = 'match'):
+        if sre_parse is None:
+            return
+        try:
+            min_len, max_len, head_re = _extract_features(pattern, flags, match_method)
+        except Exception:  # invalid pattern or a construct unknown to this analysis
+            return
+        self.min_len, self.max_len, self._head_re = min_len, max_len, head_re
+
+    def admits_length(self, length: int) -> bool:
+        return length >= self.min_len and (self.max_len is None or length <= self.max_len)
+
+    def admits_first_char(self, char: str) -> bool:
+        """ Check whether a match can start with `char` (the first char of a non-empty string). """
+        return self._head_re is None or self._head_re.fullmatch(char) is not None
+
+    def admits(self, string: str) -> bool:
+        """ Check whether the pattern can possibly match `string` (already preprocessed). """
+        if not self.admits_length(len(string)):
+            return False
+        return not string or self.admits_first_char(string[0])
+
+
+def _extract_features(pattern: str, flags: int, match_method: str) -> tuple[int, int | None, re.Pattern | None]:
+    """ (min_len, max_len, head_re) of `PatternPrefilter`. """
+    parsed = sre_parse.parse(pattern, flags)
+
+    min_width, max_width = parsed.getwidth()
+    max_len = max_width if match_method == 'fullmatch' else None
+
+    head_re = None
+    if match_method in ('match', 'fullmatch') and min_width > 0:
+        head = _head_of(parsed.data)
+        if head is not None:
+            head_re = re.compile(head, parsed.state.flags & _CHAR_FLAGS)
+    return min_width, max_len, head_re
+
+
+def _head_of(items) -> str | None:
+    """ Regex matching the first character consumed by a parsed (sub)pattern,
+        or None if it cannot be determined cheaply. """
+    for op, av in items:
+        if op is sre_c.AT:
+            if av in _START_ANCHORS:
+                continue  # zero-width & always satisfied at position 0
+            return None
+        if op is sre_c.LITERAL:
+            return re.escape(chr(av))
+        if op is sre_c.NOT_LITERAL:
+            return f'[^{re.escape(chr(av))}]'
+        if op is sre_c.IN:
+            return _charset_to_re(av)
+        if op is sre_c.SUBPATTERN:
+            _group, add_flags, del_flags, sub = av
+            if add_flags or del_flags or sub.getwidth()[0] == 0:
+                return None
+            return _head_of(sub.data)
+        if op is sre_c.ATOMIC_GROUP:
+            if av.getwidth()[0] == 0:
+                return None
+            return _head_of(av.data)
+        if op in _REPEATS:
+            min_count, _max_count, sub = av
+            if min_count == 0 or sub.getwidth()[0] == 0:
+                return None
+            return _head_of(sub.data)
+        if op is sre_c.BRANCH:
+            alternatives = []
+            for alt in av[1]:
+                if alt.getwidth()[0] == 0 or (head := _head_of(alt.data)) is None:
+                    return None
+                alternatives.append(head)
+            return '(?:%s)' % '|'.join(alternatives)
+        # anything else (ANY, group references, lookarounds, ...) is not analysed
+        return None
+    return None
+
+
+def _charset_to_re(charset) -> str | None:
+    parts = []
+    for op, av in charset:
+        if op is sre_c.NEGATE:
+            parts.append('^')
+        elif op is sre_c.LITERAL:
+            parts.append(re.escape(chr(av)))
+        elif op is sre_c.RANGE:
+            parts.append(f'{re.escape(chr(av[0]))}-{re.escape(chr(av[1]))}')
+        elif op is sre_c.CATEGORY and av in _CATEGORY_TO_RE:
+            parts.append(_CATEGORY_TO_RE[av])
+        else:
+            return None
+    return '[%s]' % ''.join(parts)
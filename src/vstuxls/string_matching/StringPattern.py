@@ -1,9 +1,11 @@
 import re
 from collections.abc import Callable
+from functools import lru_cache
 from typing import TYPE_CHECKING, Union
 
 import vstuxls.string_matching.CellType as ns
 import vstuxls.string_matching.StringMatch as sm
+from vstuxls.string_matching.PatternPrefilter import PatternPrefilter
 from vstuxls.string_matching.StringTransformer import StringTransformer
 
 if TYPE_CHECKING:
@@ -21,6 +23,14 @@ VALID_pattern_syntax = {
 }
 VALID_preprocess = {'fix_sparse_words', 'remove_all_spaces', 'remove_spaces_around_hypen'}
 
+# default preprocess steps applied after custom ones
+DEFAULT_preprocess = (
+    # cut whitespaces outside
+    str.strip,
+    # cut extra whitespaces inside
+    'shrink_extra_inner_spaces',
+)
+
 
 class StringPattern:
     """ Паттерн для сопоставления строк со степенью уверенности.
@@ -63,6 +73,7 @@ class StringPattern:
     # inner data
     _compiled_re: re.Pattern = None
     _re_match_method: Callable = None
+    _prefilter: PatternPrefilter = None  # cheap features of regex, used by CellClassifier
 
     def __init__(self, *args, **kwargs):
         """Valid calls:
@@ -113,8 +124,10 @@ class StringPattern:
         self.prepare_pattern()
 
     def match(self, string: str) -> Union['StringMatch', None]:
-        string = self.preprocess_string(string)
+        return self.match_preprocessed(self.preprocess_string(string))
 
+    def match_preprocessed(self, string: str) -> Union['StringMatch', None]:
+        """ Match `string` that has already been passed through `preprocess_string`. """
         if self.pattern_syntax == 'plain':
             if string == self.pattern:
                 re_match_imitation = [string]  # list has `0` index
@@ -158,6 +171,8 @@ class StringPattern:
 
             self._re_match_method = getattr(self._compiled_re, match_method)
 
+            self._prefilter = PatternPrefilter(self.pattern, self.pattern_flags, match_method)
+
     def prepare_anchors(self):
         """ validate & re-create `anchors` """
         # anchors: tuple | str = ('start',)
@@ -171,25 +186,18 @@ class StringPattern:
 
         self.anchors = tuple(new_anchors)
 
-    def preprocess_string(self, string: str) -> str:
-        transformations = []
-
-        # use custom transformations if set
-        if self.preprocess:
-            transformations.extend(self.preprocess)
+    @property
+    def prefilter(self) -> PatternPrefilter | None:
+        """ Cheap necessary conditions for a match (None for 'plain' syntax). """
+        return self._prefilter
 
-        # add default preprocess steps:
-        transformations += [
-            # cut whitespaces outside
-            str.strip,
-            # cut extra whitespaces inside
-            'shrink_extra_inner_spaces',
-        ]
+    @property
+    def preprocess_chain(self) -> tuple:
+        """ Patterns with equal chains get equal strings from `preprocess_string`. """
+        return tuple(self.preprocess or ())
 
-        for tr in transformations:
-            string = StringTransformer.apply(tr, string)
-
-        return string
+    def preprocess_string(self, string: str) -> str:
+        return preprocess_with_chain(self.preprocess_chain, string)
 
     def logical_index_to_re_group_index(self, re_match: re.Match | list[str], index_or_name: int | str):
         """
@@ -226,6 +234,15 @@ class StringPattern:
         return f'<{type(self).__name__}: content_class={self.content_class}>'
 
 
+@lru_cache(maxsize=1 << 14)
+def preprocess_with_chain(chain: tuple, string: str) -> str:
+    """ Apply custom transformations `chain` (ids of transformers), then the default ones.
+     Cached per (chain, string): patterns sharing a chain do not redo the same normalization. """
+    for tr in chain + DEFAULT_preprocess:
+        string = StringTransformer.apply(tr, string)
+    return string
+
+
 def re_flags_to_int(re_flags: str = '') -> int:
     """Get int union of flags for re.* constants:
      I M S X - IGNORECASE MULTILINE DOTALL VERBOSE"""
@@ -4,12 +4,15 @@ from collections.abc import Callable
 
 class StringTransformer:
     registry = {}
+    # transformer id → shared instance (transformers are stateless)
+    _instances = {}
 
     @classmethod
     def register(cls, transformer_cls):
         # Регистрация подкласса в реестре по его id
         transformer_id = transformer_cls.get_id()
         cls.registry[transformer_id] = transformer_cls
+        cls._instances.pop(transformer_id, None)
 
     def transform(self, string: str) -> str:
         raise NotImplementedError('StringTransformer class is intended for subclassing only.')
@@ -22,9 +25,16 @@ class StringTransformer:
             f = transformer_id  #
             return f(string)
 
-        transformer_cls = cls.registry.get(transformer_id)
-        if transformer_cls is None:
-            raise ValueError(f"No transformer registered for id: {transformer_id}")
+        return cls.get_instance(transformer_id).transform(string)
 
-        transformer = transformer_cls()  # Note: excessive creation for just one call
-        return transformer.transform(string)
+    @classmethod
+    def get_instance(cls, transformer_id: str) -> 'StringTransformer':
+        # Получение (единственного) экземпляра преобразователя по id
+        transformer = cls._instances.get(transformer_id)
+        if transformer is None:
+            transformer_cls = cls.registry.get(transformer_id)
+            if transformer_cls is None:
+                raise ValueError(f"No transformer registered for id: {transformer_id}")
+
+            transformer = cls._instances[transformer_id] = transformer_cls()
+        return transformer
@@ -0,0 +1,143 @@
+"""Пакетная обработка файлов в пуле процессов."""
+
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tests_bootstrapper import init_testing_environment
+
+init_testing_environment()
+
+from vstuxls.services.batch import BatchJob, BatchProcessor, BatchResult, collect_jobs
+
+ROOT = Path(__file__).parent
+GRAMMAR = ROOT / "test_data/simple_grammar_txt.yml"
+
+
+class BatchProcessorTestCase(unittest.TestCase):
+    def make_jobs(self, out: Path) -> list[BatchJob]:
+        paths = [
+            ROOT / "test_data/grid1.xlsx",
+            ROOT / "test_data/no_such_file.xlsx",
+            ROOT / "test_data/grid1.xlsx",
+        ]
+        return [
+            BatchJob(path, json_output_dir=None, reports_dir=out / str(i),
+                     enable_json=False, enable_excel=False, enable_diagnostics=False)
+            for i, path in enumerate(paths)
+        ]
+
+    def check_results(self, jobs, results):
+        self.assertEqual(len(jobs), len(results))
+        self.assertEqual([True, False, True], [r.ok for r in sorted(results, key=lambda r: str(r.job.reports_dir))])
+        for r in results:
+            if r.ok:
+                self.assertEqual(1, r.root_matches)
+            else:
+                self.assertIn('FileNotFoundError', r.error)
+
+    def test_in_process(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = self.make_jobs(Path(tmp))
+            results = list(BatchProcessor(GRAMMAR, workers=0).run(jobs))
+            self.assertEqual([j.input_path for j in jobs], [r.job.input_path for r in results])
+            self.check_results(jobs, results)
+
+    def test_pool_ordered(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = self.make_jobs(Path(tmp))
+            results = list(BatchProcessor(GRAMMAR, workers=2, max_in_flight=2).run(iter(jobs)))
+            # results are unpickled copies: compare by fields
+            self.assertEqual([j.reports_dir for j in jobs], [r.job.reports_dir for r in results])
+            self.check_results(jobs, results)
+
+    def test_pool_unordered(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = self.make_jobs(Path(tmp))
+            results = list(BatchProcessor(GRAMMAR, workers=2, ordered=False).run(jobs))
+            self.check_results(jobs, results)
+
+    def test_collect_jobs(self):
+        base = Path("in")
+        jobs = collect_jobs([base / "a" / "x.xlsx", Path("other/y.xlsx")], Path("out"), Path("rep"), base)
+        self.assertEqual(Path("out/a"), jobs[0].json_output_dir)
+        self.assertEqual(Path("rep/a"), jobs[0].reports_dir)
+        self.assertEqual(Path("out"), jobs[1].json_output_dir)
+        self.assertEqual('streaming', jobs[0].read_mode)
+
+
+# Грамматики, с которыми вызывался `fake_process_document` (в текущем процессе)
+seen_grammars = []
+
+
+def fake_process_document(job: BatchJob, grammar, grammar_path=None) -> BatchResult:
+    """ Вместо разбора: `crash.xlsx` роняет рабочий процесс, `slow.xlsx` не укладывается в ограничение времени. """
+    seen_grammars.append(grammar)
+    if job.input_path.name == 'crash.xlsx':
+        os._exit(1)
+    if job.input_path.name == 'slow.xlsx':
+        time.sleep(30)
+    return BatchResult(job=job, ok=True, root_matches=1)
+
+
+@mock.patch('vstuxls.services.batch.process_document', fake_process_document)
+class BatchFailureIsolationTestCase(unittest.TestCase):
+    """ Отказы отдельных файлов (падение процесса, превышение времени) не затрагивают остальные. """
+    TIMEOUT = 0.5
+    NAMES = ['a', 'crash', 'b', 'slow', 'c', 'd']
+
+    def make_jobs(self, names) -> list[BatchJob]:
+        return [
+            BatchJob(Path(f'{name}.xlsx'), json_output_dir=None, reports_dir=Path('unused'),
+                     enable_json=False, enable_excel=False, enable_diagnostics=False)
+            for name in names
+        ]
+
+    def check_results(self, names, results):
+        self.assertEqual(names, [r.job.input_path.stem for r in results])
+        for name, r in zip(names, results):
+            if name == 'crash':
+                self.assertFalse(r.ok)
+                self.assertIn('Worker process crashed', r.error)
+            elif name == 'slow':
+                self.assertFalse(r.ok)
+                self.assertIn('BatchTimeoutError', r.error)
+                self.assertTrue(r.timed_out)
+            else:
+                self.assertTrue(r.ok, r.error)
+
+    def run_pool(self, **kwargs) -> list[BatchResult]:
+        if multiprocessing.get_start_method() != 'fork':
+            self.skipTest('patched process_document reaches workers only with the fork start method')
+        processor = BatchProcessor(GRAMMAR, timeout=self.TIMEOUT, **kwargs)
+        return list(processor.run(self.make_jobs(self.NAMES)))
+
+    def test_timeout_in_process(self):
+        names = ['a', 'slow', 'b']
+        seen_grammars.clear()
+        results = list(BatchProcessor(GRAMMAR, workers=0, timeout=self.TIMEOUT).run(self.make_jobs(names)))
+        self.check_results(names, results)
+        # после превышения времени грамматика прочитана заново
+        a, slow, b = seen_grammars
+        self.assertIs(a, slow)
+        self.assertIsNot(slow, b)
+
+    def test_pool_ordered(self):
+        self.check_results(self.NAMES, self.run_pool(workers=2, max_in_flight=4))
+
+    def test_pool_unordered(self):
+        # один процесс и одно задание в пуле: порядок завершения совпадает с порядком заданий
+        self.check_results(self.NAMES, self.run_pool(workers=1, max_in_flight=1, ordered=False))
+
+    def test_pool_unordered_parallel(self):
+        results = self.run_pool(workers=2, max_in_flight=4, ordered=False)
+        results.sort(key=lambda r: self.NAMES.index(r.job.input_path.stem))
+        self.check_results(self.NAMES, results)
+
+
+if __name__ == '__main__':
+    unittest.main()
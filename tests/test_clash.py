@@ -1,11 +1,16 @@
+import gc
 import unittest
-from random import shuffle
+import weakref
+from dataclasses import dataclass
+from itertools import combinations
+from random import Random, shuffle
 
 from tests_bootstrapper import init_testing_environment
 
 init_testing_environment()
 
 from vstuxls.clash import *
+from vstuxls.clash.caching import current_cache_scope, scoped_cache
 
 
 class ClashSetsTestCase(unittest.TestCase):
@@ -803,6 +808,333 @@ class ClashTestCase(unittest.TestCase):
             print('OK!')
 
 
+class ClashBitmasksTestCase(unittest.TestCase):
+    """ Битовое представление накладок (`MemberIndex`) согласовано с множествами. """
+
+    def make_universe(self):
+        s = '1234567890x'
+        u = ClashingElementSet.make([s[i:i + 3] for i in range(len(s) - 3 + 1)], trivial_components_getter)
+        fill_clashing_elements(u)
+        return u
+
+    def test_member_index(self):
+        u = self.make_universe()
+        index = next(iter(u)).data.member_index
+        self.assertEqual(list(u), index.elements)
+        self.assertEqual((1 << len(u)) - 1, u.member_mask())
+        self.assertEqual(0, ClashingElementSet().member_mask())
+
+        some = ClashingElementSet(list(u)[::3])
+        # decoded in the order of the universe
+        self.assertEqual([el for el in u if el in some], list(index.decode(some.member_mask())))
+
+        foreign = ClashingElementSet.make(['abc'], trivial_components_getter)
+        self.assertIsNone(index.mask_of(foreign))
+        self.assertIsNone(ClashingElementSet(some | foreign).member_mask())
+
+    def test_clashing_masks(self):
+        u = self.make_universe()
+        for el in u:
+            expected = {other for other in u if other != el and set(el.obj) & set(other.obj)}
+            self.assertEqual(expected, el.data.globally_clashing)
+            self.assertEqual(ClashingElementSet(expected).member_mask(), el.data.clashing_mask)
+            for other in u:
+                self.assertEqual(bool(set(el.obj) & set(other.obj)), el.clashes_with(other))
+
+    def test_components_mask(self):
+        elements = {el.obj: el for el in ClashingElementSet.make(['ab', 'bc', 'cd'], trivial_components_getter)}
+        self.assertTrue(all(el.components_mask for el in elements.values()))
+        self.assertTrue(elements['ab'].clashes_with(elements['bc']))
+        self.assertFalse(elements['ab'].clashes_with(elements['cd']))
+
+        # компоненты, пронумерованные в разных вызовах `make`, сравниваются как множества
+        other = next(iter(ClashingElementSet.make(['dx'], trivial_components_getter)))
+        self.assertTrue(elements['cd'].clashes_with(other))
+        self.assertFalse(elements['ab'].clashes_with(other))
+
+    def test_free_subset_and_try_add_all(self):
+        u = self.make_universe()
+        su = sorted(u)
+        subset = ClashingElementSet(su[:2] + su[4:5] + su[7:])
+        self.assertEqual({su[4]}, subset.free_subset())
+
+        # bitwise `try_add_all` gives the same as adding one by one
+        for start in range(3):
+            bitwise, one_by_one = Arrangement(), Arrangement()
+            ok, not_added = bitwise.try_add_all(su[start:])
+            refused = {el for el in su[start:] if not one_by_one.try_add(el)}
+            self.assertEqual((not refused, refused), (ok, not_added))
+            self.assertEqual(one_by_one, bitwise)
+            self.assertEqual(one_by_one.incompatible, bitwise.incompatible)
+
+
+class MaxWeightIndependentSetTestCase(unittest.TestCase):
+    """ Точный поиск лучшей раскладки (`find_max_weight_independent_set`) против полного перебора. """
+
+    @staticmethod
+    def brute_force(objs: list[str], weight) -> tuple[float, int]:
+        best = (0.0, 0)
+        for size in range(1, len(objs) + 1):
+            for subset in combinations(objs, size):
+                if all(not set(a) & set(b) for a, b in combinations(subset, 2)):
+                    best = max(best, (round(sum(map(weight, subset)), 9), size))
+        return best
+
+    def test_random_against_brute_force(self):
+        rnd = Random(7)
+        for _ in range(60):
+            letters = 'abcdefghij'[:rnd.randint(3, 10)]
+            objs = sorted({''.join(rnd.sample(letters, rnd.randint(1, 3))) for _ in range(rnd.randint(1, 13))})
+            weights = {obj: rnd.choice([0.5, 1.0, rnd.random()]) for obj in objs}
+
+            result = find_max_weight_independent_set(objs, weights.get, components_getter=trivial_components_getter)
+
+            self.assertTrue(result.exact)
+            self.assertEqual(sorted(result.elements), result.elements)
+            self.assertTrue(all(not set(a) & set(b) for a, b in combinations(result.elements, 2)), result.elements)
+            self.assertEqual(self.brute_force(objs, weights.get),
+                             (round(result.weight, 9), len(result.elements)), objs)
+
+    def test_ties_prefer_more_elements(self):
+        weights = {'ab': 1.0, 'a': 0.5, 'b': 0.5, 'cd': 0.3, 'c': 0.1}
+        result = find_max_weight_independent_set(weights, weights.get, components_getter=trivial_components_getter)
+        self.assertEqual(['a', 'b', 'cd'], result.elements)
+
+        result = find_max_weight_independent_set(weights, weights.get, components_getter=trivial_components_getter,
+                                                 max_elements=2)
+        self.assertEqual(['a', 'b'], result.elements)
+
+    def test_time_budget(self):
+        # пары и составляющие их одиночные элементы равны по весу, так что лучше взять одиночные;
+        # жадный выбор берёт пары — по исчерпании времени ответ неточен, но остаётся допустимым.
+        # Две пары над тремя точками образуют цикл накладок (деревья решаются точно и без ветвления).
+        pairs = [(f'{i + d:02d}', f'{i + d + 1:02d}') for i in range(0, 60, 3) for d in (0, 1)]
+        objs = pairs + [(f'{i:02d}',) for i in range(60)]
+
+        def weight(obj):
+            return len(obj) * 0.5
+
+        result = find_max_weight_independent_set(objs, weight, components_getter=trivial_components_getter,
+                                                 time_budget=0)
+        self.assertFalse(result.exact)
+        self.assertTrue(all(not set(a) & set(b) for a, b in combinations(result.elements, 2)))
+        self.assertEqual(30.0, result.weight)
+
+        result = find_max_weight_independent_set(objs, weight, components_getter=trivial_components_getter)
+        self.assertTrue(result.exact)
+        self.assertEqual(60, len(result.elements))
+        self.assertFalse(set(pairs) & set(result.elements))
+
+    @staticmethod
+    def chain_optimum(values: list[float]) -> float:
+        """ Наибольший вес независимого множества цепочки: элемент i накладывается на i - 1 и i + 1. """
+        with_last, without_last = 0.0, 0.0
+        for value in values:
+            with_last, without_last = without_last + value, max(with_last, without_last)
+        return max(with_last, without_last)
+
+    def test_large_sparse_components(self):
+        """ Длинные цепочки и деревья накладок решаются точно и быстро, без ограничения времени. """
+        rnd = Random(3)
+        n = 1000
+        chain = [(f'{i:04d}', f'{i + 1:04d}') for i in range(n)]  # соседние элементы делят точку
+        for weights in ({obj: 1.0 for obj in chain}, {obj: rnd.random() for obj in chain}):
+            result = find_max_weight_independent_set(chain, weights.get, components_getter=trivial_components_getter,
+                                                     time_budget=None)
+            self.assertTrue(result.exact)
+            self.assertAlmostEqual(self.chain_optimum([weights[obj] for obj in chain]), result.weight)
+            self.assertTrue(all(not set(a) & set(b) for a, b in combinations(result.elements, 2)))
+        self.assertEqual(n // 2, len(find_max_weight_independent_set(
+            chain, lambda obj: 1.0, components_getter=trivial_components_getter).elements))
+
+        # дерево: элемент i накладывается только на родителя (i - 1) // 3 и на своих детей
+        def parent(i):
+            return (i - 1) // 3 if i else None
+
+        tree = list(range(300))
+        weights = {i: rnd.random() for i in tree}
+        result = find_max_weight_independent_set(
+            tree, weights.get,
+            pair_compatibility_checker=lambda a, b: parent(a) != b and parent(b) != a,
+            time_budget=None)
+        self.assertTrue(result.exact)
+        chosen = set(result.elements)
+        self.assertFalse([i for i in chosen if parent(i) in chosen])
+
+        # оптимум дерева — по той же динамике, записанной рекурсивно: (с i, без i)
+        def best(i) -> tuple[float, float]:
+            children = [best(c) for c in range(3 * i + 1, min(3 * i + 4, len(tree)))]
+            return weights[i] + sum(c[1] for c in children), sum(max(c) for c in children)
+
+        self.assertAlmostEqual(max(best(0)), result.weight)
+
+        # дерево клик: элемент делит точку с родителем и с «братьями» (детьми того же родителя)
+        cliques = [(f'n{i}', f'n{(i - 1) // 3}' if i else 'root') for i in range(n)]
+        weights = {obj: rnd.random() for obj in cliques}
+        result = find_max_weight_independent_set(cliques, weights.get, components_getter=trivial_components_getter,
+                                                 time_budget=None)
+        self.assertTrue(result.exact)
+        self.assertTrue(all(not set(a) & set(b) for a, b in combinations(result.elements, 2)))
+
+class ComponentArrangementsTestCase(unittest.TestCase):
+    """ Раскладки по связным компонентам графа накладок (`find_component_arrangements`). """
+
+    objs = ['ab', 'bc', 'cd', 'xy', 'yz', 'q']
+
+    def test_split_into_components(self):
+        u = ClashingElementSet.make(self.objs, trivial_components_getter)
+        components = split_into_components(u)
+        self.assertCountEqual([['ab', 'bc', 'cd'], ['xy', 'yz'], ['q']],
+                              [component.get_bare_objs() for component in components])
+
+    def test_lazy_product(self):
+        arrangements = find_component_arrangements(self.objs, components_getter=trivial_components_getter)
+        self.assertCountEqual([(('ab', 'cd'), ('bc',)), (('xy',), ('yz',)), (('q',),)], arrangements.parts)
+        self.assertEqual(4, len(arrangements))
+        self.assertEqual(5, arrangements.count_of_parts())
+
+        # те же раскладки, что и при разрешении всего универсума сразу
+        self.assertEqual(
+            find_combinations_of_compatible_elements(self.objs, components_getter=trivial_components_getter),
+            sorted(arrangements))
+
+        self.assertEqual(['ab', 'cd', 'q', 'xy'], arrangements.best(key=len))
+        self.assertEqual(['ab', 'cd', 'q', 'yz'], arrangements.best(key=lambda a: sum(ord(o[0]) for o in a)))
+
+    def test_ranked(self):
+        objs = self.objs + ['mno', 'mn', 'o', 'st', 's']
+        arrangements = find_component_arrangements(objs, components_getter=trivial_components_getter)
+
+        def coverage(arrangement):
+            return sum(map(len, arrangement)), -len(arrangement)
+
+        ranked = list(arrangements.ranked(coverage))
+        self.assertEqual(len(arrangements), len(ranked))
+        self.assertCountEqual(list(arrangements), ranked)
+        scores = [coverage(a) for a in ranked]
+        self.assertEqual(sorted(scores, reverse=True), scores)
+        self.assertEqual(arrangements.best(coverage), ranked[0])
+        self.assertEqual(['ab', 'cd', 'mno', 'q', 'st', 'xy'], ranked[0])
+
+        # lazy: the first one is produced without enumerating the rest
+        first = next(find_component_arrangements(
+            [f'{i:03d}{i + 1:03d}' for i in range(0, 300, 2)] + [f'{i:03d}' for i in range(300)],
+            components_getter=lambda s: [s[:3], s[3:]] if len(s) > 3 else [s],
+        ).ranked(len))
+        self.assertEqual(300, len(first))
+
+    def test_element_limit_keeps_universe_whole(self):
+        arrangements = find_component_arrangements(self.objs, components_getter=trivial_components_getter,
+                                                   max_elements=10)
+        self.assertEqual(1, len(arrangements.parts))
+
+    def test_component_cache(self):
+        with clash_cache_scope() as scope:
+            find_component_arrangements(self.objs, components_getter=trivial_components_getter)
+            find_component_arrangements(['ab', 'bc', 'cd', 'z'], components_getter=trivial_components_getter)
+            # компонента {ab, bc, cd} разрешена один раз
+            self.assertEqual(1, scope.stats()['resolve_component'].hits)
+        self.assertEqual({}, scope.stats())
+
+
+class ClashingRegionTestCase(unittest.TestCase):
+    @staticmethod
+    def rows_of(s: str) -> dict[int, int]:
+        """ 'a1 b1 b2' -> bit of a letter on the line of a digit """
+        rows = {}
+        for cell in s.split():
+            rows[cell[1]] = rows.get(cell[1], 0) | 1 << (ord(cell[0]) - ord('a'))
+        return rows
+
+    def test_same_as_components(self):
+        objs = ['a1 b1', 'b1 c1 c2', 'c2 d2', 'e1', 'e1 e2 f2', 'f2', 'a3 b3 c3', 'c3 d3', 'g1']
+        regions = ClashingElementSet.make(objs, occupancy_getter=self.rows_of)
+        containers = ClashingElementSet.make(objs, components_getter=str.split)
+        self.assertTrue(all(isinstance(el, ClashingRegion) for el in regions))
+
+        fill_clashing_elements(regions)
+        fill_clashing_elements(containers)
+        by_obj = {el.obj: el for el in containers}
+        for el in regions:
+            twin = by_obj[el.obj]
+            self.assertEqual({o.obj for o in twin.data.globally_clashing}, {o.obj for o in el.data.globally_clashing})
+            for other in regions:
+                if other is not el:
+                    self.assertEqual(twin.clashes_with(by_obj[other.obj]), el.clashes_with(other), (el, other))
+                    self.assertEqual(twin.coupling_with(by_obj[other.obj]), el.coupling_with(other), (el, other))
+
+        self.assertEqual(
+            find_combinations_of_compatible_elements(objs, components_getter=str.split),
+            find_combinations_of_compatible_elements(objs, occupancy_getter=self.rows_of))
+        weight = len
+        self.assertEqual(
+            find_max_weight_independent_set(objs, weight, components_getter=str.split).elements,
+            find_max_weight_independent_set(objs, weight, occupancy_getter=self.rows_of).elements)
+
+    def test_spans_without_common_bits(self):
+        # пересекающиеся диапазоны битов без общих битов — не накладка
+        objs = ['a1 c1', 'b1 d1', 'b2']
+        arrangements = find_component_arrangements(objs, occupancy_getter=self.rows_of)
+        self.assertEqual([sorted(objs)], list(arrangements))
+
+
+@dataclass(frozen=True, order=True)
+class Piece:
+    name: str
+
+
+class ClashCacheScopeTestCase(unittest.TestCase):
+    def test_released_after_call(self):
+        pieces = [Piece(name) for name in ('ab', 'bc', 'cd', 'de', 'xy', 'z')]
+        refs = [weakref.ref(piece) for piece in pieces]
+        for find in (find_combinations_of_compatible_elements, find_component_arrangements):
+            self.assertIsNotNone(find(pieces, components_getter=lambda piece: list(piece.name)))
+        self.assertIsNone(current_cache_scope())
+
+        del pieces
+        gc.collect()
+        # ни кэши, ни обёртки не удерживают исходные объекты
+        self.assertEqual([None] * len(refs), [ref() for ref in refs])
+
+    def test_nested_scopes(self):
+        self.assertIsNone(current_cache_scope())
+        with clash_cache_scope() as outer:
+            find_combinations_of_compatible_elements(self.objs(), components_getter=trivial_components_getter)
+            stats = outer.stats()
+            self.assertGreater(stats['resolve_clashes5'].size, 0)
+            self.assertGreater(stats['ClashingContainer.coupling_with'].misses, 0)
+
+            with clash_cache_scope() as inner:
+                self.assertIs(outer, inner)
+            # внешняя область не освобождается при выходе из вложенной
+            self.assertEqual(stats['resolve_clashes5'].size, outer.stats()['resolve_clashes5'].size)
+
+            find_combinations_of_compatible_elements(self.objs(), components_getter=trivial_components_getter)
+            self.assertGreater(outer.stats()['resolve_clashes5'].hits, 0)
+            total = outer.total_stats()
+            self.assertEqual(sum(s.size for s in outer.stats().values()), total.size)
+        self.assertIsNone(current_cache_scope())
+
+    def test_no_caching_outside_scope(self):
+        calls = []
+
+        @scoped_cache
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        self.assertEqual([4, 4], [square(2), square(2)])
+        self.assertEqual([2, 2], calls)
+        with clash_cache_scope() as scope:
+            self.assertEqual([4, 4, 9], [square(2), square(2), square(x=3)])
+            self.assertEqual(CacheStats(size=2, hits=1, misses=2), scope.stats()[square.__qualname__])
+        self.assertEqual([2, 2, 2, 3], calls)
+
+    @staticmethod
+    def objs():
+        return ['ab', 'bc', 'cd', 'de', 'xy', 'yz', 'q']
+
+
 class ArrangementCase(unittest.TestCase):
     def test_arrangement_1(self):
 
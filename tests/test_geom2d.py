@@ -8,7 +8,9 @@ init_testing_environment()
 
 from vstuxls.geom2d import (
     Box,
+    BoxIndex,
     ManhattanDistance,
+    Occupancy,
     PartialBox,
     Point,
     RangedBox,
@@ -131,6 +133,22 @@ class BoxTestCase(unittest.TestCase):
         self.assertEqual(b.manhattan_distance_to_touch(a), 7)
         self.assertEqual(b.manhattan_distance_to_contact(a), 7 + 8)
 
+    def test_box_dist_overlap_by_corners(self):
+        """ Расстояние до перекрытия — минимум по парам соответственных углов. """
+        boxes = [Box(x, y, w, h) for x in (-3, 0, 2) for y in (-1, 0, 4) for w in (1, 3, 6) for h in (1, 2, 5)]
+        for a in boxes:
+            for b in boxes:
+                if a in b or b in a:
+                    expected = (0, 0)
+                else:
+                    expected = min(
+                        ((abs(c1.x - c2.x), abs(c1.y - c2.y))
+                         for c1, c2 in zip(a.iterate_corners(), b.iterate_corners())),
+                        key=sum,
+                    )
+                self.assertEqual(sum(expected), a.manhattan_distance_to_overlap(b), (a, b))
+                self.assertEqual(expected, tuple(a.manhattan_distance_to_overlap(b, per_axis=True)), (a, b))
+
     def test_intersect_overlap(self):
         a = Box.from_2points(0, 0, 10, 10)
         b = Box.from_2points(5, 5, 15, 15)
@@ -190,6 +208,70 @@ class BoxTestCase(unittest.TestCase):
         self.assertEqual([b, r, a], L)
 
 
+class BoxIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.boxes = [Box(0, 0, 2, 2), Box(5, 5, 3, 1), Box(2, 0, 1, 1), Box(20, 20, 4, 4), Box(1, 1, 5, 5)]
+
+    def test_intersecting(self):
+        for bucket_size in (1, 3, 100):
+            index = BoxIndex(((b, i) for i, b in enumerate(self.boxes)), bucket_size=bucket_size)
+            self.assertEqual(5, len(index))
+            # touching counts, order of addition is kept
+            self.assertEqual([0, 2, 4], index.intersecting(Box(0, 0, 2, 2)))
+            self.assertEqual([1, 4], index.intersecting(Box(6, 6, 1, 1)))
+            self.assertEqual([], index.intersecting(Box(10, 10, 2, 2)))
+
+    def test_within(self):
+        index = BoxIndex.for_boxes((b, i) for i, b in enumerate(self.boxes))
+        region = Box(0, 0, 8, 6)
+        self.assertEqual([i for i, b in enumerate(self.boxes) if b in region], index.within(region))
+        self.assertEqual([3], index.within(Box(19, 19, 10, 10)))
+
+    def test_within_ranged(self):
+        index = BoxIndex(((b, i) for i, b in enumerate(self.boxes)), bucket_size=2)
+        regions = [
+            RangedBox(RangedSegment((0, 1), (6, 8)), RangedSegment((0, 0), (2, 6))),
+            RangedBox(RangedSegment((1, None), (None, None)), RangedSegment((None, 4), (None, None))),
+            RangedBox(RangedSegment((None, None), (None, 3)), (0, 3)),
+            RangedBox((30, 40), (30, 40)),
+        ]
+        for region in regions:
+            self.assertEqual([i for i, b in enumerate(self.boxes) if b in region], index.within(region), region)
+        self.assertEqual([], BoxIndex().within(regions[1]))
+
+
+class OccupancyTestCase(unittest.TestCase):
+    def test_from_box(self):
+        box = Box(2, 1, 3, 2)
+        occupancy = Occupancy.from_box(box)
+        self.assertEqual({1: 0b11100, 2: 0b11100}, occupancy.rows)
+        self.assertEqual(list(box.iterate_points()), list(occupancy.iterate_points()))
+        self.assertEqual(Occupancy.from_points(box.iterate_points()), occupancy)
+        self.assertEqual(6, len(occupancy))
+        self.assertIn(Point(4, 2), occupancy)
+        self.assertNotIn(Point(5, 2), occupancy)
+        # вне сетки: отрицательные x не представимы, прямоугольник обрезается по x = 0
+        self.assertEqual([Point(0, 0)], list(Occupancy.from_box(Box(-2, 0, 3, 1)).iterate_points()))
+        self.assertFalse(Occupancy.from_box(Box(-3, 0, 2, 1)))
+        with self.assertRaises(ValueError):
+            Occupancy.from_points([Point(-1, 0)])
+        self.assertEqual([Point(1, -2)], list(Occupancy.from_box(Box(1, -2, 1, 1)).iterate_points()))
+
+    def test_set_operations(self):
+        a, b, c = Occupancy.from_box(Box(0, 0, 3, 3)), Occupancy.from_box(Box(2, 2, 3, 3)), Occupancy.from_box(Box(4, 0, 1, 2))
+        self.assertTrue(a.overlaps(b))
+        self.assertFalse(a.overlaps(c))
+        self.assertFalse(b.overlaps(c))
+        self.assertEqual([Point(2, 2)], list((a & b).iterate_points()))
+        self.assertFalse(a & c)
+        self.assertEqual(len(a) + len(b) - 1, len(a | b))
+        self.assertEqual(a | b | c, Occupancy.union(c, b, a))
+        self.assertEqual(set(a.iterate_points()) | set(c.iterate_points()), set((a | c).iterate_points()))
+        # отсечение прямоугольником
+        self.assertEqual(Occupancy.from_box(Box(1, 1, 2, 2)), a & Box(1, 1, 5, 5))
+        self.assertEqual(hash(a & b), hash(Occupancy.from_points([Point(2, 2)])))
+
+
 class VariBoxTestCase(unittest.TestCase):
     def test_in_1(self):
         b = VariBox(10, 20, 15, 4)
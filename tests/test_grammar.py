@@ -1,4 +1,6 @@
+import io
 import unittest
+from contextlib import redirect_stdout
 
 from tests_bootstrapper import init_testing_environment
 
@@ -10,7 +12,14 @@ from vstuxls.constraints_2d import SizeConstraint
 from vstuxls.constraints_2d.LocationConstraint import LocationConstraint
 from vstuxls.geom2d import DOWN, LEFT, UP, Box, RangedBox, RangedSegment, open_range
 from vstuxls.grammar2d import read_grammar
+from vstuxls.grammar2d.AreaPattern import (
+    DEFAULT_ARRANGEMENT_TIME_BUDGET,
+    AreaPattern,
+    ArrangementSolver,
+    ComponentSearch,
+)
 from vstuxls.grammar2d.ArrayPatternMatcher import counts_for_splitting
+from vstuxls.grammar2d.Grammar import CELL_CLASSIFIER_CACHE_SIZE
 from vstuxls.grammar2d.Match2d import Match2d
 from vstuxls.grammar2d.PatternComponent import PatternComponent
 from vstuxls.utils import find_file_under_path
@@ -56,6 +65,73 @@ class GrammarTestCase(unittest.TestCase):
         pprint(grammar.cell_types)
         pprint(grammar.patterns)
 
+    def test_root_mode_pruning(self):
+        grammar = read_grammar('test_data/sea_grammar_2.yml')
+        unreachable = {'earth', 'island', 'tree'}
+
+        self.assertEqual(set(grammar.patterns) - unreachable, {p.name for p in grammar.reachable_patterns()})
+        waves_patterns = {p.name for wave in grammar.dependency_waves() for p in wave}
+        self.assertFalse(waves_patterns & unreachable)
+        self.assertIn(grammar.root_name, waves_patterns)
+        self.assertTrue(all(grammar.dependency_waves()))
+        # cell type used only by `tree`
+        self.assertNotIn('tree', grammar.get_effective_cell_types())
+
+        grammar.target_mode = 'all'
+        grammar._cache.clear()
+        self.assertEqual(set(grammar.patterns.values()), grammar.reachable_patterns())
+        self.assertIn('tree', grammar.get_effective_cell_types())
+
+    def test_cell_classifier_cache_is_bounded(self):
+        grammar = read_grammar('test_data/sea_grammar_2.yml')
+        self.assertEqual(CELL_CLASSIFIER_CACHE_SIZE, grammar.get_cell_classifier().cache_size)
+        self.assertIs(grammar.get_cell_classifier(), grammar.get_cell_classifier())
+
+        grammar.cell_classifier_cache_size = 2
+        grammar._cache.clear()
+        classifier = grammar.get_cell_classifier()
+        for text in ('a', 'b', 'c'):
+            classifier.match(text)
+        self.assertEqual(2, len(classifier._memo))
+
+    def test_points_occupied_by_opaque_match(self):
+        pattern = AreaPattern(name='a', components=[])
+        match = Match2d(pattern, box=Box(-2, 0, 3, 2))
+        # точки рамки в пределах сетки, так же как и в битовой карте
+        self.assertEqual(sorted(Box(0, 0, 1, 2).iterate_points()), match.get_occupied_points())
+        self.assertEqual(set(match.get_occupied_points()), set(match.get_occupancy().iterate_points()))
+
+    def test_arrangement_solver_option(self):
+        self.assertIs(ArrangementSolver.ENUMERATE, AreaPattern(name='a', components=[]).arrangement_solver)
+        pattern = AreaPattern(name='a', components=[], arrangement_solver='mwis')
+        self.assertIs(ArrangementSolver.MWIS, pattern.arrangement_solver)
+
+        with redirect_stdout(io.StringIO()) as out:
+            pattern = AreaPattern(name='a', components=[], arrangement_solver='best')
+        self.assertIs(ArrangementSolver.ENUMERATE, pattern.arrangement_solver)
+        self.assertIn('SYNTAX WARN', out.getvalue())
+
+        # без ограничения времени точный поиск может не завершиться
+        with redirect_stdout(io.StringIO()) as out:
+            pattern = AreaPattern(name='a', components=[], arrangement_solver='mwis', arrangement_time_budget=None)
+        self.assertEqual(DEFAULT_ARRANGEMENT_TIME_BUDGET, pattern.arrangement_time_budget)
+        self.assertIn('SYNTAX WARN', out.getvalue())
+        self.assertEqual(0.5, AreaPattern(name='a', components=[], arrangement_time_budget=0.5).arrangement_time_budget)
+
+    def test_component_search_option(self):
+        pattern = AreaPattern(name='a', components=[])
+        self.assertIs(ComponentSearch.DEPTH_FIRST, pattern.component_search)
+        self.assertIsNone(pattern.component_beam_width)
+        pattern = AreaPattern(name='a', components=[], component_search='best_first', component_beam_width=3)
+        self.assertIs(ComponentSearch.BEST_FIRST, pattern.component_search)
+        self.assertEqual(3, pattern.component_beam_width)
+
+        with redirect_stdout(io.StringIO()) as out:
+            pattern = AreaPattern(name='a', components=[], component_search='beam', component_beam_width=0)
+        self.assertIs(ComponentSearch.DEPTH_FIRST, pattern.component_search)
+        self.assertIsNone(pattern.component_beam_width)
+        self.assertEqual(2, out.getvalue().count('SYNTAX WARN'))
+
     # Test cases for get_ranged_box_for_parent_location
     def test_get_ranged_box_for_parent_location_inner(self):
 
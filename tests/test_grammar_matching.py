@@ -1,9 +1,13 @@
+import json
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
+from types import SimpleNamespace
 
 from tests_bootstrapper import init_testing_environment
 
-from vstuxls.geom2d import Box, Point
+from vstuxls.geom2d import Box, Point, RangedBox, RangedSegment
 
 init_testing_environment()
 
@@ -12,6 +16,10 @@ from pathlib import Path
 from vstuxls.converters.text import TxtGrid
 from vstuxls.converters.xlsx import ExcelGrid
 from vstuxls.grammar2d import GrammarMatcher, read_grammar
+from vstuxls.grammar2d.AreaPattern import AreaPattern, ArrangementSolver, ComponentSearch
+from vstuxls.grammar2d.match_cache import RegionMatchCache
+from vstuxls.grammar2d.profiling import ParseProfiler
+from vstuxls.services import DocumentParsingService
 
 
 class GrammarMatchingTestCase(unittest.TestCase):
@@ -507,6 +515,67 @@ class GrammarMatchingTestCase(unittest.TestCase):
                 for t in positions
             ))
 
+    def test_grid_sea_9_6_mwis(self):
+        """ Точный выбор раскладок (`arrangement_solver: mwis`) находит те же совпадения, что и перебор. """
+        grammar = read_grammar('test_data/sea_grammar_6.yml')
+        for pattern in grammar.patterns.values():
+            if isinstance(pattern, AreaPattern):
+                pattern.arrangement_solver = ArrangementSolver.MWIS
+
+        matched_documents = GrammarMatcher(grammar=grammar).run_match(self.sea_9_x)
+        expected_documents = GrammarMatcher(grammar=self.sea_grammar_6).run_match(self.sea_9_x)
+
+        self.assertEqual(1, len(matched_documents))
+        children = matched_documents[0]['field'].get_children()
+        self.assertEqual(12, len(children))
+        self.assertEqual(
+            sorted(m.box for m in expected_documents[0]['field'].get_children()),
+            sorted(m.box for m in children))
+
+    def test_best_first_component_search(self):
+        """ Поиск «лучший — первым» (`component_search: best_first`) находит те же совпадения, что и перебор в глубину. """
+        cases = [
+            ('test_data/sea_grammar_6.yml', self.sea_9_x),
+            ('../cnf/grammar_root.yml', self.grid_vstusched_week),
+        ]
+        for grammar_path, grid in cases:
+            with self.subTest(grammar=grammar_path):
+                expected = GrammarMatcher(grammar=read_grammar(grammar_path))
+                expected.run_match(grid)
+
+                grammar = read_grammar(grammar_path)
+                for pattern in grammar.patterns.values():
+                    if isinstance(pattern, AreaPattern):
+                        pattern.component_search = ComponentSearch.BEST_FIRST
+                profiler = ParseProfiler()
+                gm = GrammarMatcher(grammar=grammar, profiler=profiler)
+                gm.run_match(grid)
+
+                def layout(matches):
+                    return [(m.box, {name: c.box for name, c in (m.component2match or {}).items()}) for m in matches]
+
+                for pattern in grammar.patterns.values():
+                    self.assertEqual(
+                        layout(expected.matches_by_element[expected.grammar[pattern.name]]),
+                        layout(gm.matches_by_element[pattern]),
+                        pattern.name)
+                self.assertGreater(sum(p.search_states for p in profiler.patterns.values()), 0)
+
+    def test_best_first_beam_width(self):
+        """ Узкий луч пробует только лучшие варианты компонентов: совпадений не больше, чем без ограничения. """
+        grammar = read_grammar('test_data/sea_grammar_6.yml')
+        for pattern in grammar.patterns.values():
+            if isinstance(pattern, AreaPattern):
+                pattern.component_search = ComponentSearch.BEST_FIRST
+                pattern.component_beam_width = 1
+        matched_documents = GrammarMatcher(grammar=grammar).run_match(self.sea_9_x)
+        expected_documents = GrammarMatcher(grammar=self.sea_grammar_6).run_match(self.sea_9_x)
+
+        self.assertEqual(1, len(matched_documents))
+        children = {m.box for m in matched_documents[0]['field'].get_children()}
+        self.assertTrue(children)
+        self.assertLessEqual(children, {m.box for m in expected_documents[0]['field'].get_children()})
+
     def test_grid_sea_9_62(self):
         gm = GrammarMatcher(grammar=self.sea_grammar_62)
 
@@ -792,6 +861,154 @@ class GrammarMatchingTestCase(unittest.TestCase):
                 print()
 
 
+class RegionMatchCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        boxes = [Box(0, 0, 2, 2), Box(5, 5, 3, 1), Box(2, 0, 1, 1), Box(20, 20, 4, 4)]
+        self.matches = [SimpleNamespace(box=b) for b in boxes]
+
+    def test_exact_and_enclosing(self):
+        cache = RegionMatchCache()
+        self.assertIsNone(cache.get('p', None))
+        cache.put('p', None, None, 'v', self.matches, restrictable=True)
+
+        self.assertEqual(self.matches, cache.get('p', None, None, 'v'))
+        # other limit / variant are different queries
+        self.assertIsNone(cache.get('p', None, 3, 'v'))
+        self.assertIsNone(cache.get('p', None, None, 'w'))
+
+        region = RangedBox((0, 8), (0, 6))
+        self.assertEqual(self.matches[:3], cache.get('p', region, None, 'v'))
+        region = RangedBox(RangedSegment((10, None), (None, None)), RangedSegment((None, None), (None, None)))
+        self.assertEqual(self.matches[3:], cache.get('p', region, None, 'v'))
+        self.assertEqual((3, 2, 3), (cache.hits, cache.region_hits, cache.misses))
+
+    def test_not_restrictable(self):
+        cache = RegionMatchCache()
+        cache.put('p', Box(0, 0, 10, 10), None, None, self.matches[:3])
+        self.assertIsNone(cache.get('p', Box(0, 0, 5, 5)))
+        self.assertEqual(self.matches[:3], cache.get('p', Box(0, 0, 10, 10)))
+
+    def test_invalidate_and_size(self):
+        cache = RegionMatchCache(max_size=2)
+        for i in range(3):
+            cache.put('p', Box(0, 0, i + 1, 1), None, None, [])
+        cache.put('q', None, None, None, [])
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get('p', Box(0, 0, 1, 1)))
+        self.assertEqual([], cache.get('p', Box(0, 0, 3, 1)))
+
+        cache.invalidate('p')
+        self.assertEqual(1, len(cache))
+        self.assertIsNone(cache.get('p', Box(0, 0, 3, 1)))
+
+        cache = RegionMatchCache(max_size=0)
+        cache.put('p', None, None, None, [])
+        self.assertIsNone(cache.get('p', None))
+
+    def test_matcher_results(self):
+        grammar = read_grammar('test_data/simple_grammar_2.yml')
+        grid = TxtGrid(Path('test_data/grid2.tsv').read_text())
+        results = []
+        for cache_size in (0, None):
+            gm = GrammarMatcher(grammar=grammar, result_cache_size=cache_size)
+            matches = gm.run_match(grid)
+            results.append([(m.box, m.precision) for m in matches])
+        self.assertTrue(results[0])
+        self.assertEqual(results[0], results[1])
+
+
+
+class WaveExecutorTestCase(unittest.TestCase):
+    def test_same_as_sequential(self):
+        grammar = read_grammar('../cnf/grammar_root.yml')
+        grid = ExcelGrid.read_xlsx(Path('test_data/ОН_ФЭВТ_4 курс 2023 lite.xlsx'))
+
+        def snapshot(gm: GrammarMatcher, roots):
+            return (
+                [(m.box, m.precision) for m in roots],
+                {p.name: [m.box for m in ms] for p, ms in gm.matches_by_element.items()},
+                {pos: [m.pattern.name for m in ms] for pos, ms in gm.matches_by_position.items()},
+            )
+
+        gm = GrammarMatcher(grammar=grammar)
+        expected = snapshot(gm, gm.run_match(grid))
+        self.assertTrue(expected[0])
+
+        with ThreadPoolExecutor(4) as executor:
+            gm = GrammarMatcher(grammar=grammar, wave_executor=executor)
+            self.assertEqual(expected, snapshot(gm, gm.run_match(grid)))
+
+    def test_split_wave_into_groups(self):
+        grammar = read_grammar('../cnf/grammar_root.yml')
+        for wave in grammar.dependency_waves():
+            patterns = sorted(p for p in wave if p.independently_matchable())
+            groups = GrammarMatcher._split_wave_into_groups(patterns)
+            # each pattern in exactly one group, wave order kept
+            self.assertEqual(patterns, sorted(p for g in groups for p in g))
+            for group in groups:
+                self.assertEqual(sorted(group), group)
+
+
+class ParseProfilerTestCase(unittest.TestCase):
+    def test_nested_frames(self):
+        profiler = ParseProfiler()
+        with profiler.run():
+            with profiler.wave(0, ['a']):
+                with profiler.pattern('a'):
+                    profiler.add('candidates', 3)
+                    with profiler.pattern('b'):
+                        profiler.add('arrangements')
+                    profiler.add('cache_hits', pattern='b')
+            profiler.add('matches')  # no pattern in progress: ignored
+
+        a, b = profiler.patterns['a'], profiler.patterns['b']
+        self.assertEqual((1, 3, 0, 0), (a.calls, a.candidates, a.arrangements, a.matches))
+        self.assertEqual((1, 1, 1), (b.calls, b.arrangements, b.cache_hits))
+        self.assertGreaterEqual(a.wall_time, b.wall_time)
+        self.assertAlmostEqual(a.wall_time, a.self_wall_time + b.wall_time)
+        self.assertIsNone(a.peak_alloc)
+
+        report = profiler.to_json_dict()
+        self.assertEqual(['a', 'b'], [p['name'] for p in report['patterns']])
+        self.assertEqual([0], [w['index'] for w in report['waves']])
+        for line in profiler.to_collapsed_stacks().splitlines():
+            stack, micros = line.rsplit(' ', 1)
+            self.assertIn(stack, {'wave 0', 'wave 0;a', 'wave 0;a;b'})
+            self.assertGreater(int(micros), 0)
+
+    def test_trace_memory(self):
+        profiler = ParseProfiler(trace_memory=True)
+        with profiler.run():
+            with profiler.wave(0, ['a']):
+                with profiler.pattern('a'):
+                    data = [bytes(1000) for _ in range(100)]
+                    del data
+        self.assertGreaterEqual(profiler.patterns['a'].peak_alloc, 100_000)
+        self.assertGreaterEqual(profiler.waves[0].peak_alloc, profiler.patterns['a'].peak_alloc)
+
+    def test_document_parsing_service(self):
+        grammar = read_grammar('../cnf/grammar_root.yml')
+        grid = ExcelGrid.read_xlsx(Path('test_data/ОН_ФЭВТ_4 курс 2023 lite.xlsx'))
+        with tempfile.TemporaryDirectory() as tmp:
+            service = DocumentParsingService(
+                grammar, diagnostics_output_dir=Path(tmp), profiling=True, profile_collapsed_stacks=True)
+            self.assertTrue(service.parse_document(grid))
+
+            report = json.loads((Path(tmp) / 'parse_profile.json').read_text(encoding='utf-8'))
+            self.assertEqual(len(grammar.dependency_waves()), len(report['waves']))
+            patterns = {p['name']: p for p in report['patterns']}
+            root = patterns[grammar.root.name]
+            self.assertEqual(1, root['matches'])
+            self.assertGreater(root['candidates'], 0)
+            self.assertTrue(any(p['arrangements'] for p in patterns.values()))
+            self.assertTrue(any(p['cache_hits'] for p in patterns.values()))
+            self.assertGreater(report['totals']['wall_time'], 0)
+            self.assertIn('cell_classification_wall_time', report['totals'])
+
+            stacks = (Path(tmp) / 'parse_profile.collapsed').read_text(encoding='utf-8').splitlines()
+            self.assertTrue(any(s.startswith('wave ') and ';' in s for s in stacks))
+
+
 if __name__ == '__main__':
     # unittest.main()
     # GrammarMatchingTestCase._test_txt_debug(...)
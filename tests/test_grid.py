@@ -1,19 +1,37 @@
+import tempfile
 import unittest
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
 
 import openpyxl
 from tests_bootstrapper import init_testing_environment
 
 init_testing_environment()
 
-from vstuxls.converters.text import TxtGrid
-from vstuxls.converters.xlsx import ExcelGrid
+from vstuxls.converters.text import DenseTxtGrid, TxtGrid
+from vstuxls.converters.xlsx import DenseExcelGrid, ExcelGrid, MergedCellsIndex
 from vstuxls.geom2d.box import Box
-from vstuxls.geom2d.direction import LEFT, RIGHT, UP, Direction
+from vstuxls.geom2d.direction import DOWN, LEFT, RIGHT, UP, Direction
+from vstuxls.geom2d.point import Point
+from vstuxls.grid import Cell
 from vstuxls.utils.path import current_rootpath
 
 testdata_path = current_rootpath() / "tests" / "test_data"
 
 
+def cells_summary(grid) -> set[tuple]:
+    """ Comparable content of all cells of a grid, including styles. """
+    return {
+        (
+            c.box, c.content,
+            tuple(sorted(c.style.font_style)), c.style.background_color,
+            tuple(sorted(c.style.borders)), c.style.font_color,
+        )
+        for c in grid.point2cell.values()
+    }
+
+
 class GridTestCase(unittest.TestCase):
     def test_in_1(self):
         gs = [
@@ -178,6 +196,167 @@ class GridTestCase(unittest.TestCase):
         self.assertIn("italic", gw.get_cell_view((4, 3)).cell.style.font_style)
         self.assertIsNone(gw.get_cell_view((5, 3)))
 
+    def test_merged_cells_index(self):
+        workbook = openpyxl.Workbook()
+        ws = workbook.active
+        for row in range(1, 7):
+            for col in range(1, 5):
+                ws.cell(row=row, column=col, value=f"{row}:{col}")
+        ws.merge_cells("A1:B2")  # anchor has value
+        ws.merge_cells("C3:D6")
+        ws.cell(row=3, column=3).value = None  # empty anchor of a merged range
+        # reload to get a workbook with theme, as it is read from file
+        buffer = BytesIO()
+        workbook.save(buffer)
+        ws = openpyxl.load_workbook(buffer).active
+
+        index = MergedCellsIndex.of_worksheet(ws)
+        self.assertEqual(len(index), 2)
+        self.assertIs(index.get(2, 2), index.get(1, 1))
+        self.assertIn((6, 4), index)
+        self.assertIsNone(index.get(1, 3))
+
+        g = ExcelGrid(ws)
+        gw = g.get_view()
+        self.assertEqual(gw.get_cell_view((1, 1)).cell.content, "1:1")
+        self.assertEqual(gw.get_cell_view((1, 1)).size, (2, 2))
+        self.assertEqual(gw.get_cell_view((3, 5)).cell.content, "")
+        self.assertEqual(gw.get_cell_view((3, 5)).size, (2, 4))
+        self.assertEqual(gw.get_cell_view((2, 0)).cell.content, "1:3")
+        self.assertEqual(len(list(gw.iterate_cells())), 24 - 4 - 8 + 2)
+
+    def test_streaming_mode(self):
+        for name in ("grid1.xlsx", "grid2.xlsx", "grid3.xlsx", "grid5.xlsx", "vstusched_week.xlsx",
+                     "Сборник_расписаний_1.xlsx"):
+            full = ExcelGrid.read_xlsx(testdata_path / name)
+            streamed = ExcelGrid.read_xlsx(testdata_path / name, mode="streaming")
+
+            self.assertEqual(full.get_bounding_box(), streamed.get_bounding_box(), name)
+            self.assertEqual(cells_summary(full), cells_summary(streamed), name)
+
+            self.assertTrue(all("openpyxl_cell" not in c.data for c in streamed.point2cell.values()), name)
+            # original worksheet is reopened on demand
+            self.assertEqual(streamed.get_worksheet().title, full.get_worksheet().title)
+
+        with self.assertRaises(ValueError):
+            ExcelGrid.read_xlsx(testdata_path / "grid1.xlsx", mode="lazy")
+
+    def test_streaming_mode_fallback(self):
+        # без внутреннего парсера openpyxl лист читается в обычном режиме
+        full = ExcelGrid.read_xlsx(testdata_path / "grid2.xlsx")
+        with mock.patch('vstuxls.converters.xlsx.WorkSheetParser', None):
+            streamed = ExcelGrid.read_xlsx(testdata_path / "grid2.xlsx", mode="streaming")
+        self.assertEqual(cells_summary(full), cells_summary(streamed))
+
+    def test_styles_interning(self):
+        for mode in ("full", "streaming"):
+            grid = ExcelGrid.read_xlsx(testdata_path / "vstusched_week.xlsx", mode=mode)
+            styles = [c.style for c in grid.point2cell.values()]
+            distinct = {id(style) for style in styles}
+            # одинаковые стили разделяют один экземпляр
+            self.assertEqual(len(distinct), len(set(styles)), mode)
+            self.assertLess(len(distinct), len(styles), mode)
+            with self.assertRaises(AttributeError):
+                styles[0].font_color = "FF0000"
+
+            bare = ExcelGrid.read_xlsx(testdata_path / "vstusched_week.xlsx", mode=mode, with_styles=False)
+            self.assertEqual(
+                {(c.box, c.content) for c in bare.point2cell.values()},
+                {(c.box, c.content) for c in grid.point2cell.values()},
+                mode)
+            self.assertTrue(all(c.style is None for c in bare.point2cell.values()), mode)
+
+    def test_occupancy_summaries(self):
+        for cls in (ExcelGrid, DenseExcelGrid):
+            g = cls.read_xlsx(testdata_path / "grid2.xlsx")
+            self.assertEqual(g.get_bounding_box(), g.get_bounding_box(force_recalc=True))
+            self.assertEqual(g.get_row_spans(0), [range(0, 1), range(2, 5)])
+            self.assertEqual(g.get_row_spans(1), [range(2, 5)])
+            self.assertEqual(g.get_row_spans(2), [range(0, 2), range(3, 5)])
+            self.assertEqual(g.get_row_spans(100), [])
+            self.assertEqual(g.get_column_spans(0), [range(0, 1), range(2, 3)])
+            self.assertEqual(g.get_column_spans(3), [range(0, 3)])
+
+            self.assertEqual(g.get_occupied_box(Box(0, 0, 2, 2)), Box(0, 0, 1, 1))
+            self.assertEqual(g.get_occupied_box(Box(0, 1, 2, 1)), None)
+            self.assertEqual(g.get_occupied_box(Box(-5, -5, 20, 20)), g.get_bounding_box())
+
+            gw = g.get_view()
+            cw = gw.get_cell_view((0, 0))
+            self.assertEqual(tuple(cw.look_outside(DOWN)), (0, 1, 1, 2))
+            self.assertEqual(tuple(cw.look_outside(DOWN, trim_empty=True)), (0, 1, 1, 2))
+            self.assertEqual(tuple(gw.get_region(Box(0, 0, 2, 1)).look_outside(DOWN, trim_empty=True)), (0, 1, 2, 2))
+            self.assertEqual(tuple(gw.get_cell_view((0, 2)).look_outside(UP, trim_empty=True)), (0, 0, 1, 2))
+            self.assertEqual(tuple(gw.get_cell_view((1, 2)).look_outside(UP, trim_empty=True)), (1, 2, 1, 0))
+
+        g = TxtGrid("a\t\tb\n")
+        self.assertEqual(g.get_bounding_box(), Box(0, 0, 3, 1))
+        g.register_cell(Cell(g, Point(1, 3), content="c"))
+        self.assertEqual(g.get_bounding_box(), Box(0, 0, 3, 4))
+        self.assertEqual(g.get_column_spans(1), [range(3, 4)])
+
+    def test_dense_grid(self):
+        pairs = [
+            (TxtGrid(text := (testdata_path / "grid1.tsv").read_text()), DenseTxtGrid(text)),
+            (TxtGrid(text := (testdata_path / "sea_3.tsv").read_text()), DenseTxtGrid(text)),
+        ] + [
+            (ExcelGrid.read_xlsx(testdata_path / name), DenseExcelGrid.read_xlsx(testdata_path / name, mode="streaming"))
+            for name in ("grid2.xlsx", "grid3.xlsx", "vstusched_week.xlsx")
+        ]
+        directions_list = [(RIGHT, DOWN), (LEFT, UP), (UP, RIGHT), (DOWN, LEFT), (UP,)]
+        for plain, dense in pairs:
+            self.assertIsInstance(dense, type(plain))
+            self.assertEqual(
+                {p: (c.box, c.content) for p, c in plain.point2cell.items()},
+                {p: (c.box, c.content) for p, c in dense.point2cell.items()})
+            self.assertEqual(len(plain.point2cell), len(dense.point2cell))
+            if isinstance(plain, ExcelGrid):
+                self.assertEqual(cells_summary(plain), cells_summary(dense))
+            bbox = plain.get_bounding_box()
+            self.assertEqual(bbox, dense.get_bounding_box())
+
+            plain_view, dense_view = plain.get_view(), dense.get_view()
+            outer_box = Box(bbox.left - 1, bbox.top - 1, bbox.w + 2, bbox.h + 2)
+            for point in outer_box.iterate_points():
+                expected, actual = plain.get_cell(point), dense.get_cell(point)
+                self.assertEqual(expected and expected.box, actual and actual.box, point)
+
+            for box in (bbox, Box(1, 1, 3, 4), Box(bbox.right - 2, 0, 5, 2)):
+                if not plain_view.get_region(box):
+                    continue
+                for directions in directions_list:
+                    expected = [cw.cell for cw in plain_view.get_region(box).iterate_cells(directions)]
+                    actual = [cw.cell for cw in dense_view.get_region(box).iterate_cells(directions)]
+                    self.assertEqual([c.box for c in expected], [c.box for c in actual], (box, directions))
+
+    def test_sheet_selection(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.title = "first"
+        workbook.active["A1"] = "a"
+        second = workbook.create_sheet("second")
+        second["B2"] = "b"
+        second["C3"] = "c"
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "two_sheets.xlsx"
+            workbook.save(path)
+
+            for mode in ("full", "streaming"):
+                self.assertEqual(ExcelGrid.read_xlsx(path, mode=mode).sheet_title, "first")
+                self.assertEqual(ExcelGrid.read_xlsx(path, sheet=1, mode=mode).sheet_title, "second")
+                grid = ExcelGrid.read_xlsx(path, sheet="second", mode=mode)
+                self.assertEqual(grid.get_cell((2, 2)).content, "c")
+
+                grids = list(ExcelGrid.iter_sheets(path, mode=mode))
+                self.assertEqual([g.sheet_title for g in grids], ["first", "second"])
+                self.assertEqual(grids[0].get_cell((0, 0)).content, "a")
+                self.assertEqual(len(grids[1].point2cell), 2)
+
+            with self.assertRaises(KeyError):
+                ExcelGrid.read_xlsx(path, sheet="third")
+            with self.assertRaises(IndexError):
+                ExcelGrid.read_xlsx(path, sheet=2)
+
 
 if __name__ == "__main__":
     # unittest.main()
@@ -80,6 +80,22 @@ class ParsingDiagnosticsTestCase(unittest.TestCase):
             codes = {issue["code"] for issue in data["issues"]}
             self.assertIn("PARSE_EXCEPTION", codes)
 
+    def test_parse_workbook_writes_diagnostics_per_sheet(self) -> None:
+        root = Path(__file__).parent
+        grammar = read_grammar(root / "test_data/simple_grammar_txt.yml")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp)
+            service = DocumentParsingService(grammar=grammar, diagnostics_output_dir=out)
+            results = service.parse_workbook(root / "test_data/grid1.xlsx", mode="streaming")
+
+            self.assertEqual(len(results), 1)
+            sheet_title = next(iter(results))
+            self.assertTrue((out / sheet_title / "parsing_diagnostics.json").is_file())
+            # поля сервиса восстанавливаются после обхода книги
+            self.assertEqual(service.diagnostics_output_dir, out)
+            self.assertIsNone(service.document_source_path)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,10 +1,13 @@
+import re
 import unittest
+from unittest import mock
 
 from tests_bootstrapper import init_testing_environment
 
 init_testing_environment()
 
 from vstuxls.string_matching import (
+    CellClassifier,
     CellType,
     StringMatch,
     StringPattern,
@@ -12,6 +15,8 @@ from vstuxls.string_matching import (
     read_cell_types,
 )
 from vstuxls.string_matching.helper_transformers import shrink_extra_inner_spaces
+from vstuxls.string_matching.PatternPrefilter import PatternPrefilter
+from vstuxls.string_matching.StringTransformer import StringTransformer
 
 
 class StringPatternTestCase(unittest.TestCase):
@@ -496,6 +501,102 @@ class CellTypeTestCase(unittest.TestCase):
     #
 
 
+class CellClassifierTestCase(unittest.TestCase):
+    def make_classifier(self, cache_size=None):
+        return CellClassifier([
+            CellType('number', patterns=[StringPattern(r'\d+', confidence=1, anchors='both')]),
+            CellType('word', patterns=[StringPattern(r'\w+', confidence=0.5, anchors='both')]),
+        ], cache_size=cache_size)
+
+    def test_memo(self):
+        ccl = self.make_classifier()
+        first = ccl.match('123')
+        self.assertEqual(['number', 'word'], [m.pattern.content_class.name for m in first])
+        self.assertEqual(1, len(ccl.match('123', limit=1)))
+        self.assertEqual(first, ccl.match('123'))
+        self.assertEqual((2, 1), (ccl.cache_hits, ccl.cache_misses))
+        self.assertEqual([], ccl.match('***'))
+        self.assertEqual([], ccl.match('***'))
+        self.assertEqual((3, 2), (ccl.cache_hits, ccl.cache_misses))
+
+    def test_dispatch_same_as_cell_types(self):
+        cell_types = read_cell_types()
+        ccl = CellClassifier(cell_types.values(), cache_size=0)
+        texts = ['', ' ', 'ПН', 'понедельник', '8.30-10.00', 'доц. Грачёва Н.В.', 'Рыжова(1)',
+                 'ПРИН-266', 'М А Т Е М А Т И К А', 'лаб.', 'А-301', 'В - 902 а', 'Х', '???', 'İ']
+        for text in texts:
+            expected = [m for ct in cell_types.values() if (m := ct.match(text))]
+            expected.sort(key=lambda m: m.precision, reverse=True)
+            actual = ccl.match(text)
+            self.assertEqual([(m.pattern, m.text) for m in expected],
+                             [(m.pattern, m.text) for m in actual], text)
+
+    def test_lru(self):
+        ccl = self.make_classifier(cache_size=2)
+        ccl.match('1')
+        ccl.match('2')
+        ccl.match('1')  # '2' becomes least recently used
+        ccl.match('3')
+        self.assertEqual(['1', '3'], list(ccl._memo))
+
+    def test_no_cache(self):
+        ccl = self.make_classifier(cache_size=0)
+        ccl.match('1')
+        ccl.match('1')
+        self.assertEqual(0, len(ccl._memo))
+        self.assertEqual('number', ccl.match('1', limit=1)[0].pattern.content_class.name)
+
+
+class PatternPrefilterTestCase(unittest.TestCase):
+    def test_length(self):
+        pf = PatternPrefilter(r'\d{2,4}', 0, 'fullmatch')
+        self.assertFalse(pf.admits('1'))
+        self.assertTrue(pf.admits('12'))
+        self.assertFalse(pf.admits('12345'))
+        # `match` does not limit length from above
+        self.assertTrue(PatternPrefilter(r'\d{2,4}', 0, 'match').admits('12345'))
+
+    def test_first_char(self):
+        pf = PatternPrefilter(r'(?:доц|проф)\.?\s+\w+', re.IGNORECASE, 'match')
+        self.assertTrue(pf.admits_first_char('Д'))
+        self.assertTrue(pf.admits_first_char('п'))
+        self.assertFalse(pf.admits_first_char('а'))
+
+        pf = PatternPrefilter(r'[^\d]+', 0, 'match')
+        self.assertTrue(pf.admits_first_char('a'))
+        self.assertFalse(pf.admits_first_char('1'))
+
+    def test_unknown_head(self):
+        # optional first element or `search` method: any first char may start a match
+        for pf in (PatternPrefilter(r'a?b', 0, 'match'),
+                   PatternPrefilter(r'ab', 0, 'search'),
+                   PatternPrefilter(r'(?=x)\w', 0, 'match')):
+            self.assertTrue(pf.admits_first_char('z'))
+
+    def test_no_features_without_parser(self):
+        # internals of `re` are missing or changed: every string has to be checked by the regex
+        with mock.patch('vstuxls.string_matching.PatternPrefilter.sre_parse', None):
+            pf = PatternPrefilter(r'\d{2}', 0, 'fullmatch')
+        self.assertTrue(pf.admits('1') and pf.admits('abc'))
+        with mock.patch('vstuxls.string_matching.PatternPrefilter._head_of', side_effect=AttributeError):
+            pf = PatternPrefilter(r'\d{2}', 0, 'fullmatch')
+        self.assertTrue(pf.admits('1') and pf.admits('abc'))
+
+
+class PreprocessTestCase(unittest.TestCase):
+    def test_chain(self):
+        p = StringPattern('x', preprocess='remove_all_spaces')
+        self.assertEqual(('remove_all_spaces',), p.preprocess_chain)
+        self.assertEqual('abc', p.preprocess_string('  a b   c '))
+        self.assertEqual('a b c', StringPattern('x').preprocess_string('  a b   c '))
+
+    def test_singleton_transformers(self):
+        self.assertIs(StringTransformer.get_instance('shrink_extra_inner_spaces'),
+                      StringTransformer.get_instance('shrink_extra_inner_spaces'))
+        with self.assertRaises(ValueError):
+            StringTransformer.get_instance('no_such_transformer')
+
+
 class ShrinkTestCase(unittest.TestCase):
     def test_1(self):
         self.assertEqual('a b', shrink_extra_inner_spaces('a    b'))
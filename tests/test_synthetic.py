@@ -0,0 +1,84 @@
+"""Синтетические расписания для замеров и нагрузочных тестов."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from loguru import logger
+from tests_bootstrapper import init_testing_environment
+
+init_testing_environment()
+
+from vstuxls.converters.synthetic import ScheduleSpec, ScheduleVocabulary, generate_schedule
+from vstuxls.converters.xlsx import ExcelGrid
+from vstuxls.grammar2d import GrammarMatcher, read_grammar
+
+ROOT = Path(__file__).parent.parent
+
+
+class SyntheticScheduleTestCase(unittest.TestCase):
+    def test_vocabulary_from_materials(self):
+        vocabulary = ScheduleVocabulary.from_materials()
+        self.assertIn('ИВТ-460', vocabulary.groups)
+        self.assertIn('ОСНОВЫ МАШИННОГО ОБУЧЕНИЯ', vocabulary.disciplines)
+        self.assertGreater(len(vocabulary.teachers), 20)
+        self.assertGreater(len(vocabulary.rooms), 20)
+        # продолжения длинных названий не считаются дисциплинами
+        self.assertFalse([d for d in vocabulary.disciplines if d.startswith('И ')])
+
+        messages = []
+        handler_id = logger.add(messages.append, level='WARNING')
+        try:
+            missing = ScheduleVocabulary.from_materials(ROOT / 'no_such_dir')
+        finally:
+            logger.remove(handler_id)
+        self.assertEqual(ScheduleVocabulary.builtin(), missing)
+        # подмена словаря не происходит молча
+        self.assertIn('no_such_dir', ''.join(messages))
+
+    def test_deterministic_by_seed(self):
+        spec = dict(groups=5, weeks=1, lesson_density=0.6)
+        s1 = generate_schedule(ScheduleSpec(**spec, seed=3))
+        s2 = generate_schedule(ScheduleSpec(**spec, seed=3))
+        s3 = generate_schedule(ScheduleSpec(**spec, seed=4))
+        self.assertEqual(s1.cells, s2.cells)
+        self.assertEqual(s1.to_tsv(), s2.to_tsv())
+        self.assertNotEqual(s1.cells, s3.cells)
+
+    def test_size_parameters(self):
+        small = generate_schedule(ScheduleSpec(groups=3, weeks=1, days=5, pairs=5))
+        self.assertEqual(7 + 3 * 4, small.width)
+        large = generate_schedule(ScheduleSpec(groups=30, weeks=2))
+        self.assertEqual(7 + 30 * 4, large.width)
+        self.assertGreater(large.height, small.height)
+        self.assertGreater(len(large.lessons), 5 * len(small.lessons))
+
+        dense = generate_schedule(ScheduleSpec(groups=10, lesson_density=0.9, merged_ratio=0))
+        sparse = generate_schedule(ScheduleSpec(groups=10, lesson_density=0.2, merged_ratio=0))
+        self.assertGreater(len(dense.lessons), 2 * len(sparse.lessons))
+        self.assertFalse([lesson for lesson in dense.lessons if lesson.w > 4])
+
+        # occupied cells never overlap
+        for schedule in (large, dense):
+            points = [(x, y) for c in schedule.cells for x in range(c.x, c.x + c.w) for y in range(c.y, c.y + c.h)]
+            self.assertEqual(len(points), len(set(points)))
+
+    def test_parse_generated_schedule(self):
+        schedule = generate_schedule(ScheduleSpec(groups=3, weeks=1, merged_ratio=0.4, seed=1))
+        with tempfile.TemporaryDirectory() as tmp:
+            grid = ExcelGrid.read_xlsx(schedule.save_xlsx(Path(tmp) / 'synthetic.xlsx'))
+
+        grammar = read_grammar(ROOT / 'cnf/grammar_root.yml')
+        gm = GrammarMatcher(grammar)
+        gm.run_match(grid)
+        self.assertEqual(1, len(gm.matches_by_element[grammar.root]))
+
+        found = {(m.box.x, m.box.y, m.box.w, m.box.h) for m in gm.matches_by_element[grammar['lesson']]}
+        expected = {(lesson.x, lesson.y, lesson.w, lesson.h) for lesson in schedule.lessons}
+        self.assertEqual(expected, found)
+        self.assertTrue([lesson for lesson in schedule.lessons if lesson.w > 4])  # есть потоковые занятия
+        self.assertTrue([lesson for lesson in schedule.lessons if lesson.w == 2])  # и лабораторные
+
+
+if __name__ == '__main__':
+    unittest.main()